@@ -1,11 +1,14 @@
 import os
 import os.path
 import pickle
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
-from urllib.parse import urlencode
+from urllib.parse import urlencode, urlparse
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from dotenv import load_dotenv
 from google.auth.transport.requests import Request
 from google.oauth2.service_account import Credentials
@@ -14,8 +17,25 @@ from googleapiclient.discovery import build
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+from http_cache import CachedSession
+
+try:
+    import lxml  # noqa: F401
+
+    # lxml があればC実装のパーサーを使う（無ければ標準の html.parser）
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
 load_dotenv()
 
+# ページを同時に取得する数と、同じホストへ同時に送るリクエストの上限
+MAX_WORKERS = 8
+HOST_LIMIT = 4
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# 1冊分のカード。2ページ目以降はカードの部分だけを解析する
+CARD_CLASS = "m-book-item"
+
 
 def main():
     today = datetime.today().strftime("%Y-%m-%d")
@@ -42,33 +62,72 @@ def main():
         print(f"[Info] スプレッドシートが作成されました: {sheet_url}")
 
 
+@dataclass
+class SaleItem:
+    title: str
+    author: str
+    price: float
+    label: str
+    end_date: str
+    link: str
+
+    def as_row(self):
+        return [self.title, self.author, self.price, self.label, self.end_date, self.link]
+
+
 class WebScraping:
     def __init__(self):
         self.base_url = input("URLを入力してください: ")
         self.endpage = 0
-        self.title_list = []
-        self.author_list = []
-        self.money_list = []
-        self.label_list = []
-        self.enddate_list = []
-        self.link_list = []
         self.query_params = {"page": "{}"}
-        self.session = requests.Session()
-        retry = Retry(connect=5, backoff_factor=1)
-        adapter = HTTPAdapter(max_retries=retry)
-        self.session.mount("http://", adapter)
-        self.session.mount("https://", adapter)
+        self._local = threading.local()
+        self._host_limits = {}
+        self._host_limits_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """
+        スレッドごとのセッション（requests.Session はスレッド間で共有しない）
+        取得したページは http_cache.py に保存し、変わっていなければ再取得しない
+        """
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = CachedSession()
+            retry = Retry(
+                connect=5,
+                status=3,
+                backoff_factor=1,
+                status_forcelist=RETRY_STATUSES,
+            )
+            adapter = HTTPAdapter(max_retries=retry)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._local.session = session
+        return session
+
+    def _host_limit(self, url):
+        host = urlparse(url).netloc
+        with self._host_limits_lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = threading.Semaphore(HOST_LIMIT)
+            return self._host_limits[host]
+
+    def fetch(self, url):
+        """ページを取得する（同じホストへの同時リクエストは HOST_LIMIT 件まで）"""
+        with self._host_limit(url):
+            req = self.session.get(url)
+        req.raise_for_status()
+        req.encoding = req.apparent_encoding
+        return req.text
 
     def get_html(self):
         try:
-            req = self.session.get(self.base_url)
-            req.raise_for_status()
+            html = self.fetch(self.base_url)
         except requests.exceptions.RequestException as e:
             print(f"初回リクエストでエラーが発生しました: {e}")
             return
 
-        req.encoding = req.apparent_encoding
-        html_soup = BeautifulSoup(req.text, "html.parser")
+        html_soup = BeautifulSoup(html, HTML_PARSER)
 
         # ページ数を取得
         pager_boxes = html_soup.find_all(class_="o-pager-box-num")
@@ -79,78 +138,83 @@ class WebScraping:
             print("[Error] ページ数を取得できませんでした")
             return
 
-        # 各ページのデータを取得
-        for page in range(1, int(self.endpage) + 1):
-            self.query_params["page"] = str(page)
-            url = self.base_url + "&" + urlencode(self.query_params)
-            try:
-                req = self.session.get(url)
-                req.raise_for_status()
-            except requests.exceptions.RequestException as e:
-                print(f"{page}ページ目のリクエストでエラーが発生しました: {e}")
-                continue
+        # 1ページ目は取得済みの内容を使い、2ページ目以降を同時に取得する
+        pages = [self.parse_cards(html_soup)]
+        print(f"[Info] 1/{self.endpage}ページ目: {len(pages[0])}件")
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            # map は結果をページ順に返す
+            pages += executor.map(self.get_page, range(2, self.endpage + 1))
 
-            req.encoding = req.apparent_encoding
-            html_soup = BeautifulSoup(req.text, "html.parser")
-            titles = html_soup.find_all(class_="o-card-ttl__text")
-            authors = html_soup.find_all("a", {"data-action-label": "著者名"})
-            moneys = html_soup.find_all(class_="m-book-item__price-num")
-            labels = html_soup.find_all("a", {"data-action-label": "レーベル名"})
-            enddates = html_soup.find_all(class_="a-card-period")
-            links = html_soup.find_all(class_="o-card-ttl")
-
-            if titles and authors and labels and enddates and moneys and links:
-                for title, author, label, enddate, money, links in zip(
-                    titles, authors, labels, enddates, moneys, links
-                ):
-                    self.title_list.append(title.get_text().strip())
-                    self.author_list.append(author.get_text().strip())
-                    self.label_list.append(label.get_text().strip())
+        data = [item.as_row() for items in pages for item in items]
+        # データの総数を表示
+        print(f"[Info] 取得件数: {len(data)}")
+        return data
 
-                    # 日付のフォーマット変換
-                    formatted_date = self.format_date(enddate.get_text().strip())
-                    self.enddate_list.append(formatted_date)
-
-                    # お金の額の処理
-                    money_text = money.get_text().strip()
-                    # カンマや円記号を取り除く
-                    money_text = money_text.replace(",", "").replace("¥", "")
-                    try:
-                        money_value = float(money_text)
-                    except ValueError:
-                        money_value = 0.0  # 数値変換に失敗した場合は0.0を設定
-
-                    self.money_list.append(money_value)
-                    self.link_list.append(links.find("a")["href"].strip())
-                    print(f"{len(self.enddate_list)}件目のデータを取得しました")
+    def get_page(self, page):
+        """指定したページのカードを取得する（失敗したページは空）"""
+        url = self.base_url + "&" + urlencode({**self.query_params, "page": str(page)})
+        try:
+            html = self.fetch(url)
+        except requests.exceptions.RequestException as e:
+            print(f"{page}ページ目のリクエストでエラーが発生しました: {e}")
+            return []
 
-        # データの総数を表示
-        print(f"タイトルの数: {len(self.title_list)}")
-        print(f"著者の数: {len(self.author_list)}")
-        print(f"レーベルの数: {len(self.label_list)}")
-        print(f"終了日の数: {len(self.enddate_list)}")
-
-        data = [
-            (
-                self.title_list[i],
-                self.author_list[i],
-                self.money_list[i],
-                self.label_list[i],
-                self.enddate_list[i],
-                self.link_list[i],
+        html_soup = BeautifulSoup(
+            html, HTML_PARSER, parse_only=SoupStrainer(class_=CARD_CLASS)
+        )
+        items = self.parse_cards(html_soup)
+        print(f"[Info] {page}/{self.endpage}ページ目: {len(items)}件")
+        return items
+
+    def parse_cards(self, html_soup):
+        """
+        カードごとに各項目を取り出す
+        項目ごとに別々に探して並べると、1冊でも項目が欠けると以降の行がずれるため、カード単位で読む
+        """
+        items = []
+        for card in html_soup.find_all(class_=CARD_CLASS):
+            title = card.find(class_="o-card-ttl__text")
+            title_box = card.find(class_="o-card-ttl")
+            link = title_box.find("a", href=True) if title_box is not None else None
+            if title is None or link is None:
+                continue
+            author = card.find("a", attrs={"data-action-label": "著者名"})
+            label = card.find("a", attrs={"data-action-label": "レーベル名"})
+            enddate = card.find(class_="a-card-period")
+            money = card.find(class_="m-book-item__price-num")
+
+            # お金の額の処理（カンマや円記号を取り除く）
+            money_text = _text(money).replace(",", "").replace("¥", "")
+            try:
+                money_value = float(money_text)
+            except ValueError:
+                money_value = 0.0  # 数値変換に失敗した場合は0.0を設定
+
+            items.append(
+                SaleItem(
+                    title=_text(title),
+                    author=_text(author),
+                    price=money_value,
+                    label=_text(label),
+                    # 日付のフォーマット変換
+                    end_date=self.format_date(_text(enddate)) if enddate else "",
+                    link=link["href"].strip(),
+                )
             )
-            for i in range(len(self.title_list))
-        ]
-        return data
+        return items
 
     def format_date(self, date_str):
         input_date = date_str.split("(")[0]
         try:
             date_obj = datetime.strptime(input_date, "%Y/%m/%d")
-            formatted_date = date_obj.strftime("%Y-%m-%d")
         except ValueError:
             print(f"日付のパースに失敗しました: {date_str}")
-        return formatted_date
+            return date_str
+        return date_obj.strftime("%Y-%m-%d")
+
+
+def _text(element):
+    return element.get_text().strip() if element is not None else ""
 
 
 class GoogleDriveAuth:
@@ -1,5 +1,10 @@
 import os
+import sqlite3
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlparse
 
 import gspread
 import requests
@@ -10,127 +15,286 @@ from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 
+from http_cache import CachedSession
+
 load_dotenv()
 
+# 同じホストへのリクエストの間隔（秒）と、同時に取得する数
+REQUEST_INTERVAL = float(os.getenv("BOOKMETER_REQUEST_INTERVAL", "1.0"))
+MAX_WORKERS = int(os.getenv("BOOKMETER_WORKERS", "3"))
+MAX_RETRIES = 4
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# 429/5xx が続いたときに間隔を広げる上限の倍率
+MAX_PENALTY = 32
+# 取得済みの本の情報（タイトル・著者・ページ数・BOOK☆WALKERのリンク）
+BOOK_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "tokens",
+    "bookmeter_books.sqlite3",
+)
+
+
+class CrawlScheduler:
+    """
+    同じホストへのリクエストの間隔を空けつつ、少ない並列数でページを取得するクラス
+
+    - ホストごとに、前のリクエストから interval 秒空けてから送る（スレッドをまたいで共有）
+    - 429/5xx のときはそのホストの間隔を倍にして再試行し（Retry-After があればそれ以上待つ）、
+      成功するたびに元の間隔へ戻していく
+    - map() は結果を URL の順に返す
+    """
+
+    def __init__(self, headers=None, interval=REQUEST_INTERVAL, workers=MAX_WORKERS):
+        """
+        :param headers: すべてのリクエストに付けるヘッダー
+        :param interval: 同じホストへのリクエストの間隔（秒）
+        :param workers: 同時に取得する数
+        """
+        self.headers = headers or {}
+        self.interval = interval
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._next_time = {}  # ホスト -> 次にリクエストしてよい時刻
+        self._penalty = {}  # ホスト -> 間隔に掛ける倍率
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        """スレッドごとのセッション（取得したページは http_cache.py に保存する）"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = CachedSession()
+            self._local.session = session
+        return session
+
+    def _wait_turn(self, host):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_time.get(host, now))
+            self._next_time[host] = start + self.interval * self._penalty.get(host, 1)
+        if start > now:
+            time.sleep(start - now)
+
+    def _slow_down(self, host, retry_after=None):
+        """間隔を広げ、次に送ってよいまでの秒数を返す"""
+        with self._lock:
+            penalty = min(self._penalty.get(host, 1) * 2, MAX_PENALTY)
+            self._penalty[host] = penalty
+            delay = max(retry_after or 0, self.interval * penalty)
+            self._next_time[host] = max(
+                self._next_time.get(host, 0), time.monotonic() + delay
+            )
+        return delay
+
+    def _speed_up(self, host):
+        with self._lock:
+            if self._penalty.get(host, 1) > 1:
+                self._penalty[host] = max(1, self._penalty[host] / 2)
+
+    def fetch(self, url):
+        """
+        ページを取得する
+
+        :return: 本文（取得できなかった場合は None）
+        """
+        host = urlparse(url).netloc
+        session = self.session
+        for attempt in range(MAX_RETRIES + 1):
+            # 保存済みのページだけを使うときは待つ必要が無い
+            if not session.offline:
+                self._wait_turn(host)
+            retry_after = None
+            try:
+                response = session.get(url, headers=self.headers)
+            except requests.exceptions.RequestException as e:
+                error = e
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    try:
+                        response.raise_for_status()
+                    except requests.exceptions.RequestException as e:
+                        print(f"[Error] {url} の取得に失敗しました: {e}")
+                        return None
+                    self._speed_up(host)
+                    response.encoding = response.apparent_encoding
+                    return response.text
+                error = f"HTTP {response.status_code}"
+                retry_after = _retry_after(response)
+
+            if attempt == MAX_RETRIES:
+                break
+            delay = self._slow_down(host, retry_after)
+            print(f"[Warn] {url} の取得に失敗しました（{error}）。{delay:.1f}秒後に再試行します")
+        print(f"[Error] 最大試行回数に達しました: {url}")
+        return None
+
+    def map(self, urls, parse):
+        """
+        URLを並列に取得して parse(本文) した結果を、URLの順に返す（取得できなかったものは None）
+        """
+
+        def work(url):
+            text = self.fetch(url)
+            return parse(text) if text is not None else None
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(work, urls))
+
+
+class BookCache:
+    """取得済みの本の情報を URL ごとに保存するクラス（一度取得した本は取得し直さない）"""
+
+    def __init__(self, path=BOOK_CACHE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS books ("
+            " url TEXT PRIMARY KEY, title TEXT NOT NULL, author TEXT NOT NULL,"
+            " pages INTEGER, link TEXT NOT NULL, fetched_at TEXT NOT NULL)"
+        )
+
+    def close(self):
+        self.conn.close()
+
+    def get_all(self, urls):
+        """
+        :return: {url: [タイトル, 著者, ページ数, リンク]}（保存済みのものだけ）
+        """
+        books = {}
+        rows = self.conn.execute("SELECT url, title, author, pages, link FROM books")
+        wanted = set(urls)
+        for url, title, author, pages, link in rows:
+            if url in wanted:
+                books[url] = [title, author, pages, link]
+        return books
+
+    def save(self, url, book):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO books (url, title, author, pages, link, fetched_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (url, *book, datetime.now().isoformat(timespec="seconds")),
+            )
+
 
 class WebScraping:
     def __init__(self, url, spreadsheet_id):
         self.url = url
-        self.session = requests.Session()  # Sessionオブジェクトを初期化
         self.headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/85.0.4183.102 Safari/537.36"
         }
+        self.scheduler = CrawlScheduler(self.headers)
+        self.books = BookCache()
         self.data = []
         self.all_links = []
+        self.spreadsheet_id = spreadsheet_id
         self.spreadsheet = GoogleSpreadsheet(spreadsheet_id)
 
-    def get_html(self, spreadsheet_id):
+    def get_html(self):
         # 初回リクエスト処理
-        try:
-            req = self.session.get(self.url, headers=self.headers)
-            req.raise_for_status()
-        except requests.exceptions.RequestException as e:
-            print(f"初回リクエストでエラーが発生しました: {e}")
+        text = self.scheduler.fetch(self.url)
+        if text is None:
+            print("初回リクエストでエラーが発生しました")
             return
 
-        req.encoding = req.apparent_encoding
-        html_soup = BeautifulSoup(req.text, "html.parser")
-
-        # ページリンクの取得
-        try:
-            pagination_links = html_soup.find_all("a", class_="bm-pagination__link")
-            last_page_link = pagination_links[-1].get("href")
+        html_soup = BeautifulSoup(text, "html.parser")
 
+        # ページリンクの取得（ページが1つだけならページ送りが無い）
+        last_page_number = 1
+        pagination_links = html_soup.find_all("a", class_="bm-pagination__link")
+        if pagination_links:
+            last_page_link = pagination_links[-1].get("href", "")
             if "page=" in last_page_link:
-                last_page_number = last_page_link.split("page=")[-1]
+                last_page_number = int(last_page_link.split("page=")[-1])
             else:
                 print("[Error] ページ番号が見つかりませんでした")
-        except Exception:
-            print("[Error] ページリンクの取得に失敗しました")
-            return
+                return
 
-        # 各ページのリンクを取得して処理
-        for i in range(1, int(last_page_number) + 1):
-            page_url = self.url + f"?page={i}"
-
-            # リトライ処理の統合
-            for attempt in range(3):  # 最大3回リトライ
-                try:
-                    req = self.session.get(page_url, headers=self.headers)
-                    req.raise_for_status()
-                    break  # 成功したらループを抜ける
-                except requests.exceptions.RequestException as e:
-                    print(f"ページリクエストでエラーが発生しました: {e}")
-                    if attempt < 2:  # リトライの余地があれば待機
-                        print(f"5秒後に再試行します...")
-                        time.sleep(5)
-                    else:
-                        print("[Info] 最大試行回数に達しました。次のページに進みます。")
-                        req = None
-                        break
-
-            if req is None:
-                continue  # リトライ後も失敗した場合は次のページへ
-
-            req.encoding = req.apparent_encoding
-            page_soup = BeautifulSoup(req.text, "html.parser")
-
-            # <div class="detail__title"> 内の <a> タグを探す
-            detail_divs = page_soup.find_all("div", class_="detail__title")
-
-            for div in detail_divs:
-                a_tag = div.find("a")
-                if a_tag and a_tag.get("href"):
-                    href = a_tag.get("href")
-                    base_link = "https://bookmeter.com" + href
-                    self.all_links.append(base_link)
-                else:
-                    print("[Error] hrefが存在しません")
-
-        for link in self.all_links:
-            try:
-                time.sleep(5)
-                req = self.session.get(link, headers=self.headers)
-                req.raise_for_status()
-                req.encoding = req.apparent_encoding
-            except requests.exceptions.RequestException as e:
-                print(f"リンクリクエストでエラーが発生しました: {e}")
+        # 各ページのリンクを取得して処理（1ページ目は取得済みの内容を使う）
+        page_urls = [self.url + f"?page={i}" for i in range(2, last_page_number + 1)]
+        pages = [self.parse_links(text)] + self.scheduler.map(page_urls, self.parse_links)
+        for page_url, links in zip([self.url] + page_urls, pages):
+            if links is None:
+                print(f"[Info] ページを取得できなかったため飛ばします: {page_url}")
                 continue
-            html_soup = BeautifulSoup(req.text, "html.parser")
-
-            title_text = html_soup.find("h1", class_="inner__title")
-            if title_text:
-                title = title_text.text.split(" (", 1)[0]  # タイトル部分だけを取得
-
-            authors_elements = html_soup.select(
-                "ul.header__authors a"
-            )  # 著者リンクのセレクタ
-            authors = (
-                authors_elements[0].text if authors_elements else "著者不明"
-            )  # authors_elements[0].textで取得、なかった場合はelse
-
-            # ページ数を取得するロジック
-            page_number = int(
-                html_soup.find("dt", string="ページ数")
-                .find_next_sibling("dd")
-                .find("span")
-                .text
-            )
+            self.all_links.extend(links)
+
+        # 取得済みの本は保存した情報を使い、新しい本だけを取得する
+        known = self.books.get_all(self.all_links)
+        new_links = [link for link in dict.fromkeys(self.all_links) if link not in known]
+        print(
+            f"[Info] 本の数: {len(self.all_links)}（取得済み {len(self.all_links) - len(new_links)}、"
+            f"新しく取得 {len(new_links)}）"
+        )
+        for link, book in zip(new_links, self.scheduler.map(new_links, self.parse_book)):
+            if book is None:
+                continue
+            self.books.save(link, book)
+            known[link] = book
+            print(*book)
 
-            # リンク処理の修正
-            link_samples = [
-                a["href"]
-                for a in html_soup.find_all("a", href=True)
-                if "bookwalker.jp" in a["href"]
-            ]
-            links = (
-                link_samples[0].split("?")[0] if link_samples else ""
-            )  # 最初のリンクのみを処理
-
-            self.data.append([title, authors, page_number, links])
-            print(title, authors, page_number, links)
+        self.data = [known[link] for link in self.all_links if link in known]
+        self.books.close()
         self.spreadsheet.write_data(self.data)
-        self.spreadsheet.AutoFilter(spreadsheet_id)
+        self.spreadsheet.AutoFilter(self.spreadsheet_id)
+
+    def parse_links(self, text):
+        """本棚の1ページから本のページのリンクを取り出す"""
+        page_soup = BeautifulSoup(text, "html.parser")
+        links = []
+        # <div class="detail__title"> 内の <a> タグを探す
+        for div in page_soup.find_all("div", class_="detail__title"):
+            a_tag = div.find("a")
+            if a_tag and a_tag.get("href"):
+                links.append("https://bookmeter.com" + a_tag.get("href"))
+            else:
+                print("[Error] hrefが存在しません")
+        return links
+
+    def parse_book(self, text):
+        """
+        本のページからタイトル・著者・ページ数・BOOK☆WALKERのリンクを取り出す
+
+        :return: [タイトル, 著者, ページ数, リンク]（タイトルが無ければ None）
+        """
+        html_soup = BeautifulSoup(text, "html.parser")
+
+        title_text = html_soup.find("h1", class_="inner__title")
+        if not title_text:
+            print("[Error] タイトルが見つかりませんでした")
+            return None
+        title = title_text.text.split(" (", 1)[0]  # タイトル部分だけを取得
+
+        authors_elements = html_soup.select("ul.header__authors a")  # 著者リンクのセレクタ
+        authors = (
+            authors_elements[0].text if authors_elements else "著者不明"
+        )  # authors_elements[0].textで取得、なかった場合はelse
+
+        # ページ数を取得するロジック（書かれていない本は空欄）
+        page_number = None
+        page_label = html_soup.find("dt", string="ページ数")
+        page_value = page_label.find_next_sibling("dd") if page_label else None
+        page_span = page_value.find("span") if page_value else None
+        if page_span and page_span.text.strip().isdigit():
+            page_number = int(page_span.text.strip())
+
+        # リンク処理の修正
+        link_samples = [
+            a["href"]
+            for a in html_soup.find_all("a", href=True)
+            if "bookwalker.jp" in a["href"]
+        ]
+        links = (
+            link_samples[0].split("?")[0] if link_samples else ""
+        )  # 最初のリンクのみを処理
+
+        return [title, authors, page_number, links]
+
+
+def _retry_after(response):
+    """Retry-After ヘッダーの秒数（秒数で書かれていなければ None）"""
+    value = response.headers.get("Retry-After", "")
+    return float(value) if value.strip().isdigit() else None
 
 
 class GoogleSpreadsheet:
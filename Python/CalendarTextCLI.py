@@ -12,11 +12,8 @@ from typing import Any
 import pytz
 import requests
 from dotenv import load_dotenv
-from google.auth.exceptions import RefreshError
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+
+from google_client import get_service
 
 GEMINI_API_BASE = "https://generativelanguage.googleapis.com/v1beta"
 GEMINI_MODEL_NAME = "gemini-flash-latest"
@@ -84,36 +81,10 @@ def authenticate_google() -> Any:
     token_path = root / "tokens" / "calendar_token.json"
     credentials_path = root / "tokens" / "credentials.json"
 
-    creds = None
-    if token_path.exists():
-        creds = Credentials.from_authorized_user_file(str(token_path), CALENDAR_SCOPE)
-
-    if not creds or not creds.valid:
-        needs_reauth = True
-
-        if creds and creds.expired and creds.refresh_token:
-            try:
-                creds.refresh(Request())
-                needs_reauth = False
-            except RefreshError as e:
-                print(f"[Warning] 既存トークンの更新に失敗したため再認証します: {e}")
-                creds = None
-
-        if needs_reauth:
-            if not credentials_path.exists():
-                raise FileNotFoundError(
-                    f"OAuthクライアント情報が見つかりません: {credentials_path}"
-                )
-            flow = InstalledAppFlow.from_client_secrets_file(
-                str(credentials_path), CALENDAR_SCOPE
-            )
-            creds = flow.run_local_server(port=0)
-
-        token_path.parent.mkdir(parents=True, exist_ok=True)
-        with token_path.open("w", encoding="utf-8") as token_file:
-            token_file.write(creds.to_json())
-
-    return build("calendar", "v3", credentials=creds)
+    # 認証情報の読み込み・更新とサービスの作成は google_client.py にまとめている
+    return get_service(
+        "calendar", "v3", str(token_path), CALENDAR_SCOPE, str(credentials_path)
+    )
 
 
 def gemini_generate(prompt: str, model: str, api_key: str) -> str:
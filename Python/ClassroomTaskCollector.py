@@ -2,12 +2,10 @@ import argparse
 import json
 from pathlib import Path
 
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from google_client import build_service, load_credentials
+
 SCOPES = [
     "https://www.googleapis.com/auth/classroom.courses.readonly",
     "https://www.googleapis.com/auth/classroom.rosters.readonly",
@@ -82,24 +80,11 @@ class ClassroomTaskCollector:
         return self.root_dir / "tokens" / token_name
 
     def authenticate(self):
-        if self.token_path.exists():
-            self.creds = Credentials.from_authorized_user_file(
-                str(self.token_path), SCOPES
-            )
-
-        if not self.creds or not self.creds.valid:
-            if self.creds and self.creds.expired and self.creds.refresh_token:
-                self.creds.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    str(self.credentials_path), SCOPES
-                )
-                self.creds = flow.run_local_server(port=0)
-
-            self.token_path.parent.mkdir(parents=True, exist_ok=True)
-            self.token_path.write_text(self.creds.to_json(), encoding="utf-8")
-
-        self.service = build("classroom", "v1", credentials=self.creds)
+        # トークンの読み込み・更新・保存は google_client.py にまとめている
+        self.creds = load_credentials(
+            str(self.token_path), SCOPES, str(self.credentials_path)
+        )
+        self.service = build_service("classroom", "v1", self.creds)
 
     def class_list(self):
         try:
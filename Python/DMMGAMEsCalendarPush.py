@@ -1,5 +1,4 @@
 import json
-import os
 import re
 from datetime import datetime
 from pathlib import Path
@@ -7,10 +6,11 @@ from pathlib import Path
 import requests
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+
+from calendar_batch_writer import CalendarBatchWriter
+from calendar_mirror import CalendarMirror
+from google_client import get_service
+from http_cache import CachedSession
 
 load_dotenv()
 
@@ -59,12 +59,14 @@ def main():
     print(f"タイトル: {game_title}, 日付: {formatted_date}")
     # google_calendar = GoogleCalendar()
     # google_calendar.Add_event(game_title, formatted_date, url)
+    # google_calendar.flush()
 
 
 class Webscraping:
     def __init__(self, url):
         self.url = url
-        self.session = requests.session()
+        # DMMは Cookie を受け取るため毎回問い合わせる（http_cache.SITE_TTLS）が、未変更なら本文は転送されない
+        self.session = CachedSession()
 
     def get_html(self):
         try:
@@ -137,35 +139,23 @@ class GoogleCalendar:
         self.calendar_id = load_calendar_id(
             category_name="オタ活", legacy_key="dmmgames"
         )
-        self.creds = None  # 認証情報の初期化
-        if os.path.exists(
-            "tokens/calendar_token.json"
-        ):  # credentials.json ファイルに保存された認証情報をロードする
-            self.creds = Credentials.from_authorized_user_file(
-                "tokens/calendar_token.json"
-            )
-
-        # 認証情報(calendar_token.json)がない場合や期限切れの場合は、ユーザーに認証を求める
-        if (
-            not self.creds or not self.creds.valid
-        ):  # cerds.validはtrueかfalseを返し、切れている場合はtrue
-            if (
-                self.creds and self.creds.expired and self.creds.refresh_token
-            ):  # tokenがあった場合、期限切れかどうかを確認
-                self.creds.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file(  # tokenがない場合、認証を行う
-                    "tokens/credentials.json",
-                    ["https://www.googleapis.com/auth/calendar.events"],
-                )
-                self.creds = flow.run_local_server(port=0)
-            # 認証情報を保存する
-            with open("tokens/calendar_token.json", "w") as token:
-                token.write(
-                    self.creds.to_json()
-                )  # 認証情報が入っているself.credsをjson形式に変換して保存する
-        self.service = build("calendar", "v3", credentials=self.creds)
+        # 認証情報(calendar_token.json)の読み込み・更新は google_client.py にまとめている
+        self.service = get_service(
+            "calendar",
+            "v3",
+            "tokens/calendar_token.json",
+            ["https://www.googleapis.com/auth/calendar.events"],
+        )
         print("[Info] Google Calendarに接続しました")
+        # 重複チェックはローカルの複製で行う（前回の実行からの変更分だけ取り込む）
+        self.mirror = CalendarMirror(
+            self.service, self.calendar_id, "DMMGAMEsCalendarPush"
+        )
+        self.mirror.sync()
+        # イベントはためておき、バッチリクエストでまとめて追加する
+        self.writer = CalendarBatchWriter(
+            self.service, self.calendar_id, on_result=self.on_result
+        )
 
     def Add_event(self, game_title, formatted_date, url):
         event = {
@@ -174,8 +164,24 @@ class GoogleCalendar:
             "start": {"date": formatted_date, "timeZone": "Asia/Tokyo"},
             "end": {"date": formatted_date, "timeZone": "Asia/Tokyo"},
         }
-        self.service.events().insert(calendarId=self.calendar_id, body=event).execute()
-        print("[Info] Google Calendarにイベントを追加しました。")
+        if self.mirror.upsert(self.writer, event) in ("exists", "queued"):
+            print(f"[Info] 既にカレンダーに存在します: {event['summary']}")
+
+    def flush(self):
+        """ためておいたイベントをGoogle Calendarに送信する"""
+        self.writer.flush()
+
+    def on_result(self, title, event, error):
+        if event is not None:
+            self.mirror.record(event)
+        print_result(title, event, error)
+
+
+def print_result(title, event, error):
+    if error is None:
+        print(f"[Info] Google Calendarにイベントを追加・更新しました: {title}")
+    else:
+        print(f"[Error] イベントの追加に失敗しました: {title} - {error}")
 
 
 if __name__ == "__main__":
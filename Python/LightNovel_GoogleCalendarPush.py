@@ -1,16 +1,17 @@
 import json
 import os
-from datetime import datetime, timedelta
+from datetime import datetime
 from pathlib import Path
 from urllib.parse import urlencode
 
 import requests
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+
+from calendar_batch_writer import CalendarBatchWriter
+from calendar_mirror import CalendarMirror
+from google_client import build_service, load_credentials
+from http_cache import CachedSession
 
 # 環境変数のロード
 load_dotenv()
@@ -62,6 +63,7 @@ def main():
         page_novels = manager.process_page(page)
         total_novels += page_novels
 
+    manager.session.print_stats()
     manager.send_to_discord(
         f"合計 {total_novels} 件のライトノベル情報がGoogleカレンダーに追加されました。"
     )
@@ -75,8 +77,26 @@ class LightNovelEventManager:
             category_name="ラノベ・漫画カレンダー", legacy_key="lightnovel"
         )
         self.discord_webhook_url = os.environ["DISCORD_WEBHOOK_URL"]
+        # 楽天ブックスのページは http_cache.py に保存し、変わっていなければ再取得しない
+        self.session = CachedSession()
         self.creds = self.authenticate_google()
-        self.service = build("calendar", "v3", credentials=self.creds)
+        self.service = build_service("calendar", "v3", self.creds)
+        # イベントはためておき、バッチリクエストでまとめて追加する
+        self.writer = CalendarBatchWriter(
+            self.service, self.calendar_id, on_result=self.print_result
+        )
+        # 重複チェックはローカルの複製で行う（前回の実行からの変更分だけ取り込む）
+        self.mirror = CalendarMirror(
+            self.service, self.calendar_id, "LightNovel_GoogleCalendarPush"
+        )
+        self.mirror.sync()
+
+    def print_result(self, title, event, error):
+        if error is None:
+            self.mirror.record(event)
+            print(f"{title} のイベントが追加・更新されました。")
+        else:
+            print(f"{title} のイベント追加に失敗しました: {error}")
 
     def send_to_discord(self, message):
         data = {"content": message}
@@ -90,23 +110,10 @@ class LightNovelEventManager:
             print(f"Discordへの送信に失敗しました: {e}")
 
     def authenticate_google(self):
-        creds = None
-        if os.path.exists("tokens/token.json"):
-            creds = Credentials.from_authorized_user_file("tokens/token.json")
-
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    "credentials.json",
-                    ["https://www.googleapis.com/auth/calendar.events"],
-                )
-                creds = flow.run_local_server(port=0)
-            with open("tokens/token.json", "w") as token:
-                token.write(creds.to_json())
-
-        return creds
+        return load_credentials(
+            "tokens/token.json",
+            ["https://www.googleapis.com/auth/calendar.events"],
+        )
 
     def convert_japanese_date(self, japanese_date_str):
         if "上旬" in japanese_date_str:
@@ -117,29 +124,8 @@ class LightNovelEventManager:
         except ValueError:
             return ""
 
-    def get_events(self, time_min=None, time_max=None):
-        events_result = (
-            self.service.events()
-            .list(
-                calendarId=self.calendar_id,
-                timeMin=time_min,
-                timeMax=time_max,
-                singleEvents=True,
-                orderBy="startTime",
-            )
-            .execute()
-        )
-        return events_result.get("items", [])
-
     def check_duplicate(self, event_date, title):
-        time_min = (
-            datetime.strptime(event_date, "%Y-%m-%d") - timedelta(days=1)
-        ).strftime("%Y-%m-%d") + "T00:00:00Z"
-        time_max = event_date + "T00:00:00Z"
-        events = self.get_events(time_min, time_max)
-        return any(
-            event["summary"] == title and "date" in event["start"] for event in events
-        )
+        return self.mirror.exists(event_date, title)
 
     def fetch_titles_and_dates(self, html_soup):
         titles = html_soup.find_all(class_="item-title__text")
@@ -163,7 +149,7 @@ class LightNovelEventManager:
         url = base_url + "?" + urlencode(query_params)
 
         try:
-            req = requests.get(url)
+            req = self.session.get(url)
             req.raise_for_status()
             req.encoding = req.apparent_encoding
         except requests.exceptions.RequestException as e:
@@ -173,15 +159,15 @@ class LightNovelEventManager:
         html_soup = BeautifulSoup(req.text, "html.parser")
         title_list, date_list, media_list = self.fetch_titles_and_dates(html_soup)
 
-        novel_count = 0
+        inserted_before = len(self.writer.inserted)
 
         for i, title in enumerate(title_list):
             if i < len(media_list):
                 media = media_list[i]
                 formatted_date = self.convert_japanese_date(date_list[i])
 
-                if self.check_duplicate(formatted_date, title):
-                    print(f"{title} のイベントは既にカレンダーに存在します。")
+                if not formatted_date:
+                    print(f"{title} の発売日を変換できません: {date_list[i]}")
                     continue
 
                 event = {
@@ -189,16 +175,15 @@ class LightNovelEventManager:
                     "start": {"date": formatted_date, "timeZone": "Asia/Tokyo"},
                     "end": {"date": formatted_date, "timeZone": "Asia/Tokyo"},
                 }
-                self.service.events().insert(
-                    calendarId=self.calendar_id, body=event
-                ).execute()
-                print(f"{title} のイベントが追加されました。")
-                novel_count += 1
+                # 同じ本が別の日付で登録済みなら発売日を更新する（「上旬」からの確定など）
+                if self.mirror.upsert(self.writer, event) in ("exists", "queued"):
+                    print(f"{title} のイベントは既にカレンダーに存在します。")
             else:
                 print("指定されたクラスの要素が見つかりません。")
                 break
 
-        return novel_count
+        self.writer.flush()
+        return len(self.writer.inserted) - inserted_before
 
 
 if __name__ == "__main__":
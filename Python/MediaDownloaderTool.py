@@ -12,11 +12,9 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from download_manager import DownloadManager
+from drive_upload_manager import DriveUploadManager
+from google_client import get_service, load_credentials
 
 # スクリプトのディレクトリとプロジェクトルートを取得
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -44,8 +42,19 @@ def cuda_available():
 
 
 class MediaDownloader:
-    def __init__(self):
+    FORMAT = "bestvideo[height<=1080][ext=mp4]+bestaudio[ext=m4a]/best[height<=1080][ext=mp4]/best[height<=1080]"
+
+    def __init__(self, output_path=".", max_workers=3):
         self.ytdlp_path = os.getenv("YT-DLP_PATH")
+        # 処理済みの動画IDを記録し、同じURLは2回目以降スキップする。
+        # 変換・アップロードに失敗したときにやり直せるよう、記録は処理が終わってから行う（record()）
+        self.manager = DownloadManager(
+            self.ytdlp_path,
+            output_path=output_path,
+            max_workers=max_workers,
+            archive_file=os.path.join(TOKENS_DIR, "media_download_archive.json"),
+            record_archive=False,
+        )
 
     def download_video(self, url, output_path="."):
         """
@@ -57,71 +66,24 @@ class MediaDownloader:
         :param output_path: 保存先のディレクトリ
         :return: ダウンロード情報 or None
         """
-        # ダウンロード前のファイルリストを取得
-        before_files = set(glob.glob(os.path.join(output_path, "*.mp4")))
-
-        # yt-dlpコマンドを構築
-        output_template = os.path.join(output_path, "%(title)s.%(ext)s")
-        command = [
-            self.ytdlp_path,
-            "-f",
-            "bestvideo[height<=1080][ext=mp4]+bestaudio[ext=m4a]/best[height<=1080][ext=mp4]/best[height<=1080]",
-            "-o",
-            output_template,
-            "--no-playlist",  # プレイリストの場合は最初の1件のみ
-            "--print",
-            "after_move:filepath",  # ダウンロード後のファイルパスを出力
-            url,
-        ]
+        result = self.manager.download(url, self.FORMAT, output_path=output_path)
+        if result["filepath"]:
+            return {"filepath": result["filepath"]}
+        return None
 
-        try:
-            print(f"[Info] 動画をダウンロード中...: {url}")
-            # Windows環境での文字化け対策: chcp 65001を使用してUTF-8モードで実行
-            result = subprocess.run(
-                command,
-                check=True,
-                capture_output=True,
-                text=True,
-                encoding="utf-8",
-                errors="replace",
-            )
+    def download_videos(self, urls, output_path="."):
+        """
+        複数の動画URLを同時にダウンロードします。
 
-            # 出力を表示
-            print(result.stdout)
-
-            # --print で出力されたファイルパスを取得
-            output_lines = result.stdout.strip().split("\n")
-            downloaded_filepath = None
-            for line in reversed(output_lines):
-                line = line.strip()
-                if line.endswith(".mp4") and os.path.exists(line):
-                    downloaded_filepath = line
-                    break
-
-            # 見つからない場合は差分から取得
-            if not downloaded_filepath:
-                after_files = set(glob.glob(os.path.join(output_path, "*.mp4")))
-                new_files = after_files - before_files
-                if new_files:
-                    downloaded_filepath = list(new_files)[0]
-                elif after_files:
-                    # 最新の更新時刻のファイルを選択
-                    downloaded_filepath = max(after_files, key=os.path.getmtime)
-
-            if downloaded_filepath and os.path.exists(downloaded_filepath):
-                print(f"[Info] ダウンロードが完了しました: {downloaded_filepath}")
-                return {"filepath": downloaded_filepath}
-            else:
-                print("[Error] ダウンロードされたファイルが見つかりませんでした。")
-                return None
+        :param urls: ダウンロードする動画URLのリスト
+        :param output_path: 保存先のディレクトリ
+        :return: {url: {"status": "downloaded" | "skipped" | "failed", "filepath": パス or None}}
+        """
+        return self.manager.download_many(urls, self.FORMAT, output_path=output_path)
 
-        except subprocess.CalledProcessError as e:
-            print(f"[Error] エラーが発生しました: {e}")
-            print(f"[Error] エラー出力: {e.stderr}")
-            return None
-        except Exception as e:
-            print(f"[Error] 予期しないエラーが発生しました: {e}")
-            return None
+    def record(self, url, filepath):
+        """変換・アップロードまで終わった動画をアーカイブに記録します。"""
+        self.manager.record(url, filepath)
 
 
 class VideoVerticalConverter:
@@ -426,49 +388,30 @@ class GoogleDriveManager:
             "https://www.googleapis.com/auth/drive.readonly",
         ]
 
-        # OAuth 2.0認証を使用
-        credentials_path = os.path.join(TOKENS_DIR, "credentials.json")
-        token_path = os.path.join(TOKENS_DIR, "drive_token.json")
-
-        self.creds = None
-
-        # トークンファイルが存在する場合は読み込む
-        if os.path.exists(token_path):
-            self.creds = Credentials.from_authorized_user_file(token_path, self.SCOPES)
+        # OAuth 2.0認証（トークンの読み込み・リフレッシュ・保存は google_client.py にまとめている）
+        self.credentials_path = os.path.join(TOKENS_DIR, "credentials.json")
+        self.token_path = os.path.join(TOKENS_DIR, "drive_token.json")
+        try:
+            self.creds = load_credentials(
+                self.token_path, self.SCOPES, self.credentials_path
+            )
+        except Exception as e:
+            print(f"[Error] 認証中にエラーが発生しました: {e}")
+            raise
+        print("[Info] 認証方式: OAuth 2.0")
 
-        # 認証情報が無効または存在しない場合
-        if not self.creds or not self.creds.valid:
-            if self.creds and self.creds.expired and self.creds.refresh_token:
-                # トークンをリフレッシュ
-                try:
-                    self.creds.refresh(Request())
-                    print("[Info] トークンをリフレッシュしました")
-                except Exception as e:
-                    print(f"[Error] トークンのリフレッシュに失敗しました: {e}")
-                    self.creds = None
+        # 再開可能アップロード（チャンクサイズはMB単位で環境変数から変更可能）
+        chunk_mb = int(os.getenv("DRIVE_UPLOAD_CHUNK_MB", "8"))
+        self.uploader = DriveUploadManager(
+            self.creds, chunk_size=chunk_mb * 1024 * 1024
+        )
 
-            if not self.creds:
-                # 新しい認証フローを開始
-                try:
-                    flow = InstalledAppFlow.from_client_secrets_file(
-                        credentials_path, self.SCOPES
-                    )
-                    self.creds = flow.run_local_server(port=0)
-                    print("[Info] 新しい認証を完了しました")
-                except Exception as e:
-                    print(f"[Error] 認証中にエラーが発生しました: {e}")
-                    raise
-
-            # トークンを保存
-            try:
-                with open(token_path, "w") as token:
-                    token.write(self.creds.to_json())
-                print(f"[Info] トークンを保存しました: {token_path}")
-            except Exception as e:
-                print(f"[Error] トークンの保存に失敗しました: {e}")
-
-        self.service = build("drive", "v3", credentials=self.creds)
-        print("[Info] 認証方式: OAuth 2.0")
+    @property
+    def service(self):
+        """スレッドごとのDrive APIサービス（httplib2の接続はスレッド間で共有できないため）"""
+        return get_service(
+            "drive", "v3", self.token_path, self.SCOPES, self.credentials_path
+        )
 
     def check_connection(self):
         """
@@ -520,41 +463,50 @@ class GoogleDriveManager:
             print(f"[Error] ✗ フォルダーへのアクセスに失敗しました: {e}")
             return False
 
-    def upload_file(self, file_path, folder_id, file_name=None):
+    def upload_file(self, file_path, folder_id, file_name=None, on_progress=None):
         """
         Google Driveにファイルをアップロードします。
+        チャンク分割の再開可能アップロードで送信し、中断した場合は次回途中から再開します。
+        フォルダーの確認は check_folder_access で事前に済ませておきます。
 
         :param file_path: アップロードするファイルのパス
         :param folder_id: アップロード先のフォルダーID
         :param file_name: Google Drive上のファイル名（指定しない場合は元のファイル名を使用）
+        :param on_progress: 進捗コールバック on_progress(file_path, uploaded_bytes, total_bytes)
         :return: アップロードされたファイルID
         """
         try:
-            if folder_id:
-                self.service.files().get(fileId=folder_id, fields="id").execute()
-                print(f"[Info] アップロード先フォルダーを確認しました")
-
-            # ファイル名が指定されていない場合は元のファイル名を使用
-            upload_name = file_name if file_name else os.path.basename(file_path)
-
-            file_metadata = {
-                "name": upload_name,
-                "parents": [folder_id] if folder_id else [],
-            }
-            media = MediaFileUpload(file_path, resumable=True)
-            file = (
-                self.service.files()
-                .create(body=file_metadata, media_body=media, fields="id")
-                .execute()
+            file_id = self.uploader.upload(
+                file_path, folder_id, file_name=file_name, on_progress=on_progress
             )
             print(
-                f"[Info] ファイルがGoogle Driveにアップロードされました。ファイルID: {file.get('id')}"
+                f"[Info] ファイルがGoogle Driveにアップロードされました。ファイルID: {file_id}"
             )
-            return file.get("id")
+            return file_id
         except Exception as e:
             print(f"[Error] アップロード中にエラーが発生しました: {e}")
             return None
 
+    def upload_files(self, jobs, on_progress=None):
+        """
+        複数ファイルを同時にGoogle Driveにアップロードします。
+
+        :param jobs: (file_path, folder_id, file_name) のリスト
+        :param on_progress: 進捗コールバック on_progress(file_path, uploaded_bytes, total_bytes)
+        :return: {file_path: ファイルID or None}
+        """
+        return self.uploader.upload_many(jobs, on_progress=on_progress)
+
+
+def print_upload_progress(file_path, uploaded, total):
+    """アップロードの進捗を表示"""
+    if total:
+        print(
+            f"\r[Info] アップロード中: {uploaded * 100 / total:.1f}% ({uploaded / 1024 / 1024:.1f}/{total / 1024 / 1024:.1f}MB)",
+            end="" if uploaded < total else "\n",
+            flush=True,
+        )
+
 
 if __name__ == "__main__":
     # --- Google Drive接続確認 ---
@@ -586,54 +538,76 @@ if __name__ == "__main__":
     print("=" * 60)
 
     user_input = input(
-        "動画URLまたはローカルファイルのパスを入力してください: "
+        "動画URL（スペース区切りで複数指定可）またはローカルファイルのパスを入力してください: "
     ).strip()
 
     # ファイルパスかURLかを判定
     is_local_file = os.path.exists(user_input)
+    downloaded_files = []
+    # ダウンロードしたファイル -> URL（処理が終わったらアーカイブに記録する）
+    source_urls = {}
 
     if is_local_file:
         # ローカルファイルのパスが入力された場合
         print(f"[Info] ローカルファイルを使用します: {user_input}")
         print("[Info] 縦型動画の編集を開始します...")
-        downloaded_file = user_input
+        downloaded_files.append(user_input)
     else:
-        # 動画URLとして処理
-        print(f"[Info] 動画をダウンロードします: {user_input}")
+        # 動画URLとして処理（複数URLは同時にダウンロード）
+        urls = user_input.split()
+        print(f"[Info] 動画をダウンロードします: {len(urls)}件")
         downloader = MediaDownloader()
-        info = downloader.download_video(user_input)
-
-        if info:
-            downloaded_file = info.get("filepath")
-            if not (downloaded_file and os.path.exists(downloaded_file)):
-                print("[Error] ダウンロードされたファイルが見つかりませんでした。")
-                downloaded_file = None
-        else:
-            print("[Error] ダウンロードに失敗したため、動画編集は行いません。")
-            downloaded_file = None
+        results = downloader.download_videos(urls)
+
+        for url in urls:
+            result = results[url]
+            if result["status"] == "downloaded" and result["filepath"]:
+                if result["filepath"] not in downloaded_files:
+                    downloaded_files.append(result["filepath"])
+                    source_urls[result["filepath"]] = url
+            elif result["status"] == "skipped":
+                print(f"[Info] アーカイブ済みのため処理しません: {url}")
+            else:
+                print(f"[Error] ダウンロードに失敗したため、動画編集は行いません: {url}")
 
     # ダウンロード済みまたはローカルファイルが存在する場合に編集を実行
-    if downloaded_file:
+    for downloaded_file in downloaded_files:
         print(f"[Info] 動画ファイルを処理します: {downloaded_file}")
         print("[Info] 縦型動画の編集を開始します...")
 
         # --- 縦型動画変換 ---
-        output_vertical_file = "output_vertical.mp4"
+        # 失敗したときに残したファイルを次の動画で上書きしないよう、動画ごとに名前を分ける
+        output_vertical_file = (
+            f"{os.path.splitext(os.path.basename(downloaded_file))[0]}_vertical.mp4"
+        )
+        if os.path.exists(output_vertical_file):
+            os.remove(output_vertical_file)
         converter = VideoVerticalConverter(
             input_path=downloaded_file, output_path=output_vertical_file
         )
-        converter.generate()
+        try:
+            converter.generate()
+        except Exception as e:
+            print(f"[Error] 縦型動画の変換中にエラーが発生しました: {e}")
+        converted = os.path.exists(output_vertical_file)
+        uploaded = False
 
         # --- Google Driveアップロード ---
-        if drive_available:
+        if not converted:
+            print("[Error] 縦型動画を生成できなかったため、アップロードをスキップします。")
+        elif drive_available:
             print(f"[Info] Google Driveにアップロード中... (フォルダーID: {folder_id})")
             # 元の動画ファイル名をそのまま使用
             original_filename = os.path.basename(downloaded_file)
 
             result = drive_manager.upload_file(
-                output_vertical_file, folder_id, file_name=original_filename
+                output_vertical_file,
+                folder_id,
+                file_name=original_filename,
+                on_progress=print_upload_progress,
             )
-            if not result:
+            uploaded = bool(result)
+            if not uploaded:
                 print(
                     "[Error] Google Driveへのアップロードに失敗しました。ファイルはローカルに保持されます。"
                 )
@@ -642,6 +616,13 @@ if __name__ == "__main__":
                 "[Info] Google Driveへのアップロードをスキップします（接続確認に失敗しました）"
             )
 
+        # 変換・アップロードに失敗した動画はアーカイブに記録せず、ファイルも残す（次回やり直せる）
+        if not uploaded:
+            print(f"[Info] 処理が完了しなかったため、ファイルを残します: {downloaded_file}")
+            continue
+        if downloaded_file in source_urls:
+            downloader.record(source_urls[downloaded_file], downloaded_file)
+
         # --- ファイルのクリーンアップ ---
         print("[Info] 不要なファイルを削除しています...")
         # ファイルハンドルが完全に解放されるまで少し待機
@@ -1,14 +1,22 @@
 import os
+import sys
 
 import requests
 from bs4 import BeautifulSoup
 
+# 共通モジュール（Python/http_cache.py）を読み込めるようにする
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from http_cache import CachedSession
+
 # 3級のページURL
 url = "https://zensho.or.jp/examination/pastexams/english/"
+# 公開済みのPDFは変わらないので、保存済みのものを30日間は再検証しない
+PDF_TTL = 30 * 24 * 60 * 60
+session = CachedSession()
 
 try:
     # HTTPリクエストを送信してページの内容を取得
-    response = requests.get(url)
+    response = session.get(url)
     response.raise_for_status()
 
     # BeautifulSoupを使ってHTMLを解析
@@ -28,7 +36,7 @@ try:
     # PDFをダウンロード
     for pdf_link in pdf_links:
         try:
-            pdf_response = requests.get(pdf_link)
+            pdf_response = session.get(pdf_link, ttl=PDF_TTL)
             pdf_response.raise_for_status()
 
             # ファイル名から回数を抽出してファイル名を作成
@@ -42,6 +50,8 @@ try:
         except requests.RequestException as e:
             print(f"Failed to download {pdf_link}: {e}")
 
+    session.print_stats()
+
 except requests.RequestException as e:
     print(f"Failed to retrieve the page: {e}")
 except Exception as e:
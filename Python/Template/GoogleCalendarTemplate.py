@@ -1,14 +1,16 @@
 import datetime
 import json
 import os
+import sys
 from pathlib import Path
 
 import pandas as pd
 from dotenv import load_dotenv
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+
+# 共通モジュール（Python/google_client.py）を読み込めるようにする
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from calendar_batch_writer import CalendarBatchWriter
+from google_client import build_service, load_credentials
 
 load_dotenv()
 
@@ -59,32 +61,13 @@ def main():
 
 class GoogleCalendar:
     def __init__(self):
-        self.creds = None  # 認証情報の初期化
-        if os.path.exists(
-            "../tokens/token.json"
-        ):  # credentials.json ファイルに保存された認証情報をロードする
-            self.creds = Credentials.from_authorized_user_file("../tokens/token.json")
-
-        # 認証情報(token.json)がない場合や期限切れの場合は、ユーザーに認証を求める
-        if (
-            not self.creds or not self.creds.valid
-        ):  # cerds.validはtrueかfalseを返し、切れている場合はtrue
-            if (
-                self.creds and self.creds.expired and self.creds.refresh_token
-            ):  # tokenがあった場合、期限切れかどうかを確認
-                self.creds.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file(  # tokenがない場合、認証を行う
-                    "Calendar_credentials.json",
-                    ["https://www.googleapis.com/auth/calendar.events"],
-                )
-                self.creds = flow.run_local_server(port=0)
-            # 認証情報を保存する
-            with open("../tokens/token.json", "w") as token:
-                token.write(
-                    self.creds.to_json()
-                )  # 認証情報が入っているself.credsをjson形式に変換して保存する
-        self.service = build("calendar", "v3", credentials=self.creds)
+        # 認証情報(token.json)の読み込み・更新は google_client.py にまとめている
+        self.creds = load_credentials(
+            "token.json",
+            ["https://www.googleapis.com/auth/calendar.events"],
+            "Calendar_credentials.json",
+        )
+        self.service = build_service("calendar", "v3", self.creds)
         print("[Info] Google Calendarに接続しました")
 
     # Googleカレンダーのイベントを取得する
@@ -148,6 +131,15 @@ class GoogleCalendar:
         """タイトル,詳細,予定開始時間,予定終了時間"""
         csv_file = input("CSVファイルのパスを入力してください: ")
         df = pd.read_csv(csv_file)
+
+        def print_result(title, event, error):
+            if error is None:
+                print(f"{title}を追加しました")
+            else:
+                print(f"{title}の追加に失敗しました: {error}")
+
+        # 1件ずつinsertせず、バッチリクエストでまとめて追加する
+        writer = CalendarBatchWriter(self.service, Calendar_id, on_result=print_result)
         for index, row in df.iterrows():
             event = {
                 "summary": row["タイトル"],
@@ -159,8 +151,8 @@ class GoogleCalendar:
                 event["description"] = row["詳細"]
             if pd.notna(row["場所"]):
                 event["location"] = row["場所"]
-            self.service.events().insert(calendarId=Calendar_id, body=event).execute()
-            print(f"{row['タイトル']}を追加しました")
+            writer.add(event, label=row["タイトル"])
+        writer.flush()
 
 
 if __name__ == "__main__":
@@ -1,11 +1,13 @@
+import os
+import sys
 from pathlib import Path
 
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+# 共通モジュール（Python/google_client.py）を読み込めるようにする
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from google_client import build_service, load_credentials
+
 # スコープを変更した場合は、既存トークンを削除して再認証する
 SCOPES = [
     "https://www.googleapis.com/auth/classroom.courses.readonly",
@@ -40,28 +42,13 @@ class GoogleClassroom:
         )
 
     def authenticate(self):
-        # 既存トークンがあれば読み込む
-        if self.token_path.exists():
-            self.creds = Credentials.from_authorized_user_file(
-                str(self.token_path), SCOPES
-            )
-
-        # トークンが無効ならリフレッシュ or OAuth フローで再取得
-        if not self.creds or not self.creds.valid:
-            if self.creds and self.creds.expired and self.creds.refresh_token:
-                self.creds.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    str(self.credentials_path), SCOPES
-                )
-                self.creds = flow.run_local_server(port=0)
-
-            # 取得したトークンを保存して次回以降の認証を省略
-            self.token_path.parent.mkdir(parents=True, exist_ok=True)
-            self.token_path.write_text(self.creds.to_json(), encoding="utf-8")
+        # 既存トークンの読み込み・リフレッシュ・OAuth フロー・保存は google_client.py にまとめている
+        self.creds = load_credentials(
+            str(self.token_path), SCOPES, str(self.credentials_path)
+        )
 
         # Classroom API クライアントを生成
-        self.service = build("classroom", "v1", credentials=self.creds)
+        self.service = build_service("classroom", "v1", self.creds)
         print("[Info] Connected to Google Classroom API.")
 
     def list_courses(self, page_size: int = 10):
@@ -1,12 +1,13 @@
 import os
+import sys
 
 from dotenv import load_dotenv
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+# 共通モジュール（Python/google_client.py）を読み込めるようにする
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from google_client import build_service, load_credentials
+
 load_dotenv()
 
 # OAuth 2.0のスコープ
@@ -26,45 +27,17 @@ class GoogleDriveTemplate:
 
     def authenticate(self):
         """OAuth 2.0を使用してGoogle Driveサービスの認証を行います。"""
-        creds = None
-        
-        # トークンファイルが存在する場合は読み込む
-        if os.path.exists(self.token_json_path):
-            creds = Credentials.from_authorized_user_file(self.token_json_path, SCOPES)
-        
-        # 認証情報が無効または存在しない場合
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                # トークンをリフレッシュ
-                try:
-                    creds.refresh(Request())
-                    print("トークンをリフレッシュしました。")
-                except Exception as e:
-                    print(f"トークンのリフレッシュに失敗しました: {e}")
-                    creds = None
-            
-            if not creds:
-                # 新しい認証フローを開始
-                try:
-                    flow = InstalledAppFlow.from_client_secrets_file(
-                        self.credentials_json_path, SCOPES)
-                    creds = flow.run_local_server(port=0)
-                    print("新しい認証を完了しました。")
-                except Exception as e:
-                    print(f"認証中にエラーが発生しました: {e}")
-                    return None
-            
-            # トークンを保存
-            try:
-                os.makedirs(os.path.dirname(self.token_json_path), exist_ok=True)
-                with open(self.token_json_path, 'w') as token:
-                    token.write(creds.to_json())
-                print(f"トークンを保存しました: {self.token_json_path}")
-            except Exception as e:
-                print(f"トークンの保存に失敗しました: {e}")
-        
+        # トークンの読み込み・リフレッシュ・保存は google_client.py にまとめている
+        try:
+            creds = load_credentials(
+                self.token_json_path, SCOPES, self.credentials_json_path
+            )
+        except Exception as e:
+            print(f"認証中にエラーが発生しました: {e}")
+            return None
+
         try:
-            service = build('drive', 'v3', credentials=creds)
+            service = build_service('drive', 'v3', creds)
             print("認証に成功しました。")
             return service
         except Exception as e:
@@ -1,11 +1,12 @@
 import base64
 import os.path
+import sys
 
 from dotenv import load_dotenv
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+
+# 共通モジュール（Python/google_client.py）を読み込めるようにする
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from google_client import build_service, load_credentials
 
 load_dotenv()
 
@@ -23,26 +24,13 @@ class Gmail:
         self.authenticate()
 
     def authenticate(self):
-        if os.path.exists("../tokens/gmail_token.json"):
-            self.creds = Credentials.from_authorized_user_file(
-                "../tokens/gmail_token.json", self.scope
-            )
-        if not self.creds or not self.creds.valid:
-            if self.creds and self.creds.expired and self.creds.refresh_token:
-                self.creds.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    "credentials.json", self.scope
-                )
-                self.creds = flow.run_local_server(port=0)
-            with open("../tokens/gmail_token.json", "w") as token:
-                token.write(self.creds.to_json())
-        self.service = build("gmail", "v1", credentials=self.creds)
+        self.creds = load_credentials("gmail_token.json", self.scope)
+        self.service = build_service("gmail", "v1", self.creds)
         print("認証完了")
 
     # 最新のメッセージを取得する
     def get_latest_message(self):
-        service = build("gmail", "v1", credentials=self.creds)
+        service = self.service
         results = service.users().messages().list(userId="me", maxResults=1).execute()
         messages = results.get("messages", [])
 
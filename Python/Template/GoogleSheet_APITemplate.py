@@ -1,10 +1,10 @@
 import os
-import pickle
+import sys
 import time
 
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+# 共通モジュール（Python/google_client.py）を読み込めるようにする
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from google_client import build_service, load_credentials
 
 # スコープ設定
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
@@ -20,29 +20,12 @@ def main():
 class GoogleSpreadSheet:
     def __init__(self, spreadsheet_id):
         self.spreadsheet_id = spreadsheet_id
-        self.creds = None
 
-        # token.pickleが存在する場合はそれを読み込み、認証情報を再利用
-        if os.path.exists("../tokens/token.pickle"):
-            with open("../tokens/token.pickle", "rb") as token:
-                self.creds = pickle.load(token)
-
-        # 認証情報がない場合、または無効な場合、再認証を行う
-        if not self.creds or not self.creds.valid:
-            if self.creds and self.creds.expired and self.creds.refresh_token:
-                self.creds.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    "credentials.json", SCOPES
-                )
-                self.creds = flow.run_local_server(port=0)
-
-            # 新しい認証情報をtoken.pickleに保存
-            with open("../tokens/token.pickle", "wb") as token:
-                pickle.dump(self.creds, token)
+        # token.pickleの読み込み・再認証・保存は google_client.py にまとめている
+        self.creds = load_credentials("token.pickle", SCOPES)
 
         # Google Sheets APIのサービスを作成
-        self.service = build("sheets", "v4", credentials=self.creds)
+        self.service = build_service("sheets", "v4", self.creds)
 
     def get_column_data(self, column):  # 特定の列のデータを取得する
         sheet_name = self.get_sheet_name()
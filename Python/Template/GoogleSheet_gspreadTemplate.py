@@ -1,12 +1,13 @@
 import os.path
-import pickle
+import sys
 
 import gspread
 from dotenv import load_dotenv
-from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+
+# 共通モジュール（Python/google_client.py）を読み込めるようにする
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from google_client import build_service, load_credentials
 
 load_dotenv()
 
@@ -23,21 +24,7 @@ class GoogleSpreadsheet:
             "https://www.googleapis.com/auth/spreadsheets",
         ]
 
-        self.creds = None
-        if os.path.exists("../tokens/sheet_token.json"):
-            self.creds = Credentials.from_authorized_user_file(
-                "../tokens/sheet_token.json", self.scope
-            )
-        if not self.creds or not self.creds.valid:
-            if self.creds and self.creds.expired and self.creds.refresh_token:
-                self.creds.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    "credentials.json", self.scope
-                )
-                self.creds = flow.run_local_server(port=0)
-            with open("../tokens/sheet_token.json", "w") as token:
-                token.write(self.creds.to_json())
+        self.creds = load_credentials("sheet_token.json", self.scope)
         self.client = gspread.authorize(self.creds)
         self.spreadsheet = self.client.open_by_key(spreadsheet_id)
         self.sheet = self.spreadsheet.sheet1  # 最初のシートにアクセス
@@ -66,24 +53,17 @@ class GoogleSpreadsheet_Drive:
         self.authenticate()
 
     def authenticate(self):
-        if os.path.exists(self.token_path):
-            with open(self.token_path, "rb") as token:
-                self.creds = pickle.load(token)
-
-        if not self.creds or not self.creds.valid:
-            if self.creds and self.creds.expired and self.creds.refresh_token:
-                self.creds.refresh(Request())
-            elif os.path.exists(self.credentials_path):
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    self.credentials_path, self.SCOPES
-                )
-                self.creds = flow.run_local_server(port=0)
-            with open(self.token_path, "wb") as token:
-                pickle.dump(self.creds, token)
+        # token.pickleの読み込み・リフレッシュ・保存は google_client.py にまとめている
+        try:
+            self.creds = load_credentials(
+                self.token_path, self.SCOPES, self.credentials_path
+            )
+        except FileNotFoundError as e:
+            print(f"[Error] {e}")
 
         if self.creds and self.creds.valid:
-            self.drive = build("drive", "v3", credentials=self.creds)
-            self.sheets = build("sheets", "v4", credentials=self.creds)
+            self.drive = build_service("drive", "v3", self.creds)
+            self.sheets = build_service("sheets", "v4", self.creds)
             self.client = gspread.authorize(self.creds)
         else:
             print("[Error] Drive or Sheets auth failed.")
@@ -1,51 +1,44 @@
 import ctypes
 import html
-import glob
 import os
 import re
-import subprocess
 import time
-import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from ytdlp_engine import get_engine
+
+# キューごとに使う正規表現は最初に1回だけコンパイルしておく
+TIMESTAMP_PATTERN = re.compile(r"(?:(\d+):)?(\d{2}):(\d{2})\.(\d{3})")
+TAG_PATTERN = re.compile(r"<[^>]+>")
+ZERO_WIDTH_PATTERN = re.compile(r"[\u200b-\u200d\ufeff]")  # zero-width 系
+SPACE_PATTERN = re.compile(r"\s+")
+INVALID_FILENAME_PATTERN = re.compile(r'[\\/:*?"<>|]')
 
 
 def download_vtt(video_url, ytdlp_path, output_name="subtitle"):
-    """yt-dlpを使って字幕(VTT)をダウンロードする"""
-    command = [
-        ytdlp_path,
-        "--write-subs",           # 字幕を書き込む
-        "--skip-download",        # 動画本体はダウンロードしない
-        "--sub-lang", "ja",       # 言語指定（日本語固定）
-        "--sub-format", "vtt",    # 取得形式を明示
-        "--output", output_name,
-        video_url
-    ]
-    
+    """yt-dlpを使って字幕(VTT)をダウンロードする（yt-dlpはプロセス内で使い回す）"""
     print(f"字幕を取得中...: {video_url}")
-    subprocess.run(command, check=True)
-    
-    # yt-dlpは output_name.ja.vtt / output_name.ja-orig.vtt のような名前で保存することがある
-    # 古い同名ファイルを拾わないよう、更新日時が最も新しいものを採用する
-    candidates = [path for path in glob.glob(f"{output_name}*.vtt") if os.path.exists(path)]
-    if candidates:
-        return max(candidates, key=os.path.getmtime)
-    return None
+    # 言語は日本語固定、動画本体はダウンロードしない
+    return get_engine(ytdlp_path).download_subtitles(video_url, "ja", output_name, "vtt")
 
 def _to_lrc_timestamp(raw_time: str) -> str | None:
-    """VTT hh:mm:ss.mmm を LRC [mm:ss.xx] へ変換"""
-    match = re.match(r"(\d+):(\d{2}):(\d{2})\.(\d{3})", raw_time)
+    """VTT hh:mm:ss.mmm（時間は省略可）を LRC [mm:ss.xx] へ変換"""
+    match = TIMESTAMP_PATTERN.match(raw_time)
     if not match:
         return None
     hh, mm, ss, mmm = match.groups()
-    total_mm = int(hh) * 60 + int(mm)
+    total_mm = int(hh or 0) * 60 + int(mm)
     return f"[{total_mm:02}:{ss}.{mmm[:2]}]"
 
 
 def _clean_text(text: str) -> str:
     # HTMLタグやスタイルを除去し、エンティティや不可視文字を掃除
-    text = re.sub(r"<[^>]+>", "", text)
-    text = html.unescape(text)
-    text = re.sub(r"[\u200b-\u200d\ufeff]", "", text)  # zero-width 系
-    text = re.sub(r"\s+", " ", text).strip()
+    if "<" in text:
+        text = TAG_PATTERN.sub("", text)
+    if "&" in text:
+        text = html.unescape(text)
+    text = ZERO_WIDTH_PATTERN.sub("", text)
+    text = SPACE_PATTERN.sub(" ", text).strip()
     return text
 
 
@@ -109,26 +102,67 @@ def copy_to_clipboard(text: str):
     raise OSError("クリップボードを開けませんでした")
 
 
-def vtt_to_lrc(vtt_file):
-    """VTT形式をLRC形式 [mm:ss.xx] の文字列へ変換する"""
-    with open(vtt_file, "r", encoding="utf-8-sig") as f:
-        content = f.read()
+def _iter_lines(source):
+    """
+    bytes / str / 行のイテレーター（bytesまたはstr）から1行ずつ取り出す。
+    ファイル全体を読み込まずに、ファイルオブジェクトやネットワークの応答をそのまま流せる。
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = source.decode("utf-8-sig")
+    if isinstance(source, str):
+        source = source.splitlines()
 
-    blocks = content.split("\n\n")
-    lrc_lines = []
-    seen_ts = set()  # 同一タイムスタンプは最初の1行だけ残す
-    last_text = ""
+    first = True
+    for line in source:
+        if isinstance(line, (bytes, bytearray)):
+            line = line.decode("utf-8", errors="replace")
+        if first:
+            line = line.lstrip("\ufeff")
+            first = False
+        yield line
 
-    for block in blocks:
-        lines = [ln.strip() for ln in block.splitlines() if ln.strip()]
-        if not lines:
+
+def iter_cues(source):
+    """
+    VTTを1キューずつ解析して (開始時刻, 本文) を返すジェネレーター
+
+    :param source: VTTのbytes / str / 行のイテレーター
+    """
+    block = []
+    for line in _iter_lines(source):
+        line = line.strip()
+        if line:
+            block.append(line)
             continue
+        if block:
+            cue = _parse_block(block)
+            if cue:
+                yield cue
+            block = []
+
+    if block:
+        cue = _parse_block(block)
+        if cue:
+            yield cue
+
+
+def _parse_block(lines):
+    """空行で区切られた1ブロックからキューを取り出す（ヘッダやNOTEはNone）"""
+    # キューIDがある場合はタイミング行が2行目になる
+    for index, line in enumerate(lines[:2]):
+        if "-->" in line:
+            start_raw = line.split("-->", 1)[0].strip()
+            return start_raw, " ".join(lines[index + 1:])
+    return None
+
 
-        time_line = lines[0]
-        if "-->" not in time_line:
-            continue  # ヘッダやNOTEをスキップ
+def convert_vtt(source):
+    """VTT（bytes / str / 行のイテレーター）をLRC形式 [mm:ss.xx] の文字列へ変換する"""
+    lrc_lines = []
+    seen_ts = set()  # 同一タイムスタンプは最初の1行だけ残す
+    last_text = ""
 
-        start_raw = time_line.split("-->")[0].strip()
+    for start_raw, text in iter_cues(source):
         lrc_time = _to_lrc_timestamp(start_raw)
         if not lrc_time:
             continue
@@ -136,7 +170,7 @@ def vtt_to_lrc(vtt_file):
         if lrc_time in seen_ts:
             continue
 
-        text_body = _clean_text(" ".join(lines[1:]))
+        text_body = _clean_text(text)
         if not text_body:
             continue
 
@@ -149,6 +183,66 @@ def vtt_to_lrc(vtt_file):
 
     return "\n".join(lrc_lines)
 
+
+def vtt_to_lrc(vtt_file):
+    """VTTファイルをLRC形式 [mm:ss.xx] の文字列へ変換する（1行ずつ読み込む）"""
+    with open(vtt_file, "r", encoding="utf-8-sig") as f:
+        return convert_vtt(f)
+
+
+def fetch_lrc(video_url, ytdlp_path, lang="ja"):
+    """字幕を一時ファイルを使わずにメモリ上で取得してLRCに変換する"""
+    data = get_engine(ytdlp_path).fetch_subtitles(video_url, lang, "vtt")
+    if not data:
+        return None
+    return convert_vtt(data)
+
+
+def batch_convert_playlist(playlist_url, ytdlp_path, output_dir="lrc_output", lang="ja", max_workers=4):
+    """
+    プレイリスト内の全動画の字幕を同時に取得し、動画ごとに .lrc を書き出す
+
+    :return: 書き出した .lrc ファイルのパスのリスト
+    """
+    engine = get_engine(ytdlp_path)
+    data = engine.extract_info(playlist_url, flat_playlist=True)
+    if not data:
+        print("[Error] プレイリストの取得に失敗しました")
+        return []
+
+    # 同じ動画が複数回入っていても、同じファイルに同時に書き込まないよう1回だけ変換する
+    entries = list(
+        {e["id"]: e for e in data.get("entries") or [] if e.get("id")}.values()
+    )
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"[Info] {len(entries)}件の字幕を取得します（同時{max_workers}件）")
+
+    def convert_entry(entry):
+        video_url = f"https://www.youtube.com/watch?v={entry['id']}"
+        try:
+            lrc_text = fetch_lrc(video_url, ytdlp_path, lang)
+        except Exception as e:
+            print(f"[Error] 字幕の取得に失敗しました: {video_url} - {e}")
+            return None
+        if not lrc_text:
+            print(f"[Info] 字幕がありません: {video_url}")
+            return None
+
+        # 同じタイトルの動画で上書きし合わないよう、ファイル名に動画IDを付ける
+        title = INVALID_FILENAME_PATTERN.sub("_", entry.get("title") or entry["id"]).strip()
+        lrc_path = os.path.join(output_dir, f"{title} [{entry['id']}].lrc")
+        with open(lrc_path, "w", encoding="utf-8") as f:
+            f.write(lrc_text)
+        print(f"[Info] 保存完了: {lrc_path}")
+        return lrc_path
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(convert_entry, entries))
+
+    saved = [path for path in results if path]
+    print(f"[Info] 一括変換完了: {len(saved)}/{len(entries)}件")
+    return saved
+
 def main():
     # 設定
     # yt-dlpのパスを指定してください (例: "C:/tools/yt-dlp.exe" や "/usr/local/bin/yt-dlp")
@@ -156,25 +250,27 @@ def main():
     
     url = input("YouTubeのURLを入力してください: ")
     path = input(f"yt-dlpのパスを入力してください (空欄で '{default_ytdlp}'): ") or default_ytdlp
+    
+    # プレイリストURLなら全動画を一括で変換できる
+    if "list=" in url and input("プレイリストの全動画を一括変換しますか？ (y/N): ").strip().lower() == "y":
+        batch_convert_playlist(url, path)
+        return
+    
     copy_mode = input("クリップボードにもコピーしますか？ (y/N): ").strip().lower() == "y"
     
-    output_base = f"lyrics_output_{uuid.uuid4().hex}"
-    vtt_path = download_vtt(url, path, output_base)
+    # 字幕は一時ファイルを作らずメモリ上で変換する
+    print(f"字幕を取得中...: {url}")
+    lrc_text = fetch_lrc(url, path)
     
-    if vtt_path:
-        lrc_text = vtt_to_lrc(vtt_path)
-        try:
-            if copy_mode:
-                copy_to_clipboard(lrc_text)
-                print("クリップボードにコピーしました。")
-            else:
-                lrc_path = "lyrics_output.lrc"
-                with open(lrc_path, "w", encoding="utf-8") as f:
-                    f.write(lrc_text)
-                print(f"保存完了: {lrc_path}")
-        finally:
-            if os.path.exists(vtt_path):
-                os.remove(vtt_path)
+    if lrc_text:
+        if copy_mode:
+            copy_to_clipboard(lrc_text)
+            print("クリップボードにコピーしました。")
+        else:
+            lrc_path = "lyrics_output.lrc"
+            with open(lrc_path, "w", encoding="utf-8") as f:
+                f.write(lrc_text)
+            print(f"保存完了: {lrc_path}")
     else:
         print("字幕の取得に失敗しました。字幕設定がオフの動画かもしれません。")
 
@@ -1,10 +1,13 @@
-import glob
+import json
 import os
+import queue
+import shutil
 import subprocess
 import tempfile
 import threading
 import time
 import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import filedialog, messagebox, ttk
 
 import cv2
@@ -14,11 +17,9 @@ from PIL import Image, ImageTk
 
 load_dotenv()
 
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from download_manager import DownloadManager
+from drive_upload_manager import DriveUploadManager
+from google_client import get_service, load_credentials
 
 # スクリプトのディレクトリとプロジェクトルートを取得
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -26,11 +27,25 @@ PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
 TOKENS_DIR = os.path.join(PROJECT_ROOT, 'tokens')
 
 
+def resolve_executable(env_name, executable_name, default_path=None):
+    """環境変数 → PATH → 既定パスの順で実行ファイルを探す"""
+    env_path = os.getenv(env_name)
+    candidates = [env_path, shutil.which(executable_name), default_path]
+
+    for candidate in candidates:
+        if candidate and os.path.exists(candidate):
+            return candidate
+
+    return env_path or shutil.which(executable_name) or default_path or executable_name
+
+
 class YoutubeDownloader:
     """YouTube動画のダウンロードを管理するクラス"""
     
     def __init__(self):
         self.ytdlp_path = os.getenv("YT-DLP_PATH")
+        # プレビューや切り出しは一時ファイルなのでアーカイブは使わない
+        self.manager = DownloadManager(self.ytdlp_path, max_workers=2)
 
     def download_video(self, url, output_path='.', quality='best', start_time=None, end_time=None):
         """
@@ -43,10 +58,6 @@ class YoutubeDownloader:
         :param end_time: 終了時刻（秒）
         :return: ダウンロードされたファイルパス or None
         """
-        before_files = set(glob.glob(os.path.join(output_path, "*.mp4")))
-        
-        output_template = os.path.join(output_path, "%(title)s.%(ext)s")
-        
         # 品質設定
         if quality == 'worst':
             format_str = "worst[ext=mp4]/worst"
@@ -55,64 +66,470 @@ class YoutubeDownloader:
         else:
             format_str = "bestvideo[height<=1080][ext=mp4]+bestaudio[ext=m4a]/best[height<=1080][ext=mp4]/best[height<=1080]"
         
+        # 時間範囲指定がある場合
+        sections = None
+        if start_time is not None and end_time is not None:
+            sections = (start_time, end_time)
+        
+        print(f"[Info] 動画をダウンロード中... ({quality})")
+        result = self.manager.download(url, format_str, sections=sections, output_path=output_path)
+        return result["filepath"] if result["status"] == "downloaded" else None
+
+    def download_preview_progressive(self, url, output_file, on_progress=None):
+        """
+        プレビュー用の低画質動画を、再生しながら読めるようにダウンロードします。
+        .partを使わず最終ファイルに直接書き込むので、ダウンロード中のファイルをプレーヤーで開ける。
+
+        :param url: ダウンロードする動画のURL
+        :param output_file: 書き込み先のファイルパス
+        :param on_progress: 進捗コールバック on_progress(downloaded_bytes, total_bytes, duration)
+        :return: ダウンロードされたファイルパス or None
+        """
         command = [
             self.ytdlp_path,
-            "-f", format_str,
-            "-o", output_template,
+            # 単一ファイル（映像+音声）のmp4なら先頭にmoovがあり、書き込み途中でも再生できる
+            "-f", "worst[ext=mp4][vcodec!=none][acodec!=none]/worst[ext=mp4]",
+            "-o", output_file,
             "--no-playlist",
-            "--print", "after_move:filepath",
+            "--no-part",
+            "--newline",
+            "--progress",
+            "--print", "before_dl:DURATION %(duration)s",
+            "--progress-template",
+            "download:PROGRESS %(progress.downloaded_bytes)s %(progress.total_bytes)s %(progress.total_bytes_estimate)s",
+            url,
         ]
-        
-        # 時間範囲指定がある場合
-        if start_time is not None and end_time is not None:
-            command.extend([
-                "--download-sections", f"*{start_time}-{end_time}",
-                "--force-keyframes-at-cuts"
-            ])
-        
-        command.append(url)
-        
+
+        duration = None
         try:
-            print(f"[Info] 動画をダウンロード中... ({quality})")
-            result = subprocess.run(
+            print("[Info] プレビュー用動画をプログレッシブにダウンロード中（低画質）...")
+            process = subprocess.Popen(
                 command,
-                check=True,
-                capture_output=True,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
                 text=True,
                 encoding='utf-8',
                 errors='replace'
             )
-            
-            # ファイルパスを取得
-            output_lines = result.stdout.strip().split('\n')
-            downloaded_filepath = None
-            for line in reversed(output_lines):
+
+            output_lines = []
+            for line in process.stdout:
                 line = line.strip()
-                if line.endswith('.mp4') and os.path.exists(line):
-                    downloaded_filepath = line
-                    break
-            
-            if not downloaded_filepath:
-                after_files = set(glob.glob(os.path.join(output_path, "*.mp4")))
-                new_files = after_files - before_files
-                if new_files:
-                    downloaded_filepath = list(new_files)[0]
-                elif after_files:
-                    downloaded_filepath = max(after_files, key=os.path.getmtime)
-            
-            if downloaded_filepath and os.path.exists(downloaded_filepath):
-                print(f"[Info] ダウンロード完了: {downloaded_filepath}")
-                return downloaded_filepath
-            else:
-                print("[Error] ダウンロードされたファイルが見つかりませんでした。")
+                output_lines.append(line)
+                if line.startswith("DURATION "):
+                    try:
+                        duration = float(line.split()[1])
+                    except ValueError:
+                        duration = None
+                elif line.startswith("PROGRESS ") and on_progress:
+                    parts = line.split()
+                    downloaded = _to_number(parts[1]) if len(parts) > 1 else None
+                    total = _to_number(parts[2]) if len(parts) > 2 else None
+                    if total is None and len(parts) > 3:
+                        total = _to_number(parts[3])
+                    if downloaded is not None:
+                        on_progress(downloaded, total, duration)
+
+            process.wait()
+            if process.returncode != 0:
+                print("[Error] プレビューのダウンロードに失敗しました")
+                for line in output_lines[-10:]:
+                    print(f"[Error] {line}")
                 return None
-                
+
+            if os.path.exists(output_file):
+                print(f"[Info] プレビューのダウンロード完了: {output_file}")
+                return output_file
+            print("[Error] ダウンロードされたファイルが見つかりませんでした。")
+            return None
+
+        except Exception as e:
+            print(f"[Error] 予期しないエラー: {e}")
+            return None
+
+
+def _to_number(value):
+    """yt-dlpの進捗テンプレートの値（'NA'の場合あり）を数値に変換"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class LocalClipEngine:
+    """
+    ローカルにあるフル画質の動画から範囲を切り出すクラス（スマートカット）
+
+    キーフレーム間の中身はストリームコピーし、切り出し位置の前後の
+    GOPだけを再エンコードするので、再ダウンロードなしで数秒で切り出せる。
+    """
+
+    # ストリームコピーで連結できるコーデックと、端の再エンコードに使うエンコーダー
+    SMART_CUT_ENCODERS = {'h264': 'libx264', 'hevc': 'libx265'}
+    # MP4 の avcC/hvcC を Annex B に直し、SPS/PPS をストリーム内に入れるビットストリームフィルター
+    ANNEXB_FILTERS = {'h264': 'h264_mp4toannexb', 'hevc': 'hevc_mp4toannexb'}
+    # ffprobe のプロファイル名 -> エンコーダーの -profile:v
+    ENCODER_PROFILES = {
+        'h264': {
+            'Constrained Baseline': 'baseline',
+            'Baseline': 'baseline',
+            'Main': 'main',
+            'High': 'high',
+            'High 10': 'high10',
+            'High 4:2:2': 'high422',
+            'High 4:4:4 Predictive': 'high444',
+        },
+        'hevc': {
+            'Main': 'main',
+            'Main 10': 'main10',
+        },
+    }
+    # キーフレームの時刻を丸めて1つ前のキーフレームから始まらないよう、境界から少しずらす
+    KEYFRAME_EPSILON = 0.001
+
+    def __init__(self):
+        self.ffmpeg_path = resolve_executable(
+            "FFMPEG_PATH",
+            "ffmpeg",
+            "C:\\Users\\ron06\\AppData\\Local\\Microsoft\\WinGet\\Links\\ffmpeg.exe",
+        )
+        self.ffprobe_path = resolve_executable(
+            "FFPROBE_PATH",
+            "ffprobe",
+            "C:\\Users\\ron06\\AppData\\Local\\Microsoft\\WinGet\\Links\\ffprobe.exe",
+        )
+        # 同じ動画から何本も切り出すので、キーフレーム一覧とストリーム情報はファイルごとにキャッシュする
+        self._keyframe_cache = {}
+        self._stream_cache = {}
+        self._cache_lock = threading.Lock()
+
+    @staticmethod
+    def _format_time(seconds):
+        """ffmpegに渡す秒数（キーフレームの時刻が丸めでずれないよう6桁で渡す）"""
+        return f"{seconds:.6f}"
+
+    def _run(self, command):
+        """ffmpeg/ffprobeを実行して標準出力を返す"""
+        result = subprocess.run(
+            command,
+            check=True,
+            capture_output=True,
+            text=True,
+            encoding='utf-8',
+            errors='replace'
+        )
+        return result.stdout
+
+    def get_stream_info(self, source_path):
+        """
+        最初の映像・音声ストリームの情報を取得
+
+        :return: {'video': {...}, 'audio': {...} or None}（値は ffprobe の stream の項目）
+        """
+        with self._cache_lock:
+            if source_path in self._stream_cache:
+                return self._stream_cache[source_path]
+
+        output = self._run([
+            self.ffprobe_path, "-v", "error",
+            "-show_entries",
+            "stream=codec_type,codec_name,profile,level,pix_fmt,sample_rate,channels,bit_rate",
+            "-of", "json",
+            source_path,
+        ])
+        info = {'video': None, 'audio': None}
+        for stream in json.loads(output or '{}').get('streams', []):
+            codec_type = stream.get('codec_type')
+            if codec_type in info and info[codec_type] is None:
+                info[codec_type] = stream
+        if info['video'] is None:
+            raise ValueError(f"映像ストリームがありません: {source_path}")
+
+        with self._cache_lock:
+            self._stream_cache[source_path] = info
+        return info
+
+    def get_video_codec(self, source_path):
+        """映像ストリームのコーデック名を取得"""
+        return self.get_stream_info(source_path)['video'].get('codec_name', '')
+
+    def get_keyframes(self, source_path):
+        """
+        キーフレームの一覧を取得
+
+        :return: [(時刻（秒）, デコード順のパケット番号), ...]（時刻の昇順）
+        """
+        with self._cache_lock:
+            if source_path in self._keyframe_cache:
+                return self._keyframe_cache[source_path]
+
+        # パケット情報だけを読むのでデコードは発生しない
+        output = self._run([
+            self.ffprobe_path, "-v", "error",
+            "-select_streams", "v:0",
+            "-show_entries", "packet=pts_time,flags",
+            "-of", "csv=p=0",
+            source_path,
+        ])
+
+        # 出力はデコード順なので、行番号がそのままパケット番号になる
+        keyframes = []
+        for index, line in enumerate(output.splitlines()):
+            parts = line.strip().split(',')
+            if len(parts) < 2 or 'K' not in parts[1]:
+                continue
+            try:
+                keyframes.append((float(parts[0]), index))
+            except ValueError:
+                continue
+        keyframes.sort()
+
+        with self._cache_lock:
+            self._keyframe_cache[source_path] = keyframes
+        return keyframes
+
+    def _video_encode_args(self, video):
+        """元の映像と同じプロファイル・レベル・画素形式でエンコードする引数"""
+        codec = video.get('codec_name')
+        args = ["-c:v", self.SMART_CUT_ENCODERS[codec], "-preset", "veryfast", "-crf", "18"]
+        if video.get('pix_fmt'):
+            args += ["-pix_fmt", video['pix_fmt']]
+        profile = self.ENCODER_PROFILES[codec].get(video.get('profile'))
+        if profile:
+            args += ["-profile:v", profile]
+        level = video.get('level')
+        if isinstance(level, int) and level > 0:
+            if codec == 'h264':
+                # ffprobe は 4.0 を 40 のように返す
+                args += ["-level:v", f"{level / 10:.1f}"]
+            else:
+                # HEVC は level_idc = レベル x 30
+                args += ["-x265-params", f"level-idc={level / 30:.1f}"]
+        return args
+
+    @staticmethod
+    def _audio_encode_args(audio):
+        """元の音声と同じサンプリング周波数・チャンネル数・ビットレートでAACにする引数"""
+        args = ["-c:a", "aac"]
+        if audio.get('sample_rate'):
+            args += ["-ar", str(audio['sample_rate'])]
+        if audio.get('channels'):
+            args += ["-ac", str(audio['channels'])]
+        bit_rate = audio.get('bit_rate')
+        args += ["-b:a", str(bit_rate) if bit_rate and str(bit_rate).isdigit() else "192k"]
+        return args
+
+    def _encode_range(self, source_path, start, end, output_path):
+        """範囲全体を映像・音声ともに再エンコードして書き出す"""
+        info = self.get_stream_info(source_path)
+        video = info['video']
+        if video.get('codec_name') in self.SMART_CUT_ENCODERS:
+            video_args = self._video_encode_args(video)
+        else:
+            video_args = ["-c:v", "libx264", "-preset", "veryfast", "-crf", "18", "-pix_fmt", "yuv420p"]
+        audio_args = self._audio_encode_args(info['audio']) if info['audio'] else []
+        self._run([
+            self.ffmpeg_path, "-y", "-v", "error",
+            "-ss", self._format_time(start),
+            "-t", self._format_time(end - start),
+            "-i", source_path,
+            "-map", "0:v:0", "-map", "0:a:0?",
+            *video_args,
+            *audio_args,
+            "-avoid_negative_ts", "make_zero",
+            "-movflags", "+faststart",
+            output_path,
+        ])
+
+    def _encode_video_segment(self, source_path, start, end, output_path):
+        """
+        端の映像 [start, end) だけを元と同じ設定で再エンコードし、MPEG-TSで書き出す
+
+        -t は最初のフレームからの長さで数えるため、キーフレームとの継ぎ目がずれることがある。
+        trim の end は -ss からの時刻で切るので、継ぎ目のフレームが重複・欠落しない。
+        """
+        video = self.get_stream_info(source_path)['video']
+        self._run([
+            self.ffmpeg_path, "-y", "-v", "error",
+            "-ss", self._format_time(start),
+            "-i", source_path,
+            "-map", "0:v:0", "-an",
+            "-vf", f"trim=end={self._format_time(end - start)}",
+            *self._video_encode_args(video),
+            "-f", "mpegts",
+            output_path,
+        ])
+
+    def _copy_video_segment(self, source_path, start, packet_count, output_path):
+        """
+        キーフレームから packet_count 個のパケットをストリームコピーし、MPEG-TSで書き出す
+
+        ストリームコピーの -t はデコード順の時刻で打ち切るため、次のGOPのパケットが
+        混ざることがある。パケット数で区切れば、次のキーフレームの直前で正確に止まる。
+        Annex B に変換するので SPS/PPS がストリーム内に入り、
+        再エンコードした端とパラメーターが違っても連結後に正しくデコードできる。
+        """
+        codec = self.get_video_codec(source_path)
+        self._run([
+            self.ffmpeg_path, "-y", "-v", "error",
+            "-ss", self._format_time(start),
+            "-i", source_path,
+            "-map", "0:v:0", "-an",
+            "-frames:v", str(packet_count),
+            "-c:v", "copy",
+            "-bsf:v", self.ANNEXB_FILTERS[codec],
+            "-f", "mpegts",
+            output_path,
+        ])
+
+    def _encode_audio(self, source_path, start, end, output_path):
+        """切り出す範囲の音声をまとめてAACにする（継ぎ目で音声の形式が混ざらないようにする）"""
+        audio = self.get_stream_info(source_path)['audio']
+        self._run([
+            self.ffmpeg_path, "-y", "-v", "error",
+            "-ss", self._format_time(start),
+            "-t", self._format_time(end - start),
+            "-i", source_path,
+            "-map", "0:a:0", "-vn",
+            *self._audio_encode_args(audio),
+            "-f", "adts",
+            output_path,
+        ])
+
+    def _concat_segments(self, segment_paths, audio_path, output_path):
+        """映像のセグメントをconcat demuxerで無劣化連結し、音声と合わせてMP4にする"""
+        list_path = f"{output_path}.concat.txt"
+        with open(list_path, 'w', encoding='utf-8') as f:
+            for path in segment_paths:
+                escaped = os.path.abspath(path).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        command = [
+            self.ffmpeg_path, "-y", "-v", "error",
+            "-f", "concat", "-safe", "0",
+            "-i", list_path,
+        ]
+        if audio_path:
+            command += ["-i", audio_path, "-map", "0:v:0", "-map", "1:a:0"]
+        command += [
+            "-c", "copy",
+            "-movflags", "+faststart",
+            output_path,
+        ]
+        try:
+            self._run(command)
+        finally:
+            if os.path.exists(list_path):
+                os.remove(list_path)
+
+    def _decode_errors(self, path):
+        """出力を最後までデコードし、ffmpegが出したエラーを返す（問題なければ空文字列）"""
+        result = subprocess.run(
+            [self.ffmpeg_path, "-v", "error", "-i", path, "-f", "null", "-"],
+            capture_output=True,
+            text=True,
+            encoding='utf-8',
+            errors='replace'
+        )
+        if result.returncode != 0 and not result.stderr.strip():
+            return f"ffmpeg exited with {result.returncode}"
+        return result.stderr.strip()
+
+    def _smart_cut(self, source_path, start_time, end_time, copy_start, copy_end, output_path):
+        """
+        先頭・末尾のGOPを再エンコードし、間をストリームコピーして連結
+
+        :param copy_start: ストリームコピーを始めるキーフレーム（時刻, パケット番号）
+        :param copy_end: ストリームコピーを終えるキーフレーム（時刻, パケット番号）。このフレームは含めない
+        """
+        eps = self.KEYFRAME_EPSILON
+        (copy_start, start_packet), (copy_end, end_packet) = copy_start, copy_end
+        base, _ = os.path.splitext(output_path)
+        segment_paths = []
+        temp_paths = []
+        try:
+            if copy_start - start_time > 0.01:
+                head_path = f"{base}.head.ts"
+                temp_paths.append(head_path)
+                # copy_start のキーフレームは含めない
+                self._encode_video_segment(source_path, start_time, copy_start - eps, head_path)
+                segment_paths.append(head_path)
+
+            middle_path = f"{base}.middle.ts"
+            temp_paths.append(middle_path)
+            # キーフレームより少し後ろを指定して、そのキーフレームから始まるようにする。
+            # 末尾は copy_end のキーフレームの手前まで（そこから先は tail で再エンコードする）
+            self._copy_video_segment(source_path, copy_start + eps, end_packet - start_packet, middle_path)
+            segment_paths.append(middle_path)
+
+            if end_time - copy_end > 0.01:
+                tail_path = f"{base}.tail.ts"
+                temp_paths.append(tail_path)
+                self._encode_video_segment(source_path, copy_end - eps, end_time, tail_path)
+                segment_paths.append(tail_path)
+
+            audio_path = None
+            if self.get_stream_info(source_path)['audio']:
+                audio_path = f"{base}.audio.aac"
+                temp_paths.append(audio_path)
+                self._encode_audio(source_path, start_time, end_time, audio_path)
+
+            self._concat_segments(segment_paths, audio_path, output_path)
+        finally:
+            for path in temp_paths:
+                if os.path.exists(path):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+    def cut(self, source_path, start_time, end_time, output_path):
+        """
+        ローカルの動画から範囲を切り出します。
+
+        :param source_path: 切り出し元の動画ファイル
+        :param start_time: 開始時刻（秒）
+        :param end_time: 終了時刻（秒）
+        :param output_path: 出力ファイルパス
+        :return: 出力ファイルパス or None
+        """
+        if not os.path.exists(source_path):
+            print(f"[Error] 切り出し元の動画が見つかりません -> {source_path}")
+            return None
+
+        started = time.time()
+        try:
+            codec = self.get_video_codec(source_path)
+
+            if codec not in self.SMART_CUT_ENCODERS:
+                # ストリームコピーで連結できないコーデックは範囲全体を再エンコード
+                print(f"[Info] コーデック {codec} はスマートカット非対応のため全体を再エンコードします")
+                self._encode_range(source_path, start_time, end_time, output_path)
+            else:
+                keyframes = self.get_keyframes(source_path)
+                # 範囲内の最初と最後のキーフレームを探す
+                inner = [k for k in keyframes if start_time <= k[0] <= end_time]
+                copy_start = inner[0] if inner else None
+                copy_end = inner[-1] if inner else None
+
+                if copy_start is None or copy_end[0] - copy_start[0] < 0.5:
+                    # 範囲内にGOPが丸ごと入らない短いクリップは全体を再エンコード
+                    self._encode_range(source_path, start_time, end_time, output_path)
+                else:
+                    self._smart_cut(source_path, start_time, end_time, copy_start, copy_end, output_path)
+                    errors = self._decode_errors(output_path)
+                    if errors:
+                        print(f"[Warn] スマートカットの出力にデコードエラーがあるため全体を再エンコードします: {errors.splitlines()[0]}")
+                        self._encode_range(source_path, start_time, end_time, output_path)
+
+            print(f"[Info] ローカル切り出し完了: {output_path} ({time.time() - started:.1f}秒)")
+            return output_path
+
         except subprocess.CalledProcessError as e:
-            print(f"[Error] ダウンロードエラー: {e}")
+            print(f"[Error] ffmpegの実行に失敗: {e}")
             print(f"[Error] エラー出力: {e.stderr}")
             return None
         except Exception as e:
-            print(f"[Error] 予期しないエラー: {e}")
+            print(f"[Error] ローカル切り出しエラー: {e}")
             return None
 
 
@@ -137,6 +554,9 @@ class VideoVerticalConverter:
             print(f"[Error] 入力ファイルが見つかりません -> {self.input_path}")
             return
 
+        # 並列変換で衝突しないよう、一時音声ファイルは出力ファイルごとに分ける
+        temp_audiofile = f"{os.path.splitext(self.output_path)[0]}_temp-audio.m4a"
+
         original_clip = VideoFileClip(self.input_path)
         
         W, H = self.width, self.height
@@ -184,7 +604,7 @@ class VideoVerticalConverter:
                 self.output_path, 
                 codec='h264_nvenc',
                 audio_codec='aac',
-                temp_audiofile='temp-audio.m4a',
+                temp_audiofile=temp_audiofile,
                 remove_temp=True,
                 fps=original_clip.fps,
                 preset='medium',
@@ -199,7 +619,7 @@ class VideoVerticalConverter:
                 self.output_path, 
                 codec='libx264',
                 audio_codec='aac',
-                temp_audiofile='temp-audio.m4a',
+                temp_audiofile=temp_audiofile,
                 remove_temp=True,
                 fps=original_clip.fps,
                 threads=4,
@@ -220,42 +640,28 @@ class GoogleDriveManager:
             "https://www.googleapis.com/auth/drive.readonly",
         ]
         
-        credentials_path = os.path.join(TOKENS_DIR, 'credentials.json')
-        token_path = os.path.join(TOKENS_DIR, 'drive_token.json')
-        
-        self.creds = None
-        
-        if os.path.exists(token_path):
-            self.creds = Credentials.from_authorized_user_file(token_path, self.SCOPES)
-        
-        if not self.creds or not self.creds.valid:
-            if self.creds and self.creds.expired and self.creds.refresh_token:
-                try:
-                    self.creds.refresh(Request())
-                    print("[Info] トークンをリフレッシュしました")
-                except Exception as e:
-                    print(f"[Error] トークンのリフレッシュに失敗: {e}")
-                    self.creds = None
-            
-            if not self.creds:
-                try:
-                    flow = InstalledAppFlow.from_client_secrets_file(
-                        credentials_path, self.SCOPES)
-                    self.creds = flow.run_local_server(port=0)
-                    print("[Info] 新しい認証を完了しました")
-                except Exception as e:
-                    print(f"[Error] 認証エラー: {e}")
-                    raise
-            
-            try:
-                with open(token_path, 'w') as token:
-                    token.write(self.creds.to_json())
-                print(f"[Info] トークンを保存しました: {token_path}")
-            except Exception as e:
-                print(f"[Error] トークンの保存に失敗: {e}")
-        
-        self.service = build("drive", "v3", credentials=self.creds)
-    
+        # OAuth 2.0認証（トークンの読み込み・リフレッシュ・保存は google_client.py にまとめている）
+        self.credentials_path = os.path.join(TOKENS_DIR, "credentials.json")
+        self.token_path = os.path.join(TOKENS_DIR, "drive_token.json")
+        try:
+            self.creds = load_credentials(
+                self.token_path, self.SCOPES, self.credentials_path
+            )
+        except Exception as e:
+            print(f"[Error] 認証エラー: {e}")
+            raise
+        
+        # 再開可能アップロード（チャンクサイズはMB単位で環境変数から変更可能）
+        chunk_mb = int(os.getenv("DRIVE_UPLOAD_CHUNK_MB", "8"))
+        self.uploader = DriveUploadManager(self.creds, chunk_size=chunk_mb * 1024 * 1024)
+    
+    @property
+    def service(self):
+        """スレッドごとのDrive APIサービス（httplib2の接続はスレッド間で共有できないため）"""
+        return get_service(
+            "drive", "v3", self.token_path, self.SCOPES, self.credentials_path
+        )
+
     def check_connection(self):
         """Google Drive APIへの接続確認"""
         try:
@@ -288,29 +694,23 @@ class GoogleDriveManager:
             print(f"[Error] ✗ フォルダーアクセス失敗: {e}")
             return False
     
-    def upload_file(self, file_path, folder_id, file_name=None):
-        """Google Driveにファイルをアップロード"""
+    def upload_file(self, file_path, folder_id, file_name=None, on_progress=None):
+        """Google Driveにファイルをアップロード（フォルダーの確認は初期化時のcheck_folder_accessで済ませる）"""
         try:
-            if folder_id:
-                self.service.files().get(fileId=folder_id, fields="id").execute()
-            
-            upload_name = file_name if file_name else os.path.basename(file_path)
-            
-            file_metadata = {
-                "name": upload_name,
-                "parents": [folder_id] if folder_id else []
-            }
-            media = MediaFileUpload(file_path, resumable=True)
-            file = self.service.files().create(
-                body=file_metadata,
-                media_body=media,
-                fields="id"
-            ).execute()
-            print(f"[Info] Google Driveにアップロード完了 (ID: {file.get('id')})")
-            return file.get('id')
+            file_id = self.uploader.upload(
+                file_path, folder_id, file_name=file_name, on_progress=on_progress
+            )
+            print(f"[Info] Google Driveにアップロード完了 (ID: {file_id})")
+            return file_id
         except Exception as e:
             print(f"[Error] アップロードエラー: {e}")
             return None
+    
+    def submit_upload(self, file_path, folder_id, file_name=None, on_progress=None):
+        """アップロードをバックグラウンドで開始し、Futureを返す（複数ファイルを同時にアップロード）"""
+        return self.uploader.executor.submit(
+            self.upload_file, file_path, folder_id, file_name, on_progress
+        )
 
 
 class VLCVideoPlayer:
@@ -334,15 +734,15 @@ class VLCVideoPlayer:
         self.duration = 0
         self.is_loaded = False
     
-    def load_video(self, path):
-        """動画を読み込む"""
+    def load_video(self, path, duration=None):
+        """動画を読み込む（ダウンロード中のファイルは長さを外から指定する）"""
         media = self.instance.media_new(path)
         self.player.set_media(media)
         self.player.audio_set_volume(100)
         self.player.play()
         time.sleep(0.5)  # メタデータの読み込み待機
         self.player.pause()
-        self.duration = self.player.get_length() / 1000.0  # 秒に変換
+        self.duration = duration or self.player.get_length() / 1000.0  # 秒に変換
         self.is_loaded = True
         return self.duration
     
@@ -403,11 +803,13 @@ class OpenCVVideoPlayer:
         self.playing = False
         self.photo = None
     
-    def load_video(self, path):
-        """動画を読み込む"""
+    def load_video(self, path, duration=None):
+        """動画を読み込む（ダウンロード中のファイルは長さを外から指定する）"""
         self.cap = cv2.VideoCapture(path)
         self.fps = self.cap.get(cv2.CAP_PROP_FPS)
         self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if duration and self.fps > 0:
+            self.total_frames = int(duration * self.fps)
         self.duration = self.total_frames / self.fps if self.fps > 0 else 0
         self.current_frame = 0
         self.is_loaded = True
@@ -501,6 +903,7 @@ class RangeMarkerSeekbar(tk.Canvas):
         self.current_pos = 0
         self.start_marker = None
         self.end_marker = None
+        self.buffered_pos = None  # ダウンロード済みの位置（秒）。Noneなら全体
         self.on_seek_callback = None
         
         self.bind('<Button-1>', self._on_click)
@@ -526,6 +929,11 @@ class RangeMarkerSeekbar(tk.Canvas):
         self.current_pos = pos_sec
         self.redraw()
     
+    def set_buffered_position(self, pos_sec):
+        """ダウンロード済みの位置を設定（Noneで全体をダウンロード済み扱い）"""
+        self.buffered_pos = pos_sec
+        self.redraw()
+    
     def set_seek_callback(self, callback):
         """シーククリック時のコールバックを設定"""
         self.on_seek_callback = callback
@@ -547,6 +955,12 @@ class RangeMarkerSeekbar(tk.Canvas):
             self.create_rectangle(10, base_y - 4, width - 10, base_y + 4,
                                 fill='lightgray', outline='gray', width=1)
             
+            # ダウンロード済み範囲（濃いグレー）
+            if self.buffered_pos is not None:
+                buffered_x = 10 + (width - 20) * (min(self.buffered_pos, self.duration) / self.duration)
+                self.create_rectangle(10, base_y - 4, buffered_x, base_y + 4,
+                                    fill='darkgray', outline='', width=0)
+            
             # 選択範囲のハイライト（青）
             if self.start_marker is not None and self.end_marker is not None:
                 start_x = 10 + (width - 20) * (self.start_marker / self.duration)
@@ -598,10 +1012,13 @@ class RangeMarkerSeekbar(tk.Canvas):
 class VideoClipperGUI:
     """YouTube動画クリッパーのメインGUI"""
     
+    # 一括エクスポート時に同時に切り出し・変換するクリップ数
+    CLIP_WORKERS = 2
+    
     def __init__(self):
         self.root = tk.Tk()
         self.root.title("YouTube Video Clipper - 動画切り出しツール")
-        self.root.geometry("950x750")
+        self.root.geometry("950x900")
         
         # 変数初期化
         self.video_url = None
@@ -610,8 +1027,23 @@ class VideoClipperGUI:
         self.start_time = 0
         self.end_time = 0
         self.skip_preview_var = tk.BooleanVar(value=False)
+        self.full_quality_preview_var = tk.BooleanVar(value=False)
+        self.progressive_preview_var = tk.BooleanVar(value=True)
         self.has_audio = False
         
+        # プログレッシブプレビューの状態（ダウンロード済みの長さ、完了フラグ）
+        self.buffered_time = None
+        self.preview_complete = True
+        
+        # フル画質の元動画キャッシュ（URL → ファイルパス）
+        self.source_cache = {}
+        
+        # クリップリスト（一括エクスポート用）
+        self.clips = []
+        self.clip_counter = 0
+        self.convert_vertical_var = tk.BooleanVar(value=True)
+        self.batch_running = False
+        
         # 一時ファイルの保存先（スクリプトと同じディレクトリ）
         self.temp_dir = SCRIPT_DIR
         
@@ -620,8 +1052,9 @@ class VideoClipperGUI:
         self.drive_folder_id = os.getenv("VIDEO_OUTPUT_FOLDER_ID")
         self._init_google_drive()
         
-        # ダウンローダー初期化
+        # ダウンローダー・切り出しエンジン初期化
         self.downloader = YoutubeDownloader()
+        self.clip_engine = LocalClipEngine()
         
         # UI構築
         self._build_ui()
@@ -735,6 +1168,30 @@ class VideoClipperGUI:
         self.range_label = ttk.Label(range_button_frame, text="範囲: 未設定", font=('Arial', 10, 'bold'))
         self.range_label.pack(side=tk.LEFT, padx=20)
         
+        # クリップリスト（複数範囲の一括エクスポート）
+        clip_frame = ttk.LabelFrame(self.root, text="クリップリスト（複数範囲を一括エクスポート）", padding=5)
+        clip_frame.pack(fill=tk.X, padx=10, pady=5)
+        
+        self.clip_tree = ttk.Treeview(
+            clip_frame, columns=('range', 'length', 'status'), show='headings', height=5
+        )
+        self.clip_tree.heading('range', text='範囲')
+        self.clip_tree.heading('length', text='長さ')
+        self.clip_tree.heading('status', text='状態')
+        self.clip_tree.column('range', width=200)
+        self.clip_tree.column('length', width=80, anchor=tk.CENTER)
+        self.clip_tree.column('status', width=200)
+        self.clip_tree.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        
+        clip_button_frame = ttk.Frame(clip_frame)
+        clip_button_frame.pack(side=tk.LEFT, padx=5)
+        ttk.Button(clip_button_frame, text="＋ 現在の範囲を追加",
+                  command=self._add_clip).pack(fill=tk.X, pady=2)
+        ttk.Button(clip_button_frame, text="選択を削除",
+                  command=self._remove_selected_clips).pack(fill=tk.X, pady=2)
+        ttk.Button(clip_button_frame, text="リストをクリア",
+                  command=self._clear_clips).pack(fill=tk.X, pady=2)
+        
         # オプション
         option_frame = ttk.LabelFrame(self.root, text="オプション", padding=10)
         option_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -745,6 +1202,24 @@ class VideoClipperGUI:
             variable=self.skip_preview_var
         ).pack(anchor=tk.W)
         
+        ttk.Checkbutton(
+            option_frame,
+            text="プレビューをフル画質で読込（範囲切り出しを再ダウンロードなしで高速化）",
+            variable=self.full_quality_preview_var
+        ).pack(anchor=tk.W)
+        
+        ttk.Checkbutton(
+            option_frame,
+            text="プログレッシブ再生（低画質プレビューをダウンロード完了前から再生）",
+            variable=self.progressive_preview_var
+        ).pack(anchor=tk.W)
+        
+        ttk.Checkbutton(
+            option_frame,
+            text="一括エクスポート時に縦型動画へ変換",
+            variable=self.convert_vertical_var
+        ).pack(anchor=tk.W)
+        
         # ダウンロードボタン
         download_frame = ttk.Frame(self.root)
         download_frame.pack(fill=tk.X, padx=10, pady=15)
@@ -759,6 +1234,11 @@ class VideoClipperGUI:
             command=self._download_range, style='Green.TButton'
         ).pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
         
+        ttk.Button(
+            download_frame, text="📦 クリップリストを一括エクスポート → Google Drive",
+            command=self._export_clips, style='Blue.TButton'
+        ).pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
+        
         # スタイル設定
         style = ttk.Style()
         style.configure('Blue.TButton', font=('Arial', 10, 'bold'))
@@ -785,22 +1265,31 @@ class VideoClipperGUI:
         
         # 非同期でプレビューダウンロード
         self.play_btn.config(state='disabled', text="読込中...")
-        threading.Thread(target=self._download_preview_thread, daemon=True).start()
+        if self.progressive_preview_var.get() and not self.full_quality_preview_var.get():
+            threading.Thread(target=self._download_preview_progressive_thread, daemon=True).start()
+        else:
+            threading.Thread(target=self._download_preview_thread, daemon=True).start()
     
     def _download_preview_thread(self):
         """プレビュー動画をダウンロード（バックグラウンド）"""
         try:
-            print("[Info] プレビュー用動画をダウンロード中（低画質）...")
+            full_quality = self.full_quality_preview_var.get()
+            if full_quality:
+                print("[Info] プレビュー用動画をダウンロード中（フル画質・切り出し元としてキャッシュ）...")
+            else:
+                print("[Info] プレビュー用動画をダウンロード中（低画質）...")
             
             preview_path = self.downloader.download_video(
                 self.video_url,
                 output_path=self.temp_dir,
-                quality='worst'
+                quality='1080p' if full_quality else 'worst'
             )
             
             if preview_path and os.path.exists(preview_path):
                 self.preview_file = preview_path
                 self.temp_files.append(preview_path)
+                if full_quality:
+                    self.source_cache[self.video_url] = preview_path
                 
                 # UIスレッドで動画を読み込む
                 self.root.after(0, self._load_video_to_player)
@@ -812,10 +1301,67 @@ class VideoClipperGUI:
             self.root.after(0, lambda: messagebox.showerror("エラー", f"プレビュー読込エラー:\n{e}"))
             self.root.after(0, lambda: self.play_btn.config(state='normal', text="▶ 再生"))
     
-    def _load_video_to_player(self):
+    def _download_preview_progressive_thread(self):
+        """プレビュー動画をプログレッシブにダウンロードし、先頭が届いた時点で再生を開始（バックグラウンド）"""
+        # 再生を始めるまでに必要なダウンロード量（バイト）
+        start_threshold = 2 * 1024 * 1024
+        preview_path = os.path.join(self.temp_dir, f"preview_{int(time.time())}.mp4")
+        self.temp_files.append(preview_path)
+        self.preview_file = preview_path
+        self.preview_complete = False
+        self.buffered_time = 0
+        state = {'started': False}
+        
+        def on_progress(downloaded, total, duration):
+            if not duration:
+                return
+            if total:
+                self.buffered_time = duration * min(1.0, downloaded / total)
+            if not state['started'] and (downloaded >= start_threshold or (total and downloaded >= total)):
+                state['started'] = True
+                print(f"[Info] 先頭部分のダウンロード完了、再生を開始します ({downloaded / 1024 / 1024:.1f}MB)")
+                self.root.after(0, lambda: self._load_video_to_player(duration))
+        
+        try:
+            result = self.downloader.download_preview_progressive(
+                self.video_url, preview_path, on_progress=on_progress
+            )
+            
+            if result:
+                self.preview_complete = True
+                self.buffered_time = None
+                if not state['started']:
+                    # 短い動画で閾値に届かなかった場合は完了後に読み込む
+                    self.root.after(0, self._load_video_to_player)
+            else:
+                self.preview_complete = True
+                self.buffered_time = None
+                if not state['started']:
+                    # プログレッシブ形式が取れない動画は通常のダウンロードにフォールバック
+                    print("[Info] プログレッシブ再生できないため通常のプレビューダウンロードに切り替えます")
+                    self._download_preview_thread()
+                else:
+                    self.root.after(0, lambda: messagebox.showerror("エラー", "プレビューのダウンロードが途中で失敗しました"))
+        
+        except Exception as e:
+            self.preview_complete = True
+            self.buffered_time = None
+            # except を抜けると e は消えるので、メッセージを先に取り出しておく
+            msg = str(e)
+            self.root.after(0, lambda msg=msg: messagebox.showerror("エラー", f"プレビュー読込エラー:\n{msg}"))
+            self.root.after(0, lambda: self.play_btn.config(state='normal', text="▶ 再生"))
+    
+    def _clamp_to_buffered(self, pos_sec):
+        """シーク位置をダウンロード済み範囲に収める"""
+        if self.preview_complete or self.buffered_time is None:
+            return pos_sec
+        # 書き込み途中の末尾付近は読めないことがあるので少し手前に止める
+        return max(0, min(pos_sec, self.buffered_time - 2))
+    
+    def _load_video_to_player(self, duration=None):
         """プレーヤーに動画を読み込む"""
         try:
-            duration = self.player.load_video(self.preview_file)
+            duration = self.player.load_video(self.preview_file, duration=duration)
             self.seekbar.set_duration(duration)
             self.end_time = duration
             self.seekbar.set_end_marker(duration)
@@ -857,6 +1403,7 @@ class VideoClipperGUI:
         
         current_time = self.player.get_time()
         new_time = max(0, min(current_time + seconds, self.seekbar.duration))
+        new_time = self._clamp_to_buffered(new_time)
         self.player.set_position(new_time / self.seekbar.duration)
         
         # OpenCVの場合は手動でフレームを更新
@@ -875,6 +1422,7 @@ class VideoClipperGUI:
             if was_playing:
                 self.player.pause()
             
+            pos_sec = self._clamp_to_buffered(pos_sec)
             self.player.set_position(pos_sec / self.seekbar.duration)
             
             # OpenCVの場合は手動でフレームを更新
@@ -918,6 +1466,54 @@ class VideoClipperGUI:
             self._update_range_label()
             print("[Info] 範囲をリセットしました")
     
+    def _add_clip(self):
+        """現在の範囲をクリップリストに追加"""
+        if not self.player or not self.player.is_loaded:
+            messagebox.showwarning("警告", "先にプレビューを読み込んでください")
+            return
+        
+        if self.start_time >= self.end_time:
+            messagebox.showwarning("警告", "開始点と終了点を正しく設定してください")
+            return
+        
+        self.clip_counter += 1
+        clip = {'id': str(self.clip_counter), 'start': self.start_time, 'end': self.end_time}
+        self.clips.append(clip)
+        self.clip_tree.insert('', tk.END, iid=clip['id'], values=(
+            f"{self._format_time(clip['start'])} ～ {self._format_time(clip['end'])}",
+            self._format_time(clip['end'] - clip['start']),
+            "待機中"
+        ))
+        print(f"[Info] クリップを追加: {self._format_time(clip['start'])} ～ {self._format_time(clip['end'])}")
+    
+    def _remove_selected_clips(self):
+        """選択したクリップをリストから削除"""
+        if self.batch_running:
+            messagebox.showwarning("警告", "エクスポート中はリストを変更できません")
+            return
+        
+        selected = set(self.clip_tree.selection())
+        self.clips = [clip for clip in self.clips if clip['id'] not in selected]
+        for item_id in selected:
+            self.clip_tree.delete(item_id)
+    
+    def _clear_clips(self):
+        """クリップリストを空にする"""
+        if self.batch_running:
+            messagebox.showwarning("警告", "エクスポート中はリストを変更できません")
+            return
+        
+        self.clips = []
+        for item_id in self.clip_tree.get_children():
+            self.clip_tree.delete(item_id)
+    
+    def _set_clip_status(self, clip_id, status):
+        """クリップの状態表示を更新（バックグラウンドスレッドから呼んでよい）"""
+        def update():
+            if self.clip_tree.exists(clip_id):
+                self.clip_tree.set(clip_id, 'status', status)
+        self.root.after(0, update)
+    
     def _update_range_label(self):
         """範囲ラベルの更新"""
         start_str = self._format_time(self.start_time)
@@ -954,6 +1550,11 @@ class VideoClipperGUI:
             except Exception as e:
                 pass  # エラーを無視して継続
         
+        # ダウンロード済み範囲をシークバーに表示
+        buffered = None if self.preview_complete else self.buffered_time
+        if buffered != self.seekbar.buffered_pos:
+            self.seekbar.set_buffered_position(buffered)
+        
         self.root.after(100, self._update_loop)
     
     def _download_full(self):
@@ -1045,14 +1646,26 @@ class VideoClipperGUI:
         try:
             print(f"[Info] 範囲を切り出し中 ({self._format_time(start_time)} ～ {self._format_time(end_time)}, 1080p)...")
             
-            # 1080p固定でダウンロード
-            downloaded_file = self.downloader.download_video(
-                url,
-                output_path=self.temp_dir,
-                quality='1080p',
-                start_time=start_time,
-                end_time=end_time
-            )
+            source_file = self.source_cache.get(url)
+            if source_file and os.path.exists(source_file):
+                # キャッシュ済みのフル画質動画からローカルで切り出す（再ダウンロードなし）
+                print(f"[Info] キャッシュ済みの元動画から切り出します: {source_file}")
+                base_name = os.path.splitext(os.path.basename(source_file))[0]
+                downloaded_file = self.clip_engine.cut(
+                    source_file,
+                    start_time,
+                    end_time,
+                    os.path.join(self.temp_dir, f"{base_name}_clip.mp4")
+                )
+            else:
+                # 1080p固定で範囲だけダウンロード
+                downloaded_file = self.downloader.download_video(
+                    url,
+                    output_path=self.temp_dir,
+                    quality='1080p',
+                    start_time=start_time,
+                    end_time=end_time
+                )
             
             if downloaded_file and os.path.exists(downloaded_file):
                 self.temp_files.append(downloaded_file)
@@ -1065,7 +1678,7 @@ class VideoClipperGUI:
                 self.temp_files.append(vertical_file)
                 
                 # ファイル名に範囲情報を追加
-                base_name = os.path.splitext(os.path.basename(downloaded_file))[0]
+                base_name = os.path.splitext(os.path.basename(source_file or downloaded_file))[0]
                 new_name = f"{base_name}_{self._format_time(start_time).replace(':', '-')}～{self._format_time(end_time).replace(':', '-')}_vertical.mp4"
                 
                 # Google Driveにアップロード
@@ -1093,6 +1706,176 @@ class VideoClipperGUI:
         except Exception as e:
             self.root.after(0, lambda: messagebox.showerror("エラー", f"処理エラー:\n{e}"))
     
+    def _export_clips(self):
+        """クリップリストの全範囲を一括で切り出してGoogle Driveにアップロード"""
+        url = self.video_url if self.video_url else self.url_entry.get().strip()
+        
+        if not url:
+            messagebox.showwarning("警告", "YouTube URLを入力してください")
+            return
+        
+        if not self.clips:
+            messagebox.showwarning("警告", "クリップリストが空です。\n「＋ 現在の範囲を追加」で範囲を追加してください")
+            return
+        
+        if not self.drive_manager or not self.drive_folder_id:
+            messagebox.showerror("エラー", "Google Driveが利用できません。\n環境変数を確認してください。")
+            return
+        
+        if self.batch_running:
+            messagebox.showwarning("警告", "一括エクスポートを実行中です")
+            return
+        
+        self.batch_running = True
+        clips = list(self.clips)
+        for clip in clips:
+            self._set_clip_status(clip['id'], "待機中")
+        
+        threading.Thread(
+            target=self._export_clips_thread,
+            args=(url, clips, self.convert_vertical_var.get()),
+            daemon=True
+        ).start()
+    
+    def _get_source_file(self, url):
+        """切り出し元のフル画質動画を取得（キャッシュがなければ1回だけダウンロード）"""
+        source_file = self.source_cache.get(url)
+        if source_file and os.path.exists(source_file):
+            print(f"[Info] キャッシュ済みの元動画を使用します: {source_file}")
+            return source_file
+        
+        print("[Info] 切り出し元のフル動画をダウンロード中（1080p）...")
+        source_file = self.downloader.download_video(url, output_path=self.temp_dir, quality='1080p')
+        if source_file and os.path.exists(source_file):
+            self.temp_files.append(source_file)
+            self.source_cache[url] = source_file
+            return source_file
+        return None
+    
+    def _export_clips_thread(self, url, clips, convert_vertical):
+        """クリップを一括エクスポート（バックグラウンド）"""
+        try:
+            for clip in clips:
+                self._set_clip_status(clip['id'], "元動画を準備中...")
+            
+            source_file = self._get_source_file(url)
+            if not source_file:
+                for clip in clips:
+                    self._set_clip_status(clip['id'], "失敗（ダウンロード）")
+                self.root.after(0, lambda: messagebox.showerror("エラー", "動画のダウンロードに失敗しました"))
+                return
+            
+            base_name = os.path.splitext(os.path.basename(source_file))[0]
+            results = {}
+            
+            # 切り出し・変換はワーカープールで、アップロードは専用スレッドのキューで並行処理
+            upload_queue = queue.Queue()
+            uploader = threading.Thread(
+                target=self._upload_worker, args=(upload_queue, results), daemon=True
+            )
+            uploader.start()
+            
+            with ThreadPoolExecutor(max_workers=self.CLIP_WORKERS) as executor:
+                futures = [
+                    executor.submit(
+                        self._process_clip, source_file, base_name, clip, convert_vertical, upload_queue, results
+                    )
+                    for clip in clips
+                ]
+                for future in futures:
+                    future.result()
+            
+            upload_queue.put(None)
+            uploader.join()
+            
+            succeeded = sum(1 for ok in results.values() if ok)
+            failed = len(clips) - succeeded
+            print(f"[Info] 一括エクスポート完了: 成功 {succeeded}件 / 失敗 {failed}件")
+            self.root.after(0, lambda: messagebox.showinfo(
+                "完了",
+                f"一括エクスポートが完了しました。\n\n成功: {succeeded}件\n失敗: {failed}件"
+            ))
+        
+        except Exception as e:
+            msg = str(e)
+            self.root.after(0, lambda msg=msg: messagebox.showerror("エラー", f"一括エクスポートエラー:\n{msg}"))
+        finally:
+            self.batch_running = False
+    
+    def _process_clip(self, source_file, base_name, clip, convert_vertical, upload_queue, results):
+        """1クリップを切り出し（必要なら縦型変換）してアップロードキューに入れる"""
+        clip_id = clip['id']
+        range_name = f"{self._format_time(clip['start']).replace(':', '-')}～{self._format_time(clip['end']).replace(':', '-')}"
+        try:
+            self._set_clip_status(clip_id, "切り出し中...")
+            clip_file = os.path.join(self.temp_dir, f"{base_name}_clip{clip_id}.mp4")
+            self.temp_files.append(clip_file)
+            if not self.clip_engine.cut(source_file, clip['start'], clip['end'], clip_file):
+                self._set_clip_status(clip_id, "失敗（切り出し）")
+                results[clip_id] = False
+                return
+            
+            output_file = clip_file
+            file_name = f"{base_name}_{range_name}.mp4"
+            if convert_vertical:
+                self._set_clip_status(clip_id, "縦型変換中...")
+                output_file = os.path.join(self.temp_dir, f"{base_name}_clip{clip_id}_vertical.mp4")
+                self.temp_files.append(output_file)
+                VideoVerticalConverter(input_path=clip_file, output_path=output_file).generate()
+                if not os.path.exists(output_file):
+                    self._set_clip_status(clip_id, "失敗（縦型変換）")
+                    results[clip_id] = False
+                    return
+                file_name = f"{base_name}_{range_name}_vertical.mp4"
+            
+            self._set_clip_status(clip_id, "アップロード待ち")
+            upload_queue.put((clip_id, output_file, file_name, [clip_file, output_file]))
+        
+        except Exception as e:
+            print(f"[Error] クリップ{clip_id}の処理エラー: {e}")
+            self._set_clip_status(clip_id, "失敗")
+            results[clip_id] = False
+    
+    def _upload_worker(self, upload_queue, results):
+        """アップロードキューから取り出したクリップを同時アップロードに回す"""
+        futures = []
+        while True:
+            item = upload_queue.get()
+            if item is None:
+                break
+            
+            clip_id = item[0]
+            self._set_clip_status(clip_id, "アップロード中...")
+            
+            def on_progress(file_path, uploaded, total, clip_id=clip_id):
+                if total:
+                    self._set_clip_status(clip_id, f"アップロード中... {uploaded * 100 // total}%")
+            
+            future = self.drive_manager.submit_upload(
+                item[1], self.drive_folder_id, file_name=item[2], on_progress=on_progress
+            )
+            futures.append((item, future))
+        
+        for item, future in futures:
+            self._finish_upload(item, future.result(), results)
+    
+    def _finish_upload(self, item, upload_result, results):
+        """アップロード結果を反映し、アップロード済みのクリップを削除"""
+        clip_id, output_file, file_name, local_files = item
+        if upload_result:
+            results[clip_id] = True
+            self._set_clip_status(clip_id, "✓ 完了")
+            # アップロード済みのクリップはすぐに削除（元動画は次の切り出し用に残す）
+            for path in set(local_files):
+                if os.path.exists(path):
+                    try:
+                        os.remove(path)
+                    except OSError as e:
+                        print(f"[Warning] 削除できませんでした: {path} - {e}")
+        else:
+            results[clip_id] = False
+            self._set_clip_status(clip_id, "失敗（アップロード）")
+    
     def _cleanup_temp_files(self):
         """一時ファイルを削除"""
         print("[Info] 一時ファイルを削除中...")
@@ -1,16 +1,14 @@
+import bisect
 import logging
-import os.path
-import pickle
 import re
-import time
 
 import gspread
-from google.auth.transport.requests import Request
 from google.oauth2.service_account import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from google_client import get_service
+from youtube_quota import QUOTA_COSTS, QuotaExhausted, YouTubeQuotaClient, request_cost
+
 # ロギングの設定
 logging.basicConfig(
     filename="youtube_api.log",
@@ -40,11 +38,23 @@ def main():
 
     youtube_playlist_get = YoutubePlayListGet()
 
-    # 既存のプレイリストの中身を消す
-    # youtube_playlist_get.clear_playlist(playlist_id)
+    print(f"[Info] 本日の残りクォータ: {youtube_playlist_get.quota.remaining()}")
+
+    try:
+        sync_mode = input("差分同期モードで実行しますか？ (Y/n): ").strip().lower() != "n"
+        if sync_mode:
+            # 現在のプレイリストとの差分（削除・追加・並べ替え）だけを反映する
+            youtube_playlist_get.sync_playlist(playlist_id, video_ids)
+            return
+
+        # 既存のプレイリストの中身を消す
+        # youtube_playlist_get.clear_playlist(playlist_id)
 
-    # 新しい動画を追加
-    youtube_playlist_get.add_video(playlist_id, video_ids)
+        # 新しい動画を追加
+        youtube_playlist_get.add_video(playlist_id, video_ids)
+    except QuotaExhausted as e:
+        # 予算を使い切る前に止まるので、残りは翌日（太平洋時間0時のリセット後）に再実行する
+        print(f"[Error] {e}")
 
 
 def extract_spreadsheet_id(url):
@@ -63,6 +73,75 @@ def extract_playlist_id(url):
     return None
 
 
+def plan_playlist_diff(current_items, target_video_ids):
+    """
+    現在のプレイリストを目的の並びにするための最小限の操作を求める
+
+    :param current_items: プレイリストの現在のアイテム [{"id", "video_id"}]（並び順）
+    :param target_video_ids: 目的の動画IDのリスト（並び順、重複可）
+    :return: (削除するアイテムのリスト, 追加・移動の操作リスト)
+             操作は ("insert", video_id, position) または ("move", item, position) で、
+             前から順番に実行する必要がある
+    """
+    # 動画IDごとに目的の位置を前から割り当てる（同じ動画が複数あっても対応）
+    target_positions = {}
+    for index, video_id in enumerate(target_video_ids):
+        target_positions.setdefault(video_id, []).append(index)
+
+    deletes = []
+    kept = []  # (目的の位置, アイテム) 現在の並び順
+    for item in current_items:
+        positions = target_positions.get(item["video_id"])
+        if positions:
+            kept.append((positions.pop(0), item))
+        else:
+            deletes.append(item)
+
+    # 目的の位置の最長増加部分列に入っているアイテムは動かさなくてよい
+    stay = _longest_increasing_subsequence([index for index, _ in kept])
+
+    kept_by_index = {index: item for index, item in kept}
+    local = [index for index, _ in kept]  # 削除後のプレイリストを目的の位置で表したもの
+    operations = []
+    for index, video_id in enumerate(target_video_ids):
+        if index in stay:
+            continue
+        if index in kept_by_index:
+            local.remove(index)
+        # index より前の動画はすべて正しい相対順に並んでいるので、その直後に置く
+        position = local.index(index - 1) + 1 if index > 0 else 0
+        local.insert(position, index)
+        if index in kept_by_index:
+            operations.append(("move", kept_by_index[index], position))
+        else:
+            operations.append(("insert", video_id, position))
+
+    return deletes, operations
+
+
+def _longest_increasing_subsequence(values):
+    """最長増加部分列に含まれる値の集合を返す"""
+    tails = []  # 長さごとの末尾の値
+    tail_indexes = []  # 長さごとの末尾の位置
+    previous = [-1] * len(values)
+    for i, value in enumerate(values):
+        length = bisect.bisect_left(tails, value)
+        if length == len(tails):
+            tails.append(value)
+            tail_indexes.append(i)
+        else:
+            tails[length] = value
+            tail_indexes[length] = i
+        previous[i] = tail_indexes[length - 1] if length > 0 else -1
+
+    result = set()
+    i = tail_indexes[-1] if tail_indexes else -1
+    while i >= 0:
+        result.add(values[i])
+        i = previous[i]
+    return result
+
+
 class GoogleSpreadsheet:
     def __init__(self, spreadsheet_id):
         self.scope = [
@@ -98,59 +177,167 @@ class GoogleSpreadsheet:
 class YoutubePlayListGet:
     def __init__(self):
         self.scope = ["https://www.googleapis.com/auth/youtube.force-ssl"]
-        self.client_secrets_file = "credentials.json"
-        self.flow = InstalledAppFlow.from_client_secrets_file(
-            self.client_secrets_file, self.scope
+        # トークンを tokens/ に保存し、期限切れのときだけ更新・再認証する（google_client.py）
+        self.youtube = get_service(
+            "youtube",
+            "v3",
+            "tokens/youtube_playlist_change_token.json",
+            self.scope,
+            "credentials.json",
         )
-        self.creds = self.flow.run_local_server(port=0)
-        self.youtube = build("youtube", "v3", credentials=self.creds)
+        # クォータの予算管理とレート制限（youtube_quota.py）
+        self.quota = YouTubeQuotaClient()
 
-    def clear_playlist(self, playlist_id):
-        logging.info(f"Clearing playlist {playlist_id}")
-        next_page_token = None
+    # バッチリクエスト1回にまとめる件数（APIの上限は50件）
+    BATCH_SIZE = 50
 
-        while True:
-            retries = 0
-            while True:
+    def _execute(self, request, cost=None):
+        """リクエストをクォータとレートを管理しながら実行する"""
+        try:
+            return self.quota.execute(request, cost)
+        except HttpError as e:
+            logging.error(f"Error occurred: {e}")
+            raise
+
+    def _execute_batch(self, requests):
+        """
+        順番に依存しないリクエストをバッチHTTPリクエストでまとめて送る
+        失敗したリクエストは1件ずつ再試行する
+
+        :param requests: [(ログ用の説明, リクエスト)]
+        """
+        for start in range(0, len(requests), self.BATCH_SIZE):
+            chunk = requests[start:start + self.BATCH_SIZE]
+            failed = []
+
+            def callback(request_id, response, exception):
+                label, request = chunk[int(request_id)]
+                if exception is not None:
+                    logging.error(f"Batch request failed: {label} - {exception}")
+                    failed.append((label, request))
+                else:
+                    logging.info(label)
+
+            batch = self.youtube.new_batch_http_request(callback=callback)
+            for index, (_, request) in enumerate(chunk):
+                batch.add(request, request_id=str(index))
+            # バッチでも中のリクエストそれぞれにクォータが掛かる
+            self._execute(batch, sum(request_cost(request) for _, request in chunk))
+
+            for label, request in failed:
                 try:
-                    request = self.youtube.playlistItems().list(
-                        part="id",
-                        playlistId=playlist_id,
-                        maxResults=1,
-                        pageToken=next_page_token,  # 次のページのトークン
-                    )
-                    response = request.execute()
-                    logging.info(
-                        f"Retrieved {len(response.get('items', []))} items from playlist {playlist_id}"
-                    )
-
-                    # 各アイテムを削除
-                    for item in response.get("items", []):
-                        delete_request = self.youtube.playlistItems().delete(
-                            id=item["id"]
-                        )
-                        delete_request.execute()
-                        logging.info(
-                            f"Deleted video {item['id']} from playlist {playlist_id}"
-                        )
-
-                    # 次のページが存在する場合はトークンを更新
-                    next_page_token = response.get("nextPageToken")
-                    if not next_page_token:  # 次のページがなければループを終了
-                        return
-                    break
+                    self._execute(request)
+                    logging.info(label)
                 except HttpError as e:
-                    logging.error(f"Error occurred: {e}")
-                    if e.resp.status == 403 and "quotaExceeded" in str(e):
-                        logging.warning("APIクォータが超過しました。再試行します。")
-                        retries += 1
-                        wait_time = min(2**retries, 300)  # 最大300秒待機
-                        logging.info(
-                            f"Waiting for {wait_time} seconds before retrying."
-                        )
-                        time.sleep(wait_time)
-                    else:
-                        break
+                    logging.error(f"Retry failed: {label} - {e}")
+
+    def get_playlist_items(self, playlist_id):
+        """プレイリストの全アイテムを50件ずつ取得する（必要なフィールドだけを要求）"""
+        items = []
+        next_page_token = None
+
+        while True:
+            response = self._execute(
+                self.youtube.playlistItems().list(
+                    part="snippet",
+                    playlistId=playlist_id,
+                    maxResults=50,
+                    pageToken=next_page_token,  # 次のページのトークン
+                    fields="nextPageToken,items(id,snippet(position,resourceId/videoId))",
+                )
+            )
+            for item in response.get("items", []):
+                items.append(
+                    {
+                        "id": item["id"],
+                        "video_id": item["snippet"]["resourceId"]["videoId"],
+                        "position": item["snippet"].get("position"),
+                    }
+                )
+
+            next_page_token = response.get("nextPageToken")
+            if not next_page_token:  # 次のページがなければループを終了
+                break
+
+        items.sort(key=lambda item: item["position"] if item["position"] is not None else len(items))
+        logging.info(f"Retrieved {len(items)} items from playlist {playlist_id}")
+        return items
+
+    def _delete_items(self, playlist_id, items):
+        """プレイリストのアイテムをバッチでまとめて削除する"""
+        self._execute_batch(
+            [
+                (
+                    f"Deleted video {item['video_id']} ({item['id']}) from playlist {playlist_id}",
+                    self.youtube.playlistItems().delete(id=item["id"]),
+                )
+                for item in items
+            ]
+        )
+
+    def clear_playlist(self, playlist_id):
+        logging.info(f"Clearing playlist {playlist_id}")
+        # 先に全件を取得してから削除する（削除しながらページを進めると取りこぼすため）
+        self._delete_items(playlist_id, self.get_playlist_items(playlist_id))
+
+    def sync_playlist(self, playlist_id, video_ids):
+        """
+        スプレッドシートの並びとプレイリストの差分だけを反映する
+
+        :param playlist_id: プレイリストID
+        :param video_ids: read_data() の戻り値 [[URL, 動画ID], ...]
+        """
+        logging.info(f"Syncing playlist {playlist_id}")
+        target_video_ids = [video_id for _, video_id in video_ids]
+        current_items = self.get_playlist_items(playlist_id)
+        deletes, operations = plan_playlist_diff(current_items, target_video_ids)
+
+        moves = sum(1 for operation in operations if operation[0] == "move")
+        print(
+            f"[Info] 現在{len(current_items)}件 → 目的{len(target_video_ids)}件: "
+            f"削除{len(deletes)}件, 追加{len(operations) - moves}件, 並べ替え{moves}件"
+        )
+        if not deletes and not operations:
+            print("[Info] プレイリストは最新です。")
+            return
+
+        # 途中で予算が尽きると並びが中途半端になるので、足りなければ最初から送らない
+        planned_cost = (len(deletes) + len(operations)) * QUOTA_COSTS["insert"]
+        remaining = self.quota.remaining()
+        if planned_cost > remaining:
+            raise QuotaExhausted(
+                f"同期に必要なクォータ{planned_cost}に対して本日の残りが{remaining}しかありません"
+            )
+
+        # 削除は順番に依存しないのでバッチでまとめて送る
+        self._delete_items(playlist_id, deletes)
+
+        # 追加・並べ替えは位置が前の操作に依存する（バッチは実行順が保証されない）ため、順番に送る
+        for operation, target, position in operations:
+            video_id = target if operation == "insert" else target["video_id"]
+            snippet = {
+                "playlistId": playlist_id,
+                "position": position,
+                "resourceId": {"kind": "youtube#video", "videoId": video_id},
+            }
+            if operation == "insert":
+                request = self.youtube.playlistItems().insert(
+                    part="snippet", body={"snippet": snippet}
+                )
+            else:
+                request = self.youtube.playlistItems().update(
+                    part="snippet", body={"id": target["id"], "snippet": snippet}
+                )
+
+            try:
+                self._execute(request)
+                logging.info(f"{operation} video {video_id} at position {position} in playlist {playlist_id}")
+            except HttpError as e:
+                # 位置がずれるので、以降の操作は行わずに次回の同期でやり直す
+                print(f"[Error] プレイリストの更新に失敗しました: {video_id} - {e}")
+                return
+
+        print("[Info] プレイリストの同期が完了しました。")
 
     def add_video(self, playlist_id, video_ids):
         logging.info(f"Adding videos to playlist {playlist_id}")
@@ -160,37 +347,24 @@ class YoutubePlayListGet:
 
         for data in video_ids:
             video_url, video_id = data  # リストからURLとvideo_idを取得
-            retries = 0
-            while True:
-                try:
-                    request = self.youtube.playlistItems().insert(
-                        part="snippet",
-                        body={
-                            "snippet": {
-                                "playlistId": playlist_id,
-                                "resourceId": {
-                                    "kind": "youtube#video",
-                                    "videoId": video_id,  # 正しくvideo_idを使う
-                                },
-                            }
+            request = self.youtube.playlistItems().insert(
+                part="snippet",
+                body={
+                    "snippet": {
+                        "playlistId": playlist_id,
+                        "resourceId": {
+                            "kind": "youtube#video",
+                            "videoId": video_id,  # 正しくvideo_idを使う
                         },
-                    )
-                    response = request.execute()
-                    logging.info(f"Added video {video_id} to playlist {playlist_id}")
-                    time.sleep(1)  # 1秒待機
-                    break
-                except HttpError as e:
-                    logging.error(f"Error occurred: {e}")
-                    if e.resp.status == 403 and "quotaExceeded" in str(e):
-                        logging.warning("APIクォータが超過しました。再試行します。")
-                        retries += 1
-                        wait_time = min(2**retries, 300)  # 最大300秒待機
-                        logging.info(
-                            f"Waiting for {wait_time} seconds before retrying."
-                        )
-                        time.sleep(wait_time)
-                    else:
-                        break
+                    }
+                },
+            )
+            try:
+                # 送信間隔はyoutube_quota.pyのレート制限に任せる
+                self._execute(request)
+                logging.info(f"Added video {video_id} to playlist {playlist_id}")
+            except HttpError:
+                continue
 
 if __name__ == "__main__":
     main()
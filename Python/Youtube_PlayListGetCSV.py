@@ -1,24 +1,74 @@
+import json
 import os.path
-import pickle
 from datetime import datetime
 
 from dotenv import load_dotenv
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+
+from google_client import build_service, get_service, load_credentials
+from youtube_quota import YouTubeQuotaClient
 
 # 環境変数の読み込み
 load_dotenv()
 
+# 必要なフィールドだけを返してもらうためのマスク（レスポンスが小さくなり、JSONの解析も速くなる）
+PLAYLIST_NAME_FIELDS = "items(snippet/title)"
+PLAYLIST_ITEMS_FIELDS = (
+    "etag,nextPageToken,pageInfo/totalResults,items(id,snippet(title,resourceId/videoId))"
+)
+CHECKPOINT_FILE = "tokens/youtube_playlist_export_checkpoint.json"
+
 
 def main():
     # プレイリストのURLをユーザーから取得
     url = input("プレイリストのURLを入力してください: ")
     getplaylist = YoutubePlayListGet(url)
-    playlist_name = getplaylist.check_playlist_name()
-    data = getplaylist.get_playlist()
+    checkpoints = ExportCheckpoint()
+    checkpoint = checkpoints.get(getplaylist.playlist_id)
 
     google_drive = GoogleDriveAuth()  # GoogleDriveAuthのインスタンスを生成
+
+    # 前回出力したスプレッドシートがあれば、新しく追加された動画だけを追記する
+    if checkpoint and input("前回のスプレッドシートに新しい動画だけを追記しますか？ (Y/n): ").strip().lower() != "n":
+        if getplaylist.is_unchanged(checkpoint.get("etag")):
+            print("[Info] プレイリストに変更はありません。")
+            return
+
+        exported_ids = set(checkpoint.get("item_ids", []))
+        items = None
+        # 続きから読んでよいのは末尾に追加されただけのとき（先頭のアイテムが同じで、
+        # 件数が「前回の件数 + 前回の位置より後ろのアイテム数」と一致する）
+        saved_total = checkpoint.get("total_results")
+        if saved_total is not None and getplaylist.first_item_id == checkpoint.get("first_item_id"):
+            fetched = getplaylist.fetch_items(
+                checkpoint.get("last_page_token"), checkpoint.get("last_item_id")
+            )
+            if fetched and getplaylist.total_results == saved_total + len(fetched[0]):
+                items, last_page_token = fetched
+        if items is None:
+            # 先頭や途中への追加・削除・並べ替えがあった場合は全体を読み直す（出力済みは除外）
+            print("[Info] 前回から先頭や途中のアイテムが変わったため、プレイリストを最初から読み直します。")
+            items, last_page_token = getplaylist.fetch_items()
+        new_items = [item for item in items if item["id"] not in exported_ids]
+        if new_items:
+            google_drive.write_csv(checkpoint["spreadsheet_id"], to_rows(new_items))
+        print(f"[Info] {len(new_items)}件を追記しました。")
+
+        checkpoints.update(
+            getplaylist.playlist_id,
+            checkpoint["spreadsheet_id"],
+            getplaylist.first_page_etag,
+            last_page_token,
+            items[-1]["id"] if items else checkpoint.get("last_item_id"),
+            [item["id"] for item in new_items],
+            total_results=getplaylist.total_results,
+            first_item_id=getplaylist.first_item_id,
+        )
+        return
+
+    playlist_name = getplaylist.check_playlist_name()
+    items, last_page_token = getplaylist.fetch_items()
+
     spreadsheet_id = google_drive.create_spreadsheet(
         playlist_name
     )  # スプレッドシートを作成
@@ -29,7 +79,87 @@ def main():
         return  # プログラムを終了
 
     # スプレッドシートにデータを書き込む
-    google_drive.write_csv(spreadsheet_id, data)
+    google_drive.write_csv(spreadsheet_id, to_rows(items))
+
+    # 次回の追記用にチェックポイントを作り直す
+    checkpoints.reset(getplaylist.playlist_id)
+    checkpoints.update(
+        getplaylist.playlist_id,
+        spreadsheet_id,
+        getplaylist.first_page_etag,
+        last_page_token,
+        items[-1]["id"] if items else None,
+        [item["id"] for item in items],
+        total_results=getplaylist.total_results,
+        first_item_id=getplaylist.first_item_id,
+    )
+
+
+def to_rows(items):
+    """fetch_items() のアイテムをスプレッドシートの行 [タイトル, URL] にする"""
+    return [
+        [item["title"], f"https://www.youtube.com/watch?v={item['video_id']}"]
+        for item in items
+    ]
+
+
+class ExportCheckpoint:
+    """
+    プレイリストごとに前回の出力状況を保存するクラス
+
+    - spreadsheet_id: 追記先のスプレッドシート
+    - etag: 1ページ目のETag（変わっていなければ追記するものは無い）
+    - last_page_token / last_item_id: 最後に読んだページと最後のアイテム（続きから読む）
+    - total_results / first_item_id: 件数と先頭のアイテム（末尾への追加だけかの判定に使う）
+    - item_ids: 出力済みのアイテムID（並べ替えや削除があったときの重複防止）
+    """
+
+    def __init__(self, path=CHECKPOINT_FILE):
+        self.path = path
+        self.data = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.data = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"[Error] チェックポイントの読み込みに失敗: {e}")
+
+    def get(self, playlist_id):
+        return self.data.get(playlist_id)
+
+    def reset(self, playlist_id):
+        self.data.pop(playlist_id, None)
+
+    def update(
+        self,
+        playlist_id,
+        spreadsheet_id,
+        etag,
+        last_page_token,
+        last_item_id,
+        new_item_ids,
+        total_results=None,
+        first_item_id=None,
+    ):
+        checkpoint = self.data.setdefault(playlist_id, {"item_ids": []})
+        checkpoint.update(
+            {
+                "spreadsheet_id": spreadsheet_id,
+                "etag": etag,
+                "last_page_token": last_page_token,
+                "last_item_id": last_item_id,
+                "total_results": total_results,
+                "first_item_id": first_item_id,
+                "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            }
+        )
+        checkpoint["item_ids"].extend(new_item_ids)
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
 
 
 class YoutubePlayListGet:
@@ -37,6 +167,11 @@ class YoutubePlayListGet:
         self.url = url
         self.playlist_id = self.extract_playlist_id(url)  # プレイリストIDを抽出
         self.youtube_service = self.get_youtube_service()  # YouTube APIのサービスを取得
+        self.quota = YouTubeQuotaClient()  # クォータの予算管理とレート制限
+        self.first_page_etag = None
+        # 最後に読んだページの pageInfo/totalResults と、1ページ目の先頭のアイテムID
+        self.total_results = None
+        self.first_item_id = None
 
     def extract_playlist_id(self, url):
         # URLからプレイリストIDを抽出する
@@ -47,56 +182,102 @@ class YoutubePlayListGet:
     def check_playlist_name(self):
         # プレイリストのタイトルを取得
         request = self.youtube_service.playlists().list(
-            part="snippet", id=self.playlist_id
+            part="snippet", id=self.playlist_id, fields=PLAYLIST_NAME_FIELDS
         )
-        response = request.execute()
+        response = self.quota.execute(request)
         return response["items"][0]["snippet"]["title"]
 
     def get_youtube_service(self):
         SCOPES = ["https://www.googleapis.com/auth/youtube.readonly"]
-        creds = None
-
-        # 認証処理
-        if os.path.exists("tokens/youtube_playList_token.pickle"):
-            with open("tokens/youtube_playList_token.pickle", "rb") as token:
-                creds = pickle.load(token)
-
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    "credentials.json", SCOPES
-                )
-                creds = flow.run_local_server(port=8080)  # 認証フローを実行
-            with open("tokens/youtube_playList_token.pickle", "wb") as token:
-                pickle.dump(creds, token)
 
-        return build("youtube", "v3", credentials=creds)  # YouTube APIのサービスを構築
+        # 認証処理（トークンの読み込み・更新・保存は google_client.py にまとめている）
+        return get_service(
+            "youtube",
+            "v3",
+            "tokens/youtube_playList_token.pickle",
+            SCOPES,
+            "credentials.json",
+            port=8080,
+        )  # YouTube APIのサービスを構築
+
+    def _list_items(self, page_token=None):
+        return self.youtube_service.playlistItems().list(
+            part="snippet",
+            playlistId=self.playlist_id,
+            maxResults=50,
+            pageToken=page_token,
+            fields=PLAYLIST_ITEMS_FIELDS,
+        )
 
-    def get_playlist(self):
-        data = []
-        next_page_token = None
+    def _read_page_info(self, response, first_page):
+        """レスポンスから件数と、1ページ目ならETagと先頭のアイテムIDを記録する"""
+        self.total_results = response.get("pageInfo", {}).get("totalResults")
+        if first_page:
+            self.first_page_etag = response.get("etag")
+            items = response.get("items", [])
+            self.first_item_id = items[0]["id"] if items else None
+
+    def is_unchanged(self, etag):
+        """
+        1ページ目のETagが前回と同じか（変わっていなければ304が返り、本文は送られない）
+        変わっていた場合は、1ページ目の件数と先頭のアイテムIDを記録する
+        """
+        request = self._list_items()
+        if etag:
+            request.headers["If-None-Match"] = etag
+        try:
+            response = self.quota.execute(request)
+        except HttpError as e:
+            if etag and e.resp.status == 304:
+                self.first_page_etag = etag
+                return True
+            raise
+        self._read_page_info(response, first_page=True)
+        return False
+
+    def fetch_items(self, start_page_token=None, last_item_id=None):
+        """
+        プレイリストのアイテムを50件ずつ取得する
+
+        :param start_page_token: このページから読み始める（前回最後に読んだページ）
+        :param last_item_id: 前回最後に出力したアイテムID。このID以降だけを返す
+        :return: ([{"id", "title", "video_id"}], 最後に読んだページのトークン)。
+                 last_item_id が見つからない（削除・移動された）場合は None
+        """
+        items = []
+        page_token = start_page_token
+        last_page_token = None
+        found_last_item = last_item_id is None
 
         while True:
-            request = self.youtube_service.playlistItems().list(
-                part="snippet",
-                playlistId=self.playlist_id,
-                maxResults=50,
-                pageToken=next_page_token,
-            )
-            response = request.execute()
+            response = self.quota.execute(self._list_items(page_token))
+            self._read_page_info(response, first_page=page_token is None)
 
             for item in response.get("items", []):
-                title = item["snippet"]["title"]
-                video_url = f"https://www.youtube.com/watch?v={item['snippet']['resourceId']['videoId']}"
-                data.append([title, video_url])  # タイトルとURLをデータに追加
+                if not found_last_item:
+                    found_last_item = item["id"] == last_item_id
+                    continue
+                items.append(
+                    {
+                        "id": item["id"],
+                        "title": item["snippet"]["title"],
+                        "video_id": item["snippet"]["resourceId"]["videoId"],
+                    }
+                )
 
-            next_page_token = response.get("nextPageToken")
-            if not next_page_token:
+            last_page_token = page_token
+            page_token = response.get("nextPageToken")
+            if not page_token:
                 break  # 次のページがなければループを終了
 
-        return data  # データを返す
+        if not found_last_item:
+            # 前回の最後のアイテムが削除・移動された（読み直すかは呼び出し側で判断する）
+            return None
+        return items, last_page_token
+
+    def get_playlist(self):
+        items, _ = self.fetch_items()
+        return to_rows(items)  # [タイトル, URL] のリストを返す
 
 
 class GoogleDriveAuth:
@@ -113,25 +294,17 @@ class GoogleDriveAuth:
         self.sheets_service = None
 
         # OAuth2認証とサービスインスタンスの初期化
-        if os.path.exists(self.token_path):
-            with open(self.token_path, "rb") as token:
-                self.creds = pickle.load(token)
-
-        if not self.creds or not self.creds.valid:
-            if self.creds and self.creds.expired and self.creds.refresh_token:
-                self.creds.refresh(Request())
-            elif os.path.exists(self.credentials_path):
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    self.credentials_path, self.SCOPES
-                )
-                self.creds = flow.run_local_server(port=0)  # 認証フローを実行
-            with open(self.token_path, "wb") as token:
-                pickle.dump(self.creds, token)
+        try:
+            self.creds = load_credentials(
+                self.token_path, self.SCOPES, self.credentials_path
+            )
+        except FileNotFoundError as e:
+            print(f"[Error] {e}")
 
         # サービスの初期化
         if self.creds and self.creds.valid:
-            self.drive_service = build("drive", "v3", credentials=self.creds)
-            self.sheets_service = build("sheets", "v4", credentials=self.creds)
+            self.drive_service = build_service("drive", "v3", self.creds)
+            self.sheets_service = build_service("sheets", "v4", self.creds)
         else:
             print("[Error] Drive or Sheets auth failed.")
 
@@ -170,7 +343,7 @@ class GoogleDriveAuth:
         # スプレッドシートのタイトルを取得
         spreadsheet = (
             self.sheets_service.spreadsheets()
-            .get(spreadsheetId=spreadsheet_id)
+            .get(spreadsheetId=spreadsheet_id, fields="sheets.properties.title")
             .execute()
         )
         sheet_name = spreadsheet["sheets"][0]["properties"]["title"]
@@ -3,25 +3,32 @@ from __future__ import annotations
 import argparse
 import base64
 import csv
+import json
 import os
 import re
-from dataclasses import dataclass
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
 from pathlib import Path
-from typing import Iterable
+from typing import Callable, Iterable
 
-import gspread
+import pandas as pd
 from dotenv import load_dotenv
-from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from gspread.exceptions import WorksheetNotFound
+from googleapiclient.errors import HttpError
+
+from google_client import build_service, get_service, load_credentials
+from mail_parser import MailParser
+from sheet_batch_writer import SheetBatchWriter, quote_title
+from transaction_store import TransactionStore, row_hash
 
 
 SCRIPT_DIR = Path(__file__).resolve().parent
 ROOT_DIR = SCRIPT_DIR.parent
 TOKENS_DIR = ROOT_DIR / "tokens"
 SPREADSHEET_ID_ENV = "YUCHO_SHEET"
+# 前回までに処理したメールの記録（historyId と処理済みのメールID）
+CHECKPOINT_PATH = TOKENS_DIR / "yucho_mail_checkpoint.json"
 
 VISA_SHEET_NAME = "Visa"
 PAYPAY_SHEET_NAME = "PayPay"
@@ -30,10 +37,39 @@ MONTHLY_SHEET_NAME = "月別"
 STORE_SHEET_NAME = "店舗別"
 MONTHLY_STORE_SHEET_NAME = "月別店舗"
 MONTHLY_STORE_PIVOT_SHEET_NAME = "月別店舗ピボット"
+# (シート名, 最低行数, 最低列数)
+SHEET_LAYOUT = (
+    (VISA_SHEET_NAME, 2000, 8),
+    (PAYPAY_SHEET_NAME, 2000, 8),
+    (SUMMARY_SHEET_NAME, 200, 8),
+    (MONTHLY_SHEET_NAME, 2000, 8),
+    (STORE_SHEET_NAME, 2000, 8),
+    (MONTHLY_STORE_SHEET_NAME, 5000, 8),
+    (MONTHLY_STORE_PIVOT_SHEET_NAME, 5000, 60),
+)
 
 TRANSACTION_HEADERS = ["日時", "金額", "店舗", "決済元"]
+VISA_SOURCES = ("ゆうちょ", "三井住友")
+PAYPAY_SOURCES = ("PayPay",)
+# transaction_store に保存するときの取得元
+GMAIL_ORIGIN = "gmail"
+PAYPAY_CSV_ORIGIN = "paypay_csv"
 CURRENCY_FORMAT = {"numberFormat": {"type": "CURRENCY", "pattern": "¥#,##0"}}
 MAIN_STEP_TOTAL = 8
+AGGREGATE_MODES = ("values", "formula")
+
+# Gmail のバッチリクエストは1回100件までだが、同時実行のレート制限を考慮して50件ずつ送る
+MESSAGE_BATCH_SIZE = 50
+MESSAGE_BATCH_RETRIES = 4
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# 本文の解析に使う mimeType と body.data だけを取得する（multipart は3階層まで）
+_PART_FIELDS = "mimeType,body/data"
+MESSAGE_FIELDS = (
+    f"id,payload({_PART_FIELDS},parts({_PART_FIELDS},"
+    f"parts({_PART_FIELDS},parts({_PART_FIELDS}))))"
+)
+# 差分取得では、先に件名だけを取得してどのカードのメールか判定する（本文は対象のメールだけ取得）
+SUBJECT_FIELDS = "id,payload(headers(name,value))"
 
 
 @dataclass(frozen=True)
@@ -42,10 +78,76 @@ class Transaction:
     amount: int
     store: str
     source: str
+    # 取得元でのID（メールID、CSVの行のハッシュ）。取引の比較には使わない
+    record_id: str = field(default="", compare=False)
 
     def as_row(self) -> list[object]:
         return [self.occurred_at, self.amount, self.store, self.source]
 
+    def as_record(self) -> tuple[str, str, int, str, str]:
+        return (self.record_id, self.occurred_at, self.amount, self.store, self.source)
+
+
+@dataclass(frozen=True)
+class SpendingAggregates:
+    total: int
+    monthly: list[list[object]]
+    stores: list[list[object]]
+    monthly_stores: list[list[object]]
+    pivot: list[list[object]]
+
+
+@dataclass(frozen=True)
+class MailSource:
+    label: str
+    subject: str
+    parser: Callable[[str], Transaction]
+
+    @property
+    def query(self) -> str:
+        return f'subject:"{self.subject}"'
+
+    def matches(self, message: dict) -> bool:
+        headers = message.get("payload", {}).get("headers", [])
+        return any(
+            header.get("name", "").lower() == "subject"
+            and self.subject in header.get("value", "")
+            for header in headers
+        )
+
+
+class MailCheckpoint:
+    """前回の実行時点の historyId と、処理済みのメールIDを保存する。"""
+
+    def __init__(self, path: Path = CHECKPOINT_PATH) -> None:
+        self.path = path
+        self.history_id: str | None = None
+        self.message_ids: set[str] = set()
+        if not path.exists():
+            return
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError) as error:
+            print(f"[Warn] チェックポイントを読み込めませんでした: {error}")
+            return
+        self.history_id = data.get("history_id")
+        self.message_ids = set(data.get("message_ids", []))
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_name(self.path.name + ".tmp")
+        temp_path.write_text(
+            json.dumps(
+                {
+                    "history_id": self.history_id,
+                    "message_ids": sorted(self.message_ids),
+                },
+                ensure_ascii=False,
+            ),
+            encoding="utf-8",
+        )
+        os.replace(temp_path, self.path)
+
 
 def log_step(step: int, message: str) -> None:
     print(f"[Step {step}/{MAIN_STEP_TOTAL}] {message}")
@@ -59,6 +161,25 @@ def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="ゆうちょ・三井住友・PayPay の決済履歴をスプレッドシートへ反映します。"
     )
+    parser.add_argument(
+        "--full-rescan",
+        dest="full_rescan",
+        action="store_true",
+        help=(
+            "前回の続きからではなく、メールボックス全体を検索し、"
+            "Visa シート（CSV 指定時は PayPay シートも）を日時順に書き直します。"
+        ),
+    )
+    parser.add_argument(
+        "--aggregate-mode",
+        dest="aggregate_mode",
+        choices=AGGREGATE_MODES,
+        default="values",
+        help=(
+            "集計シートの書き込み方。values は Python で集計した値を書き込み、"
+            "formula は従来どおり QUERY 関数を書き込みます（既定: values）。"
+        ),
+    )
     parser.add_argument(
         "--paypay-csv",
         dest="paypay_csv",
@@ -68,32 +189,19 @@ def parse_args() -> argparse.Namespace:
 
 
 def _load_credentials(token_filename: str, scopes: list[str]) -> Credentials:
-    credentials_path = TOKENS_DIR / "credentials.json"
-    token_path = TOKENS_DIR / token_filename
-    creds = None
-
-    if token_path.exists():
-        creds = Credentials.from_authorized_user_file(str(token_path), scopes)
-
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(str(credentials_path), scopes)
-            creds = flow.run_local_server(port=0)
-        token_path.write_text(creds.to_json(), encoding="utf-8")
-
-    return creds
+    return load_credentials(str(TOKENS_DIR / token_filename), scopes)
 
 
 def gmail_login():
-    creds = _load_credentials(
-        "gmail_token.json", ["https://www.googleapis.com/auth/gmail.readonly"]
+    return get_service(
+        "gmail",
+        "v1",
+        str(TOKENS_DIR / "gmail_token.json"),
+        ["https://www.googleapis.com/auth/gmail.readonly"],
     )
-    return build("gmail", "v1", credentials=creds)
 
 
-def spreadsheet_login() -> tuple[gspread.Spreadsheet, Credentials]:
+def spreadsheet_login() -> tuple[str, Credentials]:
     creds = _load_credentials(
         "sheet_token.json", ["https://www.googleapis.com/auth/spreadsheets"]
     )
@@ -101,12 +209,11 @@ def spreadsheet_login() -> tuple[gspread.Spreadsheet, Credentials]:
     if not spreadsheet_id:
         raise RuntimeError(f"{SPREADSHEET_ID_ENV} が設定されていません。")
 
-    client = gspread.authorize(creds)
-    return client.open_by_key(spreadsheet_id), creds
+    return spreadsheet_id, creds
 
 
 def _build_sheets_service(creds: Credentials):
-    return build("sheets", "v4", credentials=creds)
+    return build_service("sheets", "v4", creds)
 
 
 def _decode_message_data(data: str | None) -> str:
@@ -149,8 +256,32 @@ def _search_messages(service, query: str) -> list[dict]:
     return results
 
 
+WHITESPACE_PATTERN = re.compile(r"\s+")
+DATETIME_PATTERN = r"(\d{4}/\d{2}/\d{2}\s+\d{2}:\d{2}:\d{2})"
+AMOUNT_PATTERN = r"([0-9]{1,3}(?:,[0-9]{3})*|[0-9]+)"
+
+# カード会社ごとの抽出ルール（MailParser で1回だけコンパイルする）
+YUCHO_RULES = {
+    "occurred_at": {"line_pattern": DATETIME_PATTERN},
+    "amount": {
+        "labels": ["ご利用金額", "利用金額"],
+        "value_pattern": AMOUNT_PATTERN,
+        # ラベルが無いメールでは、最初に出てくる「〇〇円」を金額とする
+        "line_pattern": AMOUNT_PATTERN + r"\s*円",
+    },
+    "store": {"labels": ["ご利用店舗", "利用店舗"]},
+}
+SUMITOMO_RULES = {
+    "occurred_at": {"labels": ["ご利用日", "利用日"], "value_pattern": DATETIME_PATTERN},
+    "amount": {"labels": ["ご利用金額", "利用金額"], "value_pattern": AMOUNT_PATTERN},
+    "store": {"labels": ["ご利用先", "利用先"]},
+}
+YUCHO_PARSER = MailParser(YUCHO_RULES)
+SUMITOMO_PARSER = MailParser(SUMITOMO_RULES)
+
+
 def _normalize_store(store: str) -> str:
-    return re.sub(r"\s+", " ", store).strip()
+    return WHITESPACE_PATTERN.sub(" ", store).strip()
 
 
 def _parse_amount(text: str) -> int:
@@ -160,55 +291,76 @@ def _parse_amount(text: str) -> int:
     return int(normalized)
 
 
-def _first_match(patterns: Iterable[str], text: str) -> re.Match[str] | None:
-    for pattern in patterns:
-        match = re.search(pattern, text, re.MULTILINE)
-        if match:
-            return match
-    return None
-
-
-def _extract_labeled_value(text: str, labels: Iterable[str]) -> str | None:
-    for raw_line in text.splitlines():
-        line = raw_line.strip()
-        if not line:
-            continue
-
-        normalized_line = (
-            line.replace("◇", "")
-            .replace("◆", "")
-            .replace("■", "")
-            .replace("\u3000", " ")
-        )
-
-        for label in labels:
-            if label not in normalized_line:
-                continue
+def _is_retryable(error: Exception) -> bool:
+    return isinstance(error, HttpError) and error.resp.status in RETRY_STATUSES
+
+
+def _fetch_messages(
+    service,
+    message_ids: list[str],
+    fields: str = MESSAGE_FIELDS,
+    message_format: str = "full",
+    metadata_headers: list[str] | None = None,
+) -> list[dict | None]:
+    """
+    メールをバッチリクエストでまとめて取得する。
+    message_format="metadata" のときは metadata_headers のヘッダーだけを取得する。
+    戻り値は message_ids と同じ順番で、取得できなかったメールは None。
+    """
+    options = {"format": message_format, "fields": fields}
+    if metadata_headers:
+        options["metadataHeaders"] = metadata_headers
+    results: dict[str, dict] = {}
+    pending = list(message_ids)
+
+    for attempt in range(MESSAGE_BATCH_RETRIES + 1):
+        retry: list[str] = []
+        failed: dict[str, Exception] = {}
+
+        def callback(request_id, response, exception):
+            if exception is None:
+                results[request_id] = response
+            elif _is_retryable(exception):
+                retry.append(request_id)
+            else:
+                failed[request_id] = exception
+
+        for start in range(0, len(pending), MESSAGE_BATCH_SIZE):
+            batch = service.new_batch_http_request(callback=callback)
+            for message_id in pending[start : start + MESSAGE_BATCH_SIZE]:
+                batch.add(
+                    service.users()
+                    .messages()
+                    .get(userId="me", id=message_id, **options),
+                    request_id=message_id,
+                )
+            batch.execute()
 
-            parts = re.split(r"[:：]", normalized_line, maxsplit=1)
-            if len(parts) == 2:
-                return parts[1].strip()
+        for message_id, error in failed.items():
+            print(f"[Warn] メールを取得できませんでした: {message_id} - {error}")
 
-            index = normalized_line.find(label)
-            if index >= 0:
-                return normalized_line[index + len(label) :].strip()
+        if not retry:
+            break
+        if attempt == MESSAGE_BATCH_RETRIES:
+            print(f"[Warn] レート制限により取得できなかったメール {len(retry)} 件")
+            break
+        wait = 2 ** (attempt + 1)
+        log_info(f"{len(retry)} 件のメールを {wait} 秒後に再取得します。")
+        time.sleep(wait)
+        pending = retry
 
-    return None
+    return [results.get(message_id) for message_id in message_ids]
 
 
-def _collect_transactions(service, query: str, parser, label: str) -> list[Transaction]:
+def _parse_messages(payloads: list[dict], parser, label: str) -> list[Transaction]:
     transactions: list[Transaction] = []
     errors: list[str] = []
-    log_info(f"{label}メールを検索中...")
-    messages = _search_messages(service, query)
-    log_info(f"{label}メールの本文を取得・解析中...")
 
-    for message in messages:
-        payload = service.users().messages().get(userId="me", id=message["id"]).execute()
+    for payload in payloads:
         text = _extract_plain_text_from_payload(payload.get("payload", {}))
 
         try:
-            transactions.append(parser(text))
+            transactions.append(replace(parser(text), record_id=payload["id"]))
         except ValueError:
             errors.append(text[:200])
 
@@ -221,90 +373,189 @@ def _collect_transactions(service, query: str, parser, label: str) -> list[Trans
     return transactions
 
 
-def _parse_yucho_transaction(text: str) -> Transaction:
-    date_match = _first_match([r"(\d{4}/\d{2}/\d{2}\s+\d{2}:\d{2}:\d{2})"], text)
-    amount_text = _extract_labeled_value(text, ["ご利用金額", "利用金額"])
-    store_text = _extract_labeled_value(text, ["ご利用店舗", "利用店舗"])
-
-    if not amount_text:
-        amount_match = _first_match(
-            [
-                r"ご利用金額\s*[:：]?\s*([0-9]{1,3}(?:,[0-9]{3})*|[0-9]+)\s*円",
-                r"([0-9]{1,3}(?:,[0-9]{3})*|[0-9]+)\s*円",
-            ],
-            text,
+def _collect_transactions(
+    source: MailSource, service=None
+) -> tuple[list[Transaction], list[str], int]:
+    """
+    メールを検索して解析する。
+    戻り値は (取引, 本文を取得できたメールID, 本文を取得できなかったメールの件数)。
+    """
+    # サービス（HTTP接続）はスレッドごとに作る
+    service = service or gmail_login()
+    log_info(f"{source.label}メールを検索中...")
+    messages = _search_messages(service, source.query)
+    log_info(f"{source.label}メールの本文を取得・解析中...")
+
+    message_ids = [message["id"] for message in messages]
+    payloads = _fetch_messages(service, message_ids)
+    fetched = [
+        (message_id, payload)
+        for message_id, payload in zip(message_ids, payloads)
+        if payload is not None
+    ]
+    if len(fetched) < len(message_ids):
+        print(
+            f"[Warn] {source.label}で本文を取得できなかったメール "
+            f"{len(message_ids) - len(fetched)} 件"
         )
-        amount_text = amount_match.group(1) if amount_match else None
 
-    if not store_text:
-        store_match = _first_match(
-            [
-                r"ご利用店舗\s*[:：]?\s*(.+)",
-                r"利用店舗\s*[:：]?\s*(.+)",
-            ],
-            text,
-        )
-        store_text = store_match.group(1) if store_match else None
+    transactions = _parse_messages(
+        [payload for _, payload in fetched], source.parser, source.label
+    )
+    return (
+        transactions,
+        [message_id for message_id, _ in fetched],
+        len(message_ids) - len(fetched),
+    )
 
-    if not date_match or not amount_text or not store_text:
-        raise ValueError("ゆうちょメールの必要情報を抽出できませんでした。")
 
+def _build_transaction(fields: dict[str, str], source: str) -> Transaction:
     return Transaction(
-        occurred_at=date_match.group(1),
-        amount=_parse_amount(amount_text),
-        store=_normalize_store(store_text),
-        source="ゆうちょ",
+        occurred_at=fields["occurred_at"],
+        amount=_parse_amount(fields["amount"]),
+        store=_normalize_store(fields["store"]),
+        source=source,
     )
 
 
+def _parse_yucho_transaction(text: str) -> Transaction:
+    return _build_transaction(YUCHO_PARSER.parse(text), "ゆうちょ")
+
+
 def _parse_sumitomo_transaction(text: str) -> Transaction:
-    date_text = _extract_labeled_value(text, ["ご利用日", "利用日"])
-    amount_text = _extract_labeled_value(text, ["ご利用金額", "利用金額"])
-    store_text = _extract_labeled_value(text, ["ご利用先", "利用先"])
-
-    date_match = (
-        re.search(r"(\d{4}/\d{2}/\d{2}\s+\d{2}:\d{2}:\d{2})", date_text)
-        if date_text
-        else None
-    )
+    return _build_transaction(SUMITOMO_PARSER.parse(text), "三井住友")
 
-    if not date_match or not amount_text or not store_text:
-        raise ValueError("三井住友メールの必要情報を抽出できませんでした。")
 
-    return Transaction(
-        occurred_at=date_match.group(1),
-        amount=_parse_amount(amount_text),
-        store=_normalize_store(store_text),
-        source="三井住友",
-    )
+MAIL_SOURCES = (
+    MailSource("ゆうちょ", "【ゆうちょデビット】ご利用のお知らせ", _parse_yucho_transaction),
+    MailSource("三井住友", "ご利用のお知らせ【三井住友カード】", _parse_sumitomo_transaction),
+)
 
 
-def get_visa_transactions(service) -> list[Transaction]:
-    yucho_transactions = _collect_transactions(
-        service,
-        'subject:"【ゆうちょデビット】ご利用のお知らせ"',
-        _parse_yucho_transaction,
-        "ゆうちょ",
-    )
-    sumitomo_transactions = _collect_transactions(
+def _current_history_id(service) -> str:
+    return service.users().getProfile(userId="me", fields="historyId").execute()["historyId"]
+
+
+def get_visa_transactions(checkpoint: MailCheckpoint | None = None) -> list[Transaction]:
+    """
+    メールボックス全体からゆうちょ・三井住友の取引を取得する。
+    checkpoint を渡すと、検索前の historyId と処理したメールIDを記録する（保存は呼び出し側）。
+    """
+    # 検索中に届いたメールを取りこぼさないよう、historyId は検索より先に取得する
+    history_id = _current_history_id(gmail_login()) if checkpoint else None
+
+    # ゆうちょと三井住友の検索・取得は同時に行い、結果は常にこの順番で結合する
+    with ThreadPoolExecutor(max_workers=len(MAIL_SOURCES)) as executor:
+        futures = [executor.submit(_collect_transactions, source) for source in MAIL_SOURCES]
+        results = [future.result() for future in futures]
+
+    if checkpoint:
+        checkpoint.message_ids = {
+            message_id for _, message_ids, _ in results for message_id in message_ids
+        }
+        if any(missing for _, _, missing in results):
+            # 取得できなかったメールは差分取得では二度と現れないため、historyId を消して
+            # 次回もメールボックス全体を検索し直す
+            print("[Warn] 本文を取得できなかったメールがあるため、次回も全体を再検索します。")
+            checkpoint.history_id = None
+        else:
+            checkpoint.history_id = history_id
+
+    return [
+        transaction
+        for source_transactions, _, _ in results
+        for transaction in source_transactions
+    ]
+
+
+def _list_added_message_ids(service, start_history_id: str) -> tuple[list[str], str] | None:
+    """
+    startHistoryId 以降に追加されたメールIDと、最新の historyId を返す。
+    historyId が古すぎて履歴を取得できない場合は None。
+    """
+    message_ids: list[str] = []
+    page_token = None
+    while True:
+        try:
+            response = (
+                service.users()
+                .history()
+                .list(
+                    userId="me",
+                    startHistoryId=start_history_id,
+                    historyTypes="messageAdded",
+                    maxResults=500,
+                    pageToken=page_token,
+                    fields="history(messagesAdded(message(id))),nextPageToken,historyId",
+                )
+                .execute()
+            )
+        except HttpError as error:
+            if error.resp.status == 404:
+                return None
+            raise
+
+        for history in response.get("history", []):
+            for added in history.get("messagesAdded", []):
+                message_id = added["message"]["id"]
+                if message_id not in message_ids:
+                    message_ids.append(message_id)
+
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return message_ids, response["historyId"]
+
+
+def get_new_visa_transactions(checkpoint: MailCheckpoint) -> list[Transaction] | None:
+    """
+    前回の実行以降に届いたメールだけを取得・解析する。
+    履歴が失効していて差分を取得できない場合は None。
+    """
+    service = gmail_login()
+    log_info("前回の実行以降に追加されたメールを確認中...")
+    added = _list_added_message_ids(service, checkpoint.history_id)
+    if added is None:
+        return None
+
+    message_ids, history_id = added
+    new_ids = [
+        message_id for message_id in message_ids if message_id not in checkpoint.message_ids
+    ]
+    log_info(f"新しいメール: {len(new_ids)} 件")
+
+    # 件名だけを取得し、本文はゆうちょ・三井住友のメールだけ取得する
+    headers = _fetch_messages(
         service,
-        'subject:"ご利用のお知らせ【三井住友カード】"',
-        _parse_sumitomo_transaction,
-        "三井住友",
+        new_ids,
+        fields=SUBJECT_FIELDS,
+        message_format="metadata",
+        metadata_headers=["Subject"],
     )
-
-    unique_transactions = {
-        (
-            transaction.occurred_at,
-            transaction.amount,
-            transaction.store,
-            transaction.source,
-        ): transaction
-        for transaction in yucho_transactions + sumitomo_transactions
+    matched_ids = {
+        source.label: [header["id"] for header in headers if header and source.matches(header)]
+        for source in MAIL_SOURCES
     }
+    target_ids = [message_id for ids in matched_ids.values() for message_id in ids]
+    log_info(f"うちカードのご利用のお知らせ: {len(target_ids)} 件")
+
+    payloads = dict(zip(target_ids, _fetch_messages(service, target_ids)))
+    transactions: list[Transaction] = []
+    for source in MAIL_SOURCES:
+        matched = [
+            payloads[message_id]
+            for message_id in matched_ids[source.label]
+            if payloads[message_id] is not None
+        ]
+        if matched:
+            transactions.extend(_parse_messages(matched, source.parser, source.label))
+
+    # 記録するのは本文を取得できた対象のメールだけ
+    fetched_ids = {message_id for message_id, payload in payloads.items() if payload}
+    checkpoint.message_ids |= fetched_ids
+    # 件名・本文を取得できなかったメールがあれば historyId は進めず、次回もう一度確認する
+    if all(headers) and len(fetched_ids) == len(target_ids):
+        checkpoint.history_id = history_id
 
-    transactions = sorted(unique_transactions.values(), key=lambda item: item.occurred_at)
-    print(f"[Info] Visaシート反映件数: {len(transactions)}")
     return transactions
 
 
@@ -353,176 +604,298 @@ def load_paypay_transactions(csv_path: str) -> list[Transaction]:
                     amount=_parse_amount(amount_text),
                     store=_normalize_store(row.get("取引先") or ""),
                     source="PayPay",
+                    # 期間が重なる CSV を何度読み込んでも同じ行は同じキーになる
+                    record_id=row_hash(row.get(name) for name in reader.fieldnames),
                 )
             )
 
-    unique_transactions = {
-        (
-            transaction.occurred_at,
-            transaction.amount,
-            transaction.store,
-            transaction.source,
-        ): transaction
-        for transaction in transactions
-    }
+    log_info(f"PayPay CSV の支払い件数: {len(transactions)}")
+    return transactions
+
+
+def stored_transactions(store: TransactionStore, sources: Iterable[str]) -> list[Transaction]:
+    return [Transaction(*row) for row in store.transactions(list(sources))]
+
+
+def write_transactions(
+    writer: SheetBatchWriter, title: str, transactions: list[Transaction]
+) -> None:
+    rows = [TRANSACTION_HEADERS] + [transaction.as_row() for transaction in transactions]
+    writer.clear(title)
+    writer.update(title, rows)
+    writer.format(title, "B2:B", CURRENCY_FORMAT)
 
-    result = sorted(unique_transactions.values(), key=lambda item: item.occurred_at)
-    log_info(f"PayPayシート反映件数: {len(result)}")
-    return result
 
+SheetRow = tuple[str, str, int, str, str]  # (row_key, occurred_at, amount, store, source)
 
-def get_or_create_worksheet(
-    spreadsheet: gspread.Spreadsheet,
+
+def sync_transaction_sheet(
+    writer: SheetBatchWriter,
+    store: TransactionStore,
     title: str,
-    rows: int = 1000,
-    cols: int = 26,
-) -> gspread.Worksheet:
-    try:
-        worksheet = spreadsheet.worksheet(title)
-    except WorksheetNotFound:
-        worksheet = spreadsheet.add_worksheet(title=title, rows=rows, cols=cols)
+    sources: Iterable[str],
+    rebuild: bool = False,
+) -> list[SheetRow]:
+    """
+    保存済みの取引をシートに反映する。
+
+    前回シートに書き込んだ行（store に記録）と比べ、新しい取引は values.append で末尾に追記し、
+    内容が変わった取引はその行だけを書き換える。追記した行は日時順に並ばないが、集計には影響しない。
+    記録が無い・シートを作成した・取引が消えた・rebuild=True の場合は、日時順で全体を書き直す。
+    戻り値の行は、送信が成功してから store.save_sheet_rows で記録する。
+    """
+    desired: list[SheetRow] = store.keyed_transactions(list(sources))
+    current: list[SheetRow] = store.sheet_rows(title)
+    desired_by_key = {row[0]: row for row in desired}
+
+    if (
+        rebuild
+        or not current
+        or writer.is_new(title)
+        or any(row[0] not in desired_by_key for row in current)
+    ):
+        log_info(f"{title}シートを書き直します: {len(desired)} 件")
+        write_transactions(writer, title, [Transaction(*row[1:]) for row in desired])
+        return desired
+
+    rows: list[SheetRow] = []
+    changed = 0
+    for index, row in enumerate(current):
+        latest = desired_by_key[row[0]]
+        if latest != row:
+            # ヘッダーの次の行から順に並んでいる
+            writer.update(title, [list(latest[1:])], start=f"A{index + 2}")
+            changed += 1
+        rows.append(latest)
+
+    written = {row[0] for row in current}
+    added = [row for row in desired if row[0] not in written]
+    writer.append(title, [list(row[1:]) for row in added])
+    log_info(f"{title}シート: 追加 {len(added)} 件, 更新 {changed} 件")
+    return rows + added
+
+
+def write_empty_headers(writer: SheetBatchWriter, title: str) -> None:
+    writer.clear(title)
+    writer.update(title, [TRANSACTION_HEADERS])
+    writer.format(title, "B2:B", CURRENCY_FORMAT)
+
+
+def read_sheet_values(sheets_service, spreadsheet_id: str, title: str) -> list[list[object]]:
+    response = (
+        sheets_service.spreadsheets()
+        .values()
+        .get(
+            spreadsheetId=spreadsheet_id,
+            range=f"{quote_title(title)}!A:D",
+            valueRenderOption="UNFORMATTED_VALUE",
+        )
+        .execute()
+    )
+    return response.get("values", [])
 
-    if worksheet.row_count < rows:
-        worksheet.add_rows(rows - worksheet.row_count)
-    if worksheet.col_count < cols:
-        worksheet.add_cols(cols - worksheet.col_count)
 
-    return worksheet
+def read_sheet_transactions(values: list[list[object]]) -> list[Transaction]:
+    """シートに書かれている取引を読み込む（ローカルに保存していない PayPay 分の集計用）。"""
+    transactions: list[Transaction] = []
+    for row in values[1:]:
+        if len(row) < 4 or not row[0]:
+            continue
+        try:
+            amount = int(float(row[1]))
+        except (TypeError, ValueError):
+            continue
+        transactions.append(Transaction(str(row[0]), amount, str(row[2]), str(row[3])))
+    return transactions
 
 
-def write_transactions(worksheet: gspread.Worksheet, transactions: list[Transaction]) -> None:
-    rows = [TRANSACTION_HEADERS] + [transaction.as_row() for transaction in transactions]
-    worksheet.clear()
-    worksheet.update(values=rows, range_name="A1")
-    worksheet.format("B2:B", CURRENCY_FORMAT)
+def compute_aggregates(transactions: list[Transaction]) -> SpendingAggregates:
+    """月別・店舗別・月別店舗・月別店舗ピボットの集計をまとめて計算する。"""
+    if not transactions:
+        return SpendingAggregates(0, [], [], [], [])
 
+    frame = pd.DataFrame(
+        [transaction.as_row() for transaction in transactions],
+        columns=["occurred_at", "amount", "store", "source"],
+    )
+    # 集計シートの QUERY と同じく、日時の先頭7文字（YYYY/MM）を月とする
+    frame["month"] = frame["occurred_at"].str[:7]
 
-def write_empty_headers(worksheet: gspread.Worksheet) -> None:
-    worksheet.clear()
-    worksheet.update(values=[TRANSACTION_HEADERS], range_name="A1")
-    worksheet.format("B2:B", CURRENCY_FORMAT)
+    monthly = frame.groupby("month", sort=True)["amount"].sum()
+    stores = (
+        frame.groupby("store")["amount"].sum().sort_values(ascending=False, kind="stable")
+    )
+    monthly_stores = (
+        frame.groupby(["month", "store"])["amount"]
+        .sum()
+        .reset_index()
+        .sort_values(["month", "amount"], ascending=[True, False], kind="stable")
+    )
+    pivot = frame.pivot_table(
+        index="store", columns="month", values="amount", aggfunc="sum"
+    ).sort_index()
+
+    return SpendingAggregates(
+        total=int(frame["amount"].sum()),
+        monthly=[[month, int(amount)] for month, amount in monthly.items()],
+        stores=[[store, int(amount)] for store, amount in stores.items()],
+        monthly_stores=[
+            [row.month, row.store, int(row.amount)]
+            for row in monthly_stores.itertuples(index=False)
+        ],
+        pivot=[["店舗", *pivot.columns]]
+        + [
+            [store, *("" if pd.isna(amount) else int(amount) for amount in amounts)]
+            for store, amounts in zip(pivot.index, pivot.to_numpy())
+        ],
+    )
+
+
+def _write_values(
+    writer: SheetBatchWriter,
+    title: str,
+    headers: list[str],
+    rows: list[list[object]],
+    amount_range: str,
+) -> None:
+    writer.clear(title)
+    writer.update(title, [headers] + rows)
+    writer.format(title, amount_range, CURRENCY_FORMAT)
 
 
 def combined_transactions_formula() -> str:
     return "{'Visa'!A2:D;'PayPay'!A2:D}"
 
 
-def write_total_sheet(worksheet: gspread.Worksheet) -> None:
-    worksheet.clear()
-    worksheet.update(
-        values=[
+def write_total_sheet(writer: SheetBatchWriter, title: str, total: int | None = None) -> None:
+    if total is not None:
+        _write_values(writer, title, ["項目", "金額"], [["全合計", total]], "B2:B")
+        return
+
+    writer.clear(title)
+    writer.update(
+        title,
+        [
             ["項目", "金額"],
             [
                 "全合計",
                 f'=IFERROR(SUM(QUERY({combined_transactions_formula()},"select Col2 where Col1 is not null",0)),0)',
             ],
         ],
-        range_name="A1",
-        value_input_option="USER_ENTERED",
+        "A1",
+        user_entered=True,
     )
-    worksheet.format("B2:B", CURRENCY_FORMAT)
+    writer.format(title, "B2:B", CURRENCY_FORMAT)
 
 
-def write_monthly_sheet(worksheet: gspread.Worksheet) -> None:
-    worksheet.clear()
-    worksheet.update(
-        values=[["月", "合計"]],
-        range_name="A1",
-        value_input_option="USER_ENTERED",
+def write_monthly_sheet(
+    writer: SheetBatchWriter, title: str, rows: list[list[object]] | None = None
+) -> None:
+    if rows is not None:
+        _write_values(writer, title, ["月", "合計"], rows, "B2:B")
+        return
+
+    writer.clear(title)
+    writer.update(
+        title,
+        [["月", "合計"]],
+        "A1",
+        user_entered=True,
     )
-    worksheet.update(
-        values=[
+    writer.update(
+        title,
+        [
             [
                 f'=IFERROR(QUERY({{ARRAYFORMULA(LEFT(QUERY({combined_transactions_formula()},"select Col1 where Col1 is not null",0),7)),QUERY({combined_transactions_formula()},"select Col2 where Col1 is not null",0)}},"select Col1, sum(Col2) group by Col1 order by Col1 label sum(Col2) \'\'",0),{{"",""}})'
             ]
         ],
-        range_name="A2",
-        value_input_option="USER_ENTERED",
+        "A2",
+        user_entered=True,
     )
-    worksheet.format("B2:B", CURRENCY_FORMAT)
+    writer.format(title, "B2:B", CURRENCY_FORMAT)
 
 
-def write_store_sheet(worksheet: gspread.Worksheet) -> None:
-    worksheet.clear()
-    worksheet.update(
-        values=[["店舗", "合計"]],
-        range_name="A1",
-        value_input_option="USER_ENTERED",
+def write_store_sheet(
+    writer: SheetBatchWriter, title: str, rows: list[list[object]] | None = None
+) -> None:
+    if rows is not None:
+        _write_values(writer, title, ["店舗", "合計"], rows, "B2:B")
+        return
+
+    writer.clear(title)
+    writer.update(
+        title,
+        [["店舗", "合計"]],
+        "A1",
+        user_entered=True,
     )
-    worksheet.update(
-        values=[
+    writer.update(
+        title,
+        [
             [
                 f'=IFERROR(QUERY({combined_transactions_formula()},"select Col3, sum(Col2) where Col1 is not null group by Col3 order by sum(Col2) desc label sum(Col2) \'\'",0),{{"",""}})'
             ]
         ],
-        range_name="A2",
-        value_input_option="USER_ENTERED",
+        "A2",
+        user_entered=True,
     )
-    worksheet.format("B2:B", CURRENCY_FORMAT)
+    writer.format(title, "B2:B", CURRENCY_FORMAT)
 
 
-def write_monthly_store_sheet(worksheet: gspread.Worksheet) -> None:
-    worksheet.clear()
-    worksheet.update(
-        values=[["月", "店舗", "合計"]],
-        range_name="A1",
-        value_input_option="USER_ENTERED",
+def write_monthly_store_sheet(
+    writer: SheetBatchWriter, title: str, rows: list[list[object]] | None = None
+) -> None:
+    if rows is not None:
+        _write_values(writer, title, ["月", "店舗", "合計"], rows, "C2:C")
+        return
+
+    writer.clear(title)
+    writer.update(
+        title,
+        [["月", "店舗", "合計"]],
+        "A1",
+        user_entered=True,
     )
-    worksheet.update(
-        values=[
+    writer.update(
+        title,
+        [
             [
                 f'=IFERROR(QUERY({{ARRAYFORMULA(LEFT(QUERY({combined_transactions_formula()},"select Col1 where Col1 is not null",0),7)),QUERY({combined_transactions_formula()},"select Col3 where Col1 is not null",0),QUERY({combined_transactions_formula()},"select Col2 where Col1 is not null",0)}},"select Col1, Col2, sum(Col3) group by Col1, Col2 order by Col1, sum(Col3) desc label sum(Col3) \'\'",0),{{"","",""}})'
             ]
         ],
-        range_name="A2",
-        value_input_option="USER_ENTERED",
+        "A2",
+        user_entered=True,
     )
-    worksheet.format("C2:C", CURRENCY_FORMAT)
+    writer.format(title, "C2:C", CURRENCY_FORMAT)
 
 
-def write_monthly_store_pivot_sheet(worksheet: gspread.Worksheet) -> None:
-    worksheet.clear()
-    worksheet.update(
-        values=[["店舗", "月別利用額"]],
-        range_name="A1",
-        value_input_option="USER_ENTERED",
+def write_monthly_store_pivot_sheet(
+    writer: SheetBatchWriter, title: str, rows: list[list[object]] | None = None
+) -> None:
+    if rows is not None:
+        # QUERY の pivot と同じく、1行目は「店舗」と月の見出し
+        headers, *body = rows or [["店舗", "月別利用額"]]
+        _write_values(writer, title, headers, body, "B2:ZZ")
+        return
+
+    writer.clear(title)
+    writer.update(
+        title,
+        [["店舗", "月別利用額"]],
+        "A1",
+        user_entered=True,
     )
-    worksheet.update(
-        values=[
+    writer.update(
+        title,
+        [
             [
                 f'=IFERROR(QUERY({{QUERY({combined_transactions_formula()},"select Col3 where Col1 is not null",0),ARRAYFORMULA(LEFT(QUERY({combined_transactions_formula()},"select Col1 where Col1 is not null",0),7)),QUERY({combined_transactions_formula()},"select Col2 where Col1 is not null",0)}},"select Col1, sum(Col3) where Col1 is not null group by Col1 pivot Col2 label sum(Col3) \'\'",0),{{"店舗"}})'
             ]
         ],
-        range_name="A2",
-        value_input_option="USER_ENTERED",
+        "A2",
+        user_entered=True,
     )
-    worksheet.format("B2:ZZ", CURRENCY_FORMAT)
-
-
-def _delete_existing_charts(sheets_service, spreadsheet_id: str, target_sheet_ids: set[int]) -> None:
-    metadata = (
-        sheets_service.spreadsheets()
-        .get(
-            spreadsheetId=spreadsheet_id,
-            fields="sheets(properties(sheetId),charts(chartId,position))",
-        )
-        .execute()
-    )
-
-    delete_requests = []
-    for sheet in metadata.get("sheets", []):
-        for chart in sheet.get("charts", []):
-            anchor = chart.get("position", {}).get("overlayPosition", {}).get("anchorCell", {})
-            if anchor.get("sheetId") in target_sheet_ids:
-                delete_requests.append(
-                    {"deleteEmbeddedObject": {"objectId": chart["chartId"]}}
-                )
-
-    if delete_requests:
-        sheets_service.spreadsheets().batchUpdate(
-            spreadsheetId=spreadsheet_id,
-            body={"requests": delete_requests},
-        ).execute()
+    writer.format(title, "B2:ZZ", CURRENCY_FORMAT)
 
 
 def _source_range(sheet_id: int, start_row: int, end_row: int, start_col: int, end_col: int):
@@ -540,14 +913,12 @@ def _source_range(sheet_id: int, start_row: int, end_row: int, start_col: int, e
 
 
 def create_summary_charts(
-    spreadsheet: gspread.Spreadsheet,
-    creds: Credentials,
-    monthly_sheet: gspread.Worksheet,
-    store_sheet: gspread.Worksheet,
+    writer: SheetBatchWriter, monthly_title: str, store_title: str
 ) -> None:
-    sheets_service = _build_sheets_service(creds)
-    spreadsheet_id = spreadsheet.id
-    _delete_existing_charts(sheets_service, spreadsheet_id, {monthly_sheet.id, store_sheet.id})
+    writer.delete_charts(monthly_title)
+    writer.delete_charts(store_title)
+    monthly_sheet_id = writer.sheet_id(monthly_title)
+    store_sheet_id = writer.sheet_id(store_title)
 
     requests = [
         {
@@ -563,12 +934,12 @@ def create_summary_charts(
                                 {"position": "LEFT_AXIS", "title": "金額"},
                             ],
                             "domains": [
-                                {"domain": {"sourceRange": _source_range(monthly_sheet.id, 1, 2000, 0, 1)}}
+                                {"domain": {"sourceRange": _source_range(monthly_sheet_id, 1, 2000, 0, 1)}}
                             ],
                             "series": [
                                 {
                                     "series": {
-                                        "sourceRange": _source_range(monthly_sheet.id, 1, 2000, 1, 2)
+                                        "sourceRange": _source_range(monthly_sheet_id, 1, 2000, 1, 2)
                                     },
                                     "targetAxis": "LEFT_AXIS",
                                 }
@@ -579,7 +950,7 @@ def create_summary_charts(
                     "position": {
                         "overlayPosition": {
                             "anchorCell": {
-                                "sheetId": monthly_sheet.id,
+                                "sheetId": monthly_sheet_id,
                                 "rowIndex": 0,
                                 "columnIndex": 3,
                             },
@@ -605,12 +976,12 @@ def create_summary_charts(
                                 {"position": "LEFT_AXIS", "title": "店舗"},
                             ],
                             "domains": [
-                                {"domain": {"sourceRange": _source_range(store_sheet.id, 1, 11, 0, 1)}}
+                                {"domain": {"sourceRange": _source_range(store_sheet_id, 1, 11, 0, 1)}}
                             ],
                             "series": [
                                 {
                                     "series": {
-                                        "sourceRange": _source_range(store_sheet.id, 1, 11, 1, 2)
+                                        "sourceRange": _source_range(store_sheet_id, 1, 11, 1, 2)
                                     },
                                     "targetAxis": "BOTTOM_AXIS",
                                 }
@@ -621,7 +992,7 @@ def create_summary_charts(
                     "position": {
                         "overlayPosition": {
                             "anchorCell": {
-                                "sheetId": store_sheet.id,
+                                "sheetId": store_sheet_id,
                                 "rowIndex": 0,
                                 "columnIndex": 3,
                             },
@@ -636,10 +1007,8 @@ def create_summary_charts(
         },
     ]
 
-    sheets_service.spreadsheets().batchUpdate(
-        spreadsheetId=spreadsheet_id,
-        body={"requests": requests},
-    ).execute()
+    for request in requests:
+        writer.add_request(request)
 
 
 def main() -> None:
@@ -650,49 +1019,91 @@ def main() -> None:
     args = parse_args()
 
     log_step(2, "Gmail に認証中...")
-    service = gmail_login()
+    gmail_login()
     log_step(3, "スプレッドシートに認証中...")
-    spreadsheet, sheet_creds = spreadsheet_login()
+    spreadsheet_id, sheet_creds = spreadsheet_login()
+    sheets_service = _build_sheets_service(sheet_creds)
 
     log_step(4, "ワークシートを確認・作成中...")
-    visa_sheet = get_or_create_worksheet(spreadsheet, VISA_SHEET_NAME, rows=2000, cols=8)
-    paypay_sheet = get_or_create_worksheet(spreadsheet, PAYPAY_SHEET_NAME, rows=2000, cols=8)
-    summary_sheet = get_or_create_worksheet(spreadsheet, SUMMARY_SHEET_NAME, rows=200, cols=8)
-    monthly_sheet = get_or_create_worksheet(spreadsheet, MONTHLY_SHEET_NAME, rows=2000, cols=8)
-    store_sheet = get_or_create_worksheet(spreadsheet, STORE_SHEET_NAME, rows=2000, cols=8)
-    monthly_store_sheet = get_or_create_worksheet(
-        spreadsheet, MONTHLY_STORE_SHEET_NAME, rows=5000, cols=8
-    )
-    monthly_store_pivot_sheet = get_or_create_worksheet(
-        spreadsheet, MONTHLY_STORE_PIVOT_SHEET_NAME, rows=5000, cols=60
-    )
+    # シートの作成・書き込み・書式・グラフの変更はためておき、最後にまとめて送信する
+    writer = SheetBatchWriter(sheets_service, spreadsheet_id)
+    for title, rows, cols in SHEET_LAYOUT:
+        writer.ensure_sheet(title, rows, cols)
+
+    log_step(5, "Visa 取引を取得中...")
+    store = TransactionStore()
+    checkpoint = MailCheckpoint()
+    new_transactions = None
+    if args.full_rescan or not checkpoint.history_id or not store.has_origin(GMAIL_ORIGIN):
+        log_info("メールボックス全体を検索します。")
+    else:
+        new_transactions = get_new_visa_transactions(checkpoint)
+        if new_transactions is None:
+            log_info("前回の履歴が失効しているため、メールボックス全体を検索します。")
 
-    log_step(5, "Visa 取引を取得してシートへ反映中...")
-    visa_transactions = get_visa_transactions(service)
-    write_transactions(visa_sheet, visa_transactions)
+    if new_transactions is None:
+        visa_transactions = get_visa_transactions(checkpoint)
+        store.replace_origin(GMAIL_ORIGIN, [t.as_record() for t in visa_transactions])
+    else:
+        store.upsert(GMAIL_ORIGIN, [t.as_record() for t in new_transactions])
+    # シートに書き込んだ行は、送信が成功してからまとめて記録する
+    sheet_rows = {
+        VISA_SHEET_NAME: sync_transaction_sheet(
+            writer, store, VISA_SHEET_NAME, VISA_SOURCES, rebuild=args.full_rescan
+        )
+    }
 
     log_step(6, "PayPay 取引の反映可否を確認中...")
+    paypay_values: list[list[object]] = []
+    if not args.paypay_csv and not writer.is_new(PAYPAY_SHEET_NAME):
+        paypay_values = read_sheet_values(sheets_service, spreadsheet_id, PAYPAY_SHEET_NAME)
+
     if args.paypay_csv:
         log_info(f"PayPay CSV を読み込みます: {args.paypay_csv}")
         paypay_transactions = load_paypay_transactions(args.paypay_csv)
-        write_transactions(paypay_sheet, paypay_transactions)
-    elif not paypay_sheet.get_all_values():
+        store.upsert(PAYPAY_CSV_ORIGIN, [t.as_record() for t in paypay_transactions])
+        # 以前に読み込んだ CSV の分も含めて、保存済みの PayPay 取引をシートに反映する
+        sheet_rows[PAYPAY_SHEET_NAME] = sync_transaction_sheet(
+            writer, store, PAYPAY_SHEET_NAME, PAYPAY_SOURCES, rebuild=args.full_rescan
+        )
+    elif not paypay_values:
         log_info("PayPay シートが空のため、ヘッダーのみ初期化します。")
-        write_empty_headers(paypay_sheet)
+        write_empty_headers(writer, PAYPAY_SHEET_NAME)
+        sheet_rows[PAYPAY_SHEET_NAME] = []
     else:
         log_info("PayPay CSV 未指定のため、既存の PayPay シートをそのまま利用します。")
 
-    log_step(7, "集計シートを更新中...")
-    write_total_sheet(summary_sheet)
-    write_monthly_sheet(monthly_sheet)
-    write_store_sheet(store_sheet)
-    write_monthly_store_sheet(monthly_store_sheet)
-    write_monthly_store_pivot_sheet(monthly_store_pivot_sheet)
-    log_step(8, "グラフを作成して完了処理中...")
-    create_summary_charts(spreadsheet, sheet_creds, monthly_sheet, store_sheet)
+    log_step(7, "集計シートを作成中...")
+    if args.aggregate_mode == "formula":
+        write_total_sheet(writer, SUMMARY_SHEET_NAME)
+        write_monthly_sheet(writer, MONTHLY_SHEET_NAME)
+        write_store_sheet(writer, STORE_SHEET_NAME)
+        write_monthly_store_sheet(writer, MONTHLY_STORE_SHEET_NAME)
+        write_monthly_store_pivot_sheet(writer, MONTHLY_STORE_PIVOT_SHEET_NAME)
+    else:
+        transactions = stored_transactions(store, VISA_SOURCES + PAYPAY_SOURCES)
+        if not store.has_origin(PAYPAY_CSV_ORIGIN):
+            # CSV をまだ取り込んでいない場合は、既存の PayPay シートの内容を使う
+            transactions += read_sheet_transactions(paypay_values)
+        aggregates = compute_aggregates(transactions)
+        write_total_sheet(writer, SUMMARY_SHEET_NAME, aggregates.total)
+        write_monthly_sheet(writer, MONTHLY_SHEET_NAME, aggregates.monthly)
+        write_store_sheet(writer, STORE_SHEET_NAME, aggregates.stores)
+        write_monthly_store_sheet(writer, MONTHLY_STORE_SHEET_NAME, aggregates.monthly_stores)
+        write_monthly_store_pivot_sheet(
+            writer, MONTHLY_STORE_PIVOT_SHEET_NAME, aggregates.pivot
+        )
 
-    log_info("スプレッドシートの更新が完了しました。")
+    log_step(8, "グラフを作成してスプレッドシートへ送信中...")
+    create_summary_charts(writer, MONTHLY_SHEET_NAME, STORE_SHEET_NAME)
+    writer.flush()
+    # シートへの反映が終わってから記録する（途中で失敗したら次回やり直す）
+    for title, rows in sheet_rows.items():
+        store.save_sheet_rows(title, rows)
+    store.close()
+    checkpoint.save()
 
+    log_info("スプレッドシートの更新が完了しました。")
 
 if __name__ == "__main__":
     main()
@@ -5,33 +5,13 @@ import re
 
 import gspread
 from dotenv import load_dotenv
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+
+from google_client import get_service
 
 
 def gmail_login():
-    credentials_path = os.path.join(
-        os.path.dirname(os.path.abspath(__file__)), "..", "tokens", "credentials.json"
-    )
-    gmail_token_path = os.path.join(
-        os.path.dirname(os.path.abspath(__file__)), "..", "tokens", "gmail_token.json"
-    )
     SCOPES = ["https://www.googleapis.com/auth/gmail.readonly"]
-    creds = None
-    if os.path.exists(gmail_token_path):
-        creds = Credentials.from_authorized_user_file(gmail_token_path, SCOPES)
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(credentials_path, SCOPES)
-            creds = flow.run_local_server(port=0)
-        with open(gmail_token_path, "w") as token:
-            token.write(creds.to_json())
-    service = build("gmail", "v1", credentials=creds)
-    return service
+    return get_service("gmail", "v1", "gmail_token.json", SCOPES)
 
 
 def get_email_messages(service):
@@ -0,0 +1,211 @@
+"""
+YuchoMailOutput のメール解析の速度と失敗率を、合成したメール本文で計測する。
+
+    python YuchoMailParserBenchmark.py --count 20000 --seed 0
+
+カード会社を追加したときは、抽出ルールと MAIL_SOURCES に加えて、ここの TEMPLATES に
+そのメールの書式を足すと、同じ条件で速度と失敗率を比べられる。
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from dataclasses import dataclass
+
+from YuchoMailOutput import MAIL_SOURCES, Transaction
+
+# {date}, {amount}, {store} を埋めて本文を作る。valid=False は解析に失敗するのが正しい本文
+TEMPLATES = {
+    "ゆうちょ": [
+        (
+            True,
+            "【ゆうちょデビット】ご利用のお知らせ\n"
+            "いつもゆうちょデビットをご利用いただき、ありがとうございます。\n"
+            "以下のとおりご利用がありましたのでお知らせします。\n\n"
+            "◇ご利用日時：{date}\n◇ご利用金額：{amount}円\n◇ご利用店舗：{store}\n\n"
+            "※本メールは送信専用です。\n",
+        ),
+        (
+            True,
+            "ゆうちょデビットのご利用について\n\n"
+            "■利用日時　{date}\n■利用金額　{amount}円\n■利用店舗　{store}\n",
+        ),
+        (
+            True,
+            "【ゆうちょデビット】ご利用のお知らせ\n\n"
+            "ご利用日時：{date}\nご利用金額：\n　{amount}円\nご利用店舗：\n　{store}\n",
+        ),
+        (
+            True,
+            "【ゆうちょデビット】ご利用のお知らせ\n"
+            "{date} に {amount}円 のご利用がありました。\n"
+            "ご利用店舗：{store}\n",
+        ),
+        (
+            False,
+            "【ゆうちょデビット】ご利用のお知らせ\n"
+            "ご利用日時：{date}\nご利用金額：{amount}円\n",
+        ),
+    ],
+    "三井住友": [
+        (
+            True,
+            "いつも三井住友カードをご利用頂きありがとうございます。\n"
+            "お客様のカードご利用内容をお知らせいたします。\n\n"
+            "ご利用カード：三井住友カード\n\n"
+            "◇利用日：{date}\n◇利用先：{store}\n◇利用取引：買物\n◇利用金額：{amount}円\n\n"
+            "ご利用内容の詳細はVpassでご確認ください。\n",
+        ),
+        (
+            True,
+            "ご利用のお知らせ【三井住友カード】\n\n"
+            "ご利用日：{date}\nご利用先：{store}\nご利用金額：{amount}円\n",
+        ),
+        (
+            False,
+            "ご利用のお知らせ【三井住友カード】\n\n"
+            "ご利用日：{date}\nご利用先：{store}\n",
+        ),
+    ],
+}
+
+# 実際のメールの末尾に付く案内文（解析の打ち切りが効くかを見るため、すべての本文に付ける）
+FOOTER = (
+    "\n――――――――――――――――――――\n"
+    "■本メールについて\n"
+    "本メールは、ご登録いただいたメールアドレスへ自動で送信しています。\n"
+    "本メールへのご返信にはお答えできませんのでご了承ください。\n"
+    "ご利用内容に心当たりがない場合は、至急お問い合わせ窓口までご連絡ください。\n"
+    "■お問い合わせ\n"
+    "受付時間：9:00～17:00（土日祝日・年末年始を除く）\n"
+    "■ご利用明細の確認方法\n"
+    "会員サイトにログインし、「ご利用明細」からご確認いただけます。\n"
+    "――――――――――――――――――――\n"
+) * 3
+
+STORES = [
+    "セブン-イレブン",
+    "ローソン",
+    "AMAZON.CO.JP",
+    "ＪＲ東日本　モバイルＳｕｉｃａ",
+    "GOOGLE *YouTube",
+    "スターバックス コーヒー",
+    "ヨドバシカメラ マルチメディアAkiba",
+]
+
+
+@dataclass(frozen=True)
+class Sample:
+    source: str
+    text: str
+    expected: Transaction | None
+
+
+def build_corpus(count: int, seed: int) -> list[Sample]:
+    """カード会社ごとに count 件ずつ、決まった乱数で本文を作る。"""
+    rng = random.Random(seed)
+    corpus: list[Sample] = []
+    for source in MAIL_SOURCES:
+        templates = TEMPLATES.get(source.label)
+        if not templates:
+            print(f"[Warn] {source.label} のテンプレートが無いため計測しません。")
+            continue
+        for _ in range(count):
+            valid, template = rng.choice(templates)
+            date = (
+                f"{rng.randint(2019, 2026)}/{rng.randint(1, 12):02}/{rng.randint(1, 28):02} "
+                f"{rng.randint(0, 23):02}:{rng.randint(0, 59):02}:{rng.randint(0, 59):02}"
+            )
+            amount = rng.randint(1, 300000)
+            store = rng.choice(STORES)
+            text = template.format(date=date, amount=f"{amount:,}", store=store) + FOOTER
+            expected = (
+                Transaction(date, amount, " ".join(store.replace("　", " ").split()), source.label)
+                if valid
+                else None
+            )
+            corpus.append(Sample(source.label, text, expected))
+    return corpus
+
+
+def run(corpus: list[Sample], rounds: int) -> dict[str, dict[str, float]]:
+    parsers = {source.label: source.parser for source in MAIL_SOURCES}
+    report: dict[str, dict[str, float]] = {}
+
+    for label in parsers:
+        samples = [sample for sample in corpus if sample.source == label]
+        if not samples:
+            continue
+        parser = parsers[label]
+
+        results: list[Transaction | None] = []
+        start = time.perf_counter()
+        for _ in range(rounds):
+            results = []
+            for sample in samples:
+                try:
+                    results.append(parser(sample.text))
+                except ValueError:
+                    results.append(None)
+        elapsed = time.perf_counter() - start
+
+        valid = [(s, r) for s, r in zip(samples, results) if s.expected is not None]
+        invalid = [(s, r) for s, r in zip(samples, results) if s.expected is None]
+        failures = sum(1 for _, result in valid if result is None)
+        mismatches = sum(
+            1 for sample, result in valid if result is not None and result != sample.expected
+        )
+        accepted_invalid = sum(1 for _, result in invalid if result is not None)
+
+        report[label] = {
+            "mails": len(samples),
+            "parses_per_second": len(samples) * rounds / elapsed if elapsed else 0.0,
+            "failure_rate": failures / len(valid) if valid else 0.0,
+            "mismatches": mismatches,
+            "invalid_mails": len(invalid),
+            "invalid_accepted": accepted_invalid,
+        }
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="メール解析のベンチマーク")
+    parser.add_argument("--count", type=int, default=5000, help="カード会社ごとの本文の件数")
+    parser.add_argument("--rounds", type=int, default=3, help="同じ本文を解析する回数")
+    parser.add_argument("--seed", type=int, default=0, help="本文を作る乱数のシード")
+    parser.add_argument("--dump", help="作った本文を JSON Lines で保存するパス")
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.count, args.seed)
+    if args.dump:
+        with open(args.dump, "w", encoding="utf-8") as f:
+            for sample in corpus:
+                f.write(
+                    json.dumps(
+                        {
+                            "source": sample.source,
+                            "text": sample.text,
+                            "expected": sample.expected.as_row() if sample.expected else None,
+                        },
+                        ensure_ascii=False,
+                    )
+                    + "\n"
+                )
+        print(f"[Info] 本文を保存しました: {args.dump}")
+
+    report = run(corpus, args.rounds)
+    for label, result in report.items():
+        print(
+            f"[Info] {label}: {result['mails']} 件, "
+            f"{result['parses_per_second']:,.0f} 件/秒, "
+            f"失敗率 {result['failure_rate']:.2%}, "
+            f"値の不一致 {result['mismatches']} 件, "
+            f"不正な本文を受理 {result['invalid_accepted']}/{result['invalid_mails']} 件"
+        )
+
+
+if __name__ == "__main__":
+    main()
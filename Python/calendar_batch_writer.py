@@ -0,0 +1,137 @@
+import json
+import time
+
+from googleapiclient.errors import HttpError
+
+# Calendar APIのバッチリクエストは1回50件まで
+BATCH_LIMIT = 50
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RETRY_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")
+
+
+class CalendarBatchWriter:
+    """
+    Googleカレンダーへのイベント追加をまとめて送るクラス
+
+    - add() でイベントをためておき、flush() でバッチHTTPリクエスト（1回50件まで）として送信
+    - event_idを指定したイベントは追加ではなく既存イベントの更新（patch）として送信
+    - バッチ内の1件ごとに成功・失敗を判定し、レート制限や5xxの分だけを待機して再送
+    - with文で使うと、ブロックを抜けるときに残りを送信する
+    """
+
+    def __init__(self, service, calendar_id, batch_size=BATCH_LIMIT, max_retries=3, on_result=None):
+        """
+        :param service: Calendar APIのサービス
+        :param calendar_id: 追加先のカレンダーID
+        :param batch_size: 1回のバッチで送る件数（最大50）
+        :param max_retries: 一時的なエラーの再送回数
+        :param on_result: 1件ごとに呼ばれるコールバック on_result(label, event, error)
+                          成功時はerrorがNone、失敗時はeventがNone
+        """
+        self.service = service
+        self.calendar_id = calendar_id
+        self.batch_size = min(batch_size, BATCH_LIMIT)
+        self.max_retries = max_retries
+        self.on_result = on_result
+        self.pending = []  # [(label, event, event_id)]
+        self.inserted = []  # [(label, 作成・更新されたイベント)]
+        self.failed = []  # [(label, エラー)]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+
+    def add(self, event, label=None, event_id=None):
+        """
+        イベントを送信待ちに追加する（batch_size件たまったら自動で送信）
+
+        :param event: イベントの内容
+        :param label: コールバックに渡す名前（省略時はsummary）
+        :param event_id: 既存イベントのID（指定すると追加ではなく更新する）
+        """
+        label = label if label is not None else event.get("summary")
+        self.pending.append((label, event, event_id))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        送信待ちのイベントをすべて送信する
+
+        :return: 今回追加・更新できたイベントのリスト [(label, 作成・更新されたイベント)]
+        """
+        inserted = []
+        while self.pending:
+            chunk = self.pending[: self.batch_size]
+            self.pending = self.pending[self.batch_size :]
+            inserted.extend(self._send(chunk))
+        return inserted
+
+    def _send(self, chunk):
+        inserted = []
+        for attempt in range(self.max_retries + 1):
+            retry = []
+
+            def callback(request_id, response, exception):
+                label, event, event_id = chunk[int(request_id)]
+                if exception is None:
+                    inserted.append((label, response))
+                    self.inserted.append((label, response))
+                    self._notify(label, response, None)
+                elif _is_retryable(exception) and attempt < self.max_retries:
+                    retry.append((label, event, event_id))
+                else:
+                    self.failed.append((label, exception))
+                    self._notify(label, None, exception)
+
+            batch = self.service.new_batch_http_request(callback=callback)
+            for index, (_, event, event_id) in enumerate(chunk):
+                batch.add(self._request(event, event_id), request_id=str(index))
+            try:
+                batch.execute()
+            except HttpError as e:
+                # バッチ全体が失敗した場合は、全件をまとめて再送する
+                if not _is_retryable(e) or attempt >= self.max_retries:
+                    for label, _, _ in chunk:
+                        self.failed.append((label, e))
+                        self._notify(label, None, e)
+                    return inserted
+                retry = chunk
+
+            if not retry:
+                return inserted
+
+            wait = 2 ** (attempt + 1)
+            print(f"[Info] {len(retry)}件のイベントを{wait}秒後に再送します ({attempt + 1}/{self.max_retries})")
+            time.sleep(wait)
+            chunk = retry
+        return inserted
+
+    def _request(self, event, event_id):
+        events = self.service.events()
+        if event_id:
+            return events.patch(calendarId=self.calendar_id, eventId=event_id, body=event)
+        return events.insert(calendarId=self.calendar_id, body=event)
+
+    def _notify(self, label, event, error):
+        if self.on_result:
+            self.on_result(label, event, error)
+
+
+def _is_retryable(error):
+    """レート制限・一時的なサーバーエラーかどうか"""
+    if not isinstance(error, HttpError):
+        return False
+    status = error.resp.status
+    if status in RETRY_STATUSES:
+        return True
+    if status == 403:
+        try:
+            reason = json.loads(error.content.decode("utf-8"))["error"]["errors"][0]["reason"]
+        except (AttributeError, KeyError, IndexError, TypeError, ValueError):
+            return False
+        return reason in RETRY_REASONS
+    return False
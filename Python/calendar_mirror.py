@@ -0,0 +1,242 @@
+import os
+import sqlite3
+from datetime import date, datetime
+
+from googleapiclient.errors import HttpError
+
+# スクリプトのディレクトリとプロジェクトルートを取得
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+TOKENS_DIR = os.path.join(PROJECT_ROOT, "tokens")
+DEFAULT_DB_PATH = os.path.join(TOKENS_DIR, "calendar_mirror.sqlite3")
+
+# 重複チェックに必要な項目だけを取得する
+EVENT_FIELDS = (
+    "nextPageToken,nextSyncToken,"
+    "items(id,status,summary,start,updated,extendedProperties/private)"
+)
+# 追加したイベントに付ける印（extendedProperties.private のキー）。値は追加したスクリプトの名前
+OWNER_PROPERTY = "createdBy"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    calendar_id TEXT NOT NULL,
+    event_id TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    all_day INTEGER NOT NULL,
+    updated TEXT,
+    owner TEXT,
+    PRIMARY KEY (calendar_id, event_id)
+);
+CREATE INDEX IF NOT EXISTS events_summary ON events (calendar_id, summary);
+CREATE TABLE IF NOT EXISTS sync_state (
+    calendar_id TEXT PRIMARY KEY,
+    sync_token TEXT,
+    synced_at TEXT
+);
+"""
+
+
+class CalendarMirror:
+    """
+    Googleカレンダーのイベントをローカルの SQLite に複製しておくクラス
+
+    - 初回はカレンダー全体を取得し、以降は syncToken で前回からの変更分だけを取得
+    - 重複チェックや追加・更新の判定は API ではなく手元の複製に対して行う
+    - 複数のカレンダーを同じファイルに calendar_id ごとに保存する
+    - 追加するイベントには owner の印を付け、日付を動かすのは自分で追加した今後のイベントだけにする
+    """
+
+    def __init__(self, service, calendar_id, owner, db_path=DEFAULT_DB_PATH):
+        """
+        :param service: Calendar APIのサービス
+        :param calendar_id: 複製するカレンダーのID
+        :param owner: イベントを追加するスクリプトの名前（extendedProperties.private に保存）
+        :param db_path: SQLiteファイルのパス
+        """
+        self.service = service
+        self.calendar_id = calendar_id
+        self.owner = owner
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+        self.queued = set()  # この実行で送信待ちにしたsummary
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def _migrate(self):
+        """owner 列が無い古い複製は、列を追加して次の同期で全件取得し直す"""
+        columns = {
+            row["name"] for row in self.conn.execute("PRAGMA table_info(events)")
+        }
+        if "owner" in columns:
+            return
+        with self.conn:
+            self.conn.execute("ALTER TABLE events ADD COLUMN owner TEXT")
+            self.conn.execute("DELETE FROM sync_state")
+
+    def sync(self):
+        """
+        前回の同期からの変更を取り込む
+        syncTokenが失効している（410）場合は、複製を作り直す
+
+        :return: 取り込んだ変更の件数
+        """
+        sync_token = self._sync_token()
+        try:
+            return self._sync(sync_token)
+        except HttpError as e:
+            if sync_token is None or e.resp.status != 410:
+                raise
+            print("[Info] 同期トークンが失効したため、カレンダーを全件取得し直します")
+            with self.conn:
+                self.conn.execute(
+                    "DELETE FROM events WHERE calendar_id = ?", (self.calendar_id,)
+                )
+                self.conn.execute(
+                    "DELETE FROM sync_state WHERE calendar_id = ?", (self.calendar_id,)
+                )
+            return self._sync(None)
+
+    def _sync(self, sync_token):
+        changes = 0
+        page_token = None
+        while True:
+            params = {
+                "calendarId": self.calendar_id,
+                "maxResults": 2500,
+                "pageToken": page_token,
+                "fields": EVENT_FIELDS,
+            }
+            if sync_token:
+                # syncTokenを使うときは期間などの絞り込みを指定できない
+                params["syncToken"] = sync_token
+            result = self.service.events().list(**params).execute()
+
+            # ページごとに確定させ、途中で失敗しても次回は同じトークンからやり直す
+            with self.conn:
+                for event in result.get("items", []):
+                    if event.get("status") == "cancelled":
+                        self._delete(event["id"])
+                    else:
+                        self._store(event)
+                    changes += 1
+
+            page_token = result.get("nextPageToken")
+            if not page_token:
+                break
+
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sync_state (calendar_id, sync_token, synced_at)"
+                " VALUES (?, ?, ?)",
+                (
+                    self.calendar_id,
+                    result.get("nextSyncToken"),
+                    datetime.now().isoformat(timespec="seconds"),
+                ),
+            )
+        mode = "差分" if sync_token else "全件"
+        print(f"[Info] カレンダーを同期しました（{mode}）: {changes}件")
+        return changes
+
+    def _sync_token(self):
+        row = self.conn.execute(
+            "SELECT sync_token FROM sync_state WHERE calendar_id = ?",
+            (self.calendar_id,),
+        ).fetchone()
+        return row["sync_token"] if row else None
+
+    def _store(self, event):
+        start = event.get("start", {})
+        all_day = "date" in start
+        start_date = start.get("date") or start.get("dateTime", "")[:10]
+        private = event.get("extendedProperties", {}).get("private", {})
+        self.conn.execute(
+            "INSERT OR REPLACE INTO events"
+            " (calendar_id, event_id, summary, start_date, all_day, updated, owner)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                self.calendar_id,
+                event["id"],
+                event.get("summary", ""),
+                start_date,
+                int(all_day),
+                event.get("updated"),
+                private.get(OWNER_PROPERTY),
+            ),
+        )
+
+    def _delete(self, event_id):
+        self.conn.execute(
+            "DELETE FROM events WHERE calendar_id = ? AND event_id = ?",
+            (self.calendar_id, event_id),
+        )
+
+    def record(self, event):
+        """追加・更新したイベント（APIのレスポンス）を複製に反映する"""
+        with self.conn:
+            self._store(event)
+
+    def find(self, summary):
+        """
+        同じタイトルの終日イベントを取得する
+
+        :return: [{"event_id", "summary", "start_date", ...}]
+        """
+        rows = self.conn.execute(
+            "SELECT * FROM events WHERE calendar_id = ? AND summary = ? AND all_day = 1",
+            (self.calendar_id, summary),
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def exists(self, date, summary):
+        """同じ日付・同じタイトルの終日イベントがあるか"""
+        return any(row["start_date"] == date for row in self.find(summary))
+
+    def upsert(self, writer, event, label=None):
+        """
+        終日イベントを複製と照らし合わせて、必要なときだけ writer に送信待ちとして追加する
+
+        - 同じ日付・同じタイトルがあれば何もしない
+        - このスクリプトが追加した今日以降のイベントが、同じタイトルで1件だけ別の日付にあれば、
+          その日付を更新する（発売日の変更など）。過去のイベントや手動で作ったイベントは動かさない
+        - それ以外は owner の印を付けて新しく追加する
+
+        :param writer: CalendarBatchWriter
+        :param event: 終日イベントの内容
+        :param label: コールバックに渡す名前
+        :return: "exists" / "queued" / "update" / "insert"
+        """
+        summary = event["summary"]
+        if summary in self.queued:
+            return "queued"
+
+        current = self.find(summary)
+        if any(row["start_date"] == event["start"]["date"] for row in current):
+            return "exists"
+
+        self.queued.add(summary)
+        today = date.today().isoformat()
+        movable = [
+            row
+            for row in current
+            if row["owner"] == self.owner and row["start_date"] >= today
+        ]
+        if len(movable) == 1:
+            writer.add(event, label=label, event_id=movable[0]["event_id"])
+            return "update"
+        private = event.setdefault("extendedProperties", {}).setdefault("private", {})
+        private[OWNER_PROPERTY] = self.owner
+        writer.add(event, label=label)
+        return "insert"
@@ -0,0 +1,181 @@
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ytdlp_engine import get_engine
+
+# URLから動画IDを取り出すパターン（ネットワークに問い合わせずにアーカイブを照合するため）
+YOUTUBE_ID_PATTERN = re.compile(
+    r"(?:youtube\.com/(?:watch\?(?:.*&)?v=|shorts/|live/|embed/)|youtu\.be/)([A-Za-z0-9_-]{11})"
+)
+
+
+def archive_key(url):
+    """
+    アーカイブのキーを求める。YouTubeは "youtube 動画ID"（yt-dlpの--download-archiveと同じ形式）、
+    それ以外のサイトはURLそのものを使う。
+    """
+    match = YOUTUBE_ID_PATTERN.search(url)
+    if match:
+        return f"youtube {match.group(1)}"
+    return url.strip()
+
+
+class DownloadManager:
+    """
+    yt-dlpで複数URLを同時にダウンロードするクラス
+
+    - 同時実行数を制限したスレッドプールでダウンロード
+    - yt-dlpはプロセス内で使い回す（ytdlp_engine.py、パッケージが無ければ実行ファイル）
+    - 保存先は yt-dlp の after_move:filepath（最終パス）だけから取得（フォルダーの走査はしない）
+    - ダウンロード済みIDをアーカイブファイルに記録し、2回目以降はネットワークに問い合わせずスキップ
+    """
+
+    def __init__(
+        self,
+        ytdlp_path,
+        output_path=".",
+        max_workers=3,
+        archive_file=None,
+        record_archive=True,
+    ):
+        """
+        :param ytdlp_path: yt-dlp実行ファイルのパス（yt_dlpパッケージが無い場合に使用）
+        :param output_path: 保存先のディレクトリ
+        :param max_workers: 同時にダウンロードする数
+        :param archive_file: アーカイブファイルのパス（Noneならアーカイブを使わない）
+        :param record_archive: ダウンロード完了時にアーカイブへ記録するか
+                               （Falseなら、後の処理が成功した時点で呼び出し側が record() で記録する）
+        """
+        self.ytdlp_path = ytdlp_path
+        self.engine = get_engine(ytdlp_path)
+        self.output_path = output_path
+        self.max_workers = max_workers
+        self.archive_file = archive_file
+        self.record_archive = record_archive
+        self._archive_lock = threading.Lock()
+        self._archive = self._load_archive()
+
+    # --- アーカイブ ---
+
+    def _load_archive(self):
+        if not self.archive_file or not os.path.exists(self.archive_file):
+            return {}
+        try:
+            with open(self.archive_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"[Error] ダウンロードアーカイブの読み込みに失敗しました: {e}")
+            return {}
+
+    def _record(self, key, url, filepath):
+        if not self.archive_file:
+            return
+        with self._archive_lock:
+            self._archive[key] = {
+                "url": url,
+                "filepath": filepath,
+                "downloaded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            os.makedirs(os.path.dirname(self.archive_file) or ".", exist_ok=True)
+            temp_path = f"{self.archive_file}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self._archive, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.archive_file)
+
+    def record(self, url, filepath):
+        """URLを処理済みとしてアーカイブに記録する"""
+        self._record(archive_key(url), url, filepath)
+
+    def is_archived(self, url):
+        """ダウンロード済みかどうか（ネットワークには問い合わせない）"""
+        with self._archive_lock:
+            return archive_key(url) in self._archive
+
+    # --- ダウンロード ---
+
+    def download(self, url, format_str, sections=None, output_path=None):
+        """
+        1件ダウンロードします。
+
+        :param url: ダウンロードする動画URL
+        :param format_str: yt-dlpの -f に渡すフォーマット指定
+        :param sections: (開始秒, 終了秒) を指定するとその範囲だけダウンロード
+        :param output_path: 保存先のディレクトリ（省略時は初期化時の保存先）
+        :return: {"status": "downloaded" | "skipped" | "failed", "filepath": パス or None}
+        """
+        key = archive_key(url)
+        with self._archive_lock:
+            archived = self._archive.get(key) if self.archive_file else None
+        if archived:
+            print(f"[Info] ダウンロード済みのためスキップします: {url}")
+            filepath = archived.get("filepath")
+            return {
+                "status": "skipped",
+                "filepath": filepath if filepath and os.path.exists(filepath) else None,
+            }
+
+        try:
+            print(f"[Info] 動画をダウンロード中...: {url}")
+            output_template = os.path.join(
+                output_path or self.output_path, "%(title)s.%(ext)s"
+            )
+            filepath = self.engine.download(
+                url, format_str, output_template, sections=sections
+            )
+        except subprocess.CalledProcessError as e:
+            print(f"[Error] ダウンロードエラー: {url} - {e}")
+            print(f"[Error] エラー出力: {e.stderr}")
+            return {"status": "failed", "filepath": None}
+        except Exception as e:
+            print(f"[Error] 予期しないエラー: {url} - {e}")
+            return {"status": "failed", "filepath": None}
+
+        if not filepath or not os.path.exists(filepath):
+            print(f"[Error] yt-dlpからファイルパスを取得できませんでした: {url}")
+            return {"status": "failed", "filepath": None}
+
+        if self.record_archive:
+            self._record(key, url, filepath)
+        print(f"[Info] ダウンロード完了: {filepath}")
+        return {"status": "downloaded", "filepath": filepath}
+
+    def download_many(
+        self, urls, format_str, sections=None, output_path=None, on_result=None
+    ):
+        """
+        複数URLを同時実行数を制限してダウンロードします。
+
+        :param urls: ダウンロードするURLのリスト
+        :param format_str: yt-dlpの -f に渡すフォーマット指定
+        :param sections: (開始秒, 終了秒) を指定するとその範囲だけダウンロード
+        :param output_path: 保存先のディレクトリ（省略時は初期化時の保存先）
+        :param on_result: 1件終わるごとに呼ばれるコールバック on_result(url, result)
+        :return: {url: download() の戻り値}（入力順）
+        """
+        # 同じ動画が複数回指定されていても1回だけダウンロードする
+        unique_urls = []
+        seen_keys = set()
+        for url in urls:
+            key = archive_key(url)
+            if key not in seen_keys:
+                seen_keys.add(key)
+                unique_urls.append(url)
+
+        def task(url):
+            result = self.download(url, format_str, sections, output_path)
+            if on_result:
+                on_result(url, result)
+            return result
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {url: executor.submit(task, url) for url in unique_urls}
+            results_by_key = {
+                archive_key(url): future.result() for url, future in futures.items()
+            }
+
+        return {url: results_by_key[archive_key(url)] for url in urls}
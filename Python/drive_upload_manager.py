@@ -0,0 +1,318 @@
+import json
+import mimetypes
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from google.auth.transport.requests import AuthorizedSession
+
+# スクリプトのディレクトリとプロジェクトルートを取得
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+TOKENS_DIR = os.path.join(PROJECT_ROOT, "tokens")
+
+DRIVE_UPLOAD_URL = "https://www.googleapis.com/upload/drive/v3/files"
+
+# Google Driveの再開可能アップロードはチャンクサイズを256KiBの倍数にする必要がある
+CHUNK_ALIGNMENT = 256 * 1024
+
+
+class DriveUploadManager:
+    """
+    Google Driveの再開可能アップロード（resumable upload）を管理するクラス
+
+    - チャンクサイズを指定して分割アップロード
+    - 進捗コールバック on_progress(file_path, uploaded_bytes, total_bytes)
+    - セッションURIをファイルに保存し、中断したアップロードを途中から再開
+    - 複数ファイルの同時アップロード
+    """
+
+    def __init__(
+        self,
+        creds,
+        chunk_size=8 * 1024 * 1024,
+        max_workers=3,
+        session_file=None,
+        upload_url=DRIVE_UPLOAD_URL,
+        max_retries=5,
+    ):
+        """
+        :param creds: google.oauth2.credentials.Credentials
+        :param chunk_size: 1リクエストで送るバイト数（256KiBの倍数に切り上げる）
+        :param max_workers: 同時にアップロードするファイル数
+        :param session_file: セッションURIの保存先（省略時はtokens/drive_upload_sessions.json）
+        :param upload_url: アップロードAPIのURL（ローカルの代替サーバーに向ける場合に変更）
+        :param max_retries: 一時的なエラー時の再試行回数
+        """
+        self.creds = creds
+        self.chunk_size = max(
+            CHUNK_ALIGNMENT,
+            (chunk_size + CHUNK_ALIGNMENT - 1) // CHUNK_ALIGNMENT * CHUNK_ALIGNMENT,
+        )
+        self.session_file = session_file or os.path.join(
+            TOKENS_DIR, "drive_upload_sessions.json"
+        )
+        self.upload_url = upload_url
+        self.max_retries = max_retries
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+        self._local = threading.local()
+        self._session_lock = threading.Lock()
+
+    def _get_http(self):
+        """スレッドごとのHTTPセッションを取得（requests.Sessionはスレッド間で共有しない）"""
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = AuthorizedSession(self.creds) if self.creds else _PlainSession()
+            self._local.http = http
+        return http
+
+    # --- セッションURIの永続化 ---
+
+    def _load_sessions(self):
+        if not os.path.exists(self.session_file):
+            return {}
+        try:
+            with open(self.session_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"[Error] アップロードセッションの読み込みに失敗: {e}")
+            return {}
+
+    def _save_session(self, key, value):
+        with self._session_lock:
+            sessions = self._load_sessions()
+            if value is None:
+                sessions.pop(key, None)
+            else:
+                sessions[key] = value
+            os.makedirs(os.path.dirname(self.session_file) or ".", exist_ok=True)
+            temp_path = f"{self.session_file}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(sessions, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.session_file)
+
+    def _session_key(self, file_path, folder_id, upload_name):
+        """同じファイル・同じ内容・同じ宛先のときだけセッションを再利用する"""
+        stat = os.stat(file_path)
+        return "|".join(
+            [
+                os.path.abspath(file_path),
+                str(stat.st_size),
+                str(int(stat.st_mtime)),
+                folder_id or "",
+                upload_name,
+            ]
+        )
+
+    # --- 再開可能アップロードのプロトコル ---
+
+    def _start_session(self, upload_name, folder_id, total_size, mime_type):
+        """アップロードセッションを開始してセッションURIを返す"""
+        metadata = {"name": upload_name}
+        if folder_id:
+            metadata["parents"] = [folder_id]
+
+        response = self._get_http().post(
+            self.upload_url,
+            params={"uploadType": "resumable", "fields": "id"},
+            headers={
+                "Content-Type": "application/json; charset=UTF-8",
+                "X-Upload-Content-Type": mime_type,
+                "X-Upload-Content-Length": str(total_size),
+            },
+            data=json.dumps(metadata),
+        )
+        if response.status_code != 200 or "Location" not in response.headers:
+            raise RuntimeError(
+                f"アップロードセッションの開始に失敗 ({response.status_code}): {response.text}"
+            )
+        return response.headers["Location"]
+
+    def _query_offset(self, session_uri, total_size):
+        """
+        サーバーが受け取り済みのバイト数を問い合わせる
+
+        :return: (受信済みバイト数, 完了時のレスポンスJSON or None)。セッション失効時は (None, None)
+        """
+        response = self._get_http().put(
+            session_uri,
+            headers={"Content-Range": f"bytes */{total_size}", "Content-Length": "0"},
+        )
+        if response.status_code in (200, 201):
+            return total_size, response.json()
+        if response.status_code == 308:
+            return _parse_range_header(response.headers.get("Range")), None
+        if response.status_code in (404, 410):
+            return None, None
+        raise RuntimeError(
+            f"アップロード状態の確認に失敗 ({response.status_code}): {response.text}"
+        )
+
+    def upload(
+        self,
+        file_path,
+        folder_id=None,
+        file_name=None,
+        mime_type=None,
+        on_progress=None,
+    ):
+        """
+        ファイルを再開可能アップロードでGoogle Driveに送ります。
+        前回中断したセッションが残っていれば、その続きから送信します。
+
+        :param file_path: アップロードするファイルのパス
+        :param folder_id: アップロード先のフォルダーID
+        :param file_name: Google Drive上のファイル名（省略時は元のファイル名）
+        :param mime_type: ファイルのMIMEタイプ（省略時は拡張子から推測）
+        :param on_progress: 進捗コールバック on_progress(file_path, uploaded_bytes, total_bytes)
+        :return: アップロードされたファイルID
+        """
+        upload_name = file_name if file_name else os.path.basename(file_path)
+        if not mime_type:
+            mime_type = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+        total_size = os.path.getsize(file_path)
+        key = self._session_key(file_path, folder_id, upload_name)
+
+        session_uri = self._load_sessions().get(key, {}).get("session_uri")
+        offset = 0
+        if session_uri:
+            offset, result = self._query_offset(session_uri, total_size)
+            if result is not None:
+                self._save_session(key, None)
+                return result.get("id")
+            if offset is None:
+                print("[Info] 保存済みのアップロードセッションが失効していたため、最初からアップロードします")
+                session_uri = None
+                offset = 0
+            else:
+                print(f"[Info] 中断したアップロードを再開します: {upload_name} ({offset}/{total_size} bytes)")
+
+        if not session_uri:
+            session_uri = self._start_session(upload_name, folder_id, total_size, mime_type)
+            self._save_session(
+                key,
+                {"session_uri": session_uri, "created_at": time.time()},
+            )
+
+        if on_progress:
+            on_progress(file_path, offset, total_size)
+
+        retries = 0
+        with open(file_path, "rb") as f:
+            while True:
+                f.seek(offset)
+                chunk = f.read(self.chunk_size)
+                end = offset + len(chunk) - 1
+                if total_size == 0:
+                    content_range = "bytes */0"
+                else:
+                    content_range = f"bytes {offset}-{end}/{total_size}"
+
+                try:
+                    response = self._get_http().put(
+                        session_uri,
+                        headers={
+                            "Content-Range": content_range,
+                            "Content-Length": str(len(chunk)),
+                        },
+                        data=chunk,
+                    )
+                    status = response.status_code
+                except Exception as e:
+                    # 通信エラーはサーバー側の受信位置を確認してから再送する
+                    status = None
+                    error = e
+
+                if status in (200, 201):
+                    self._save_session(key, None)
+                    if on_progress:
+                        on_progress(file_path, total_size, total_size)
+                    return response.json().get("id")
+
+                if status == 308:
+                    offset = _parse_range_header(response.headers.get("Range"))
+                    retries = 0
+                    if on_progress:
+                        on_progress(file_path, offset, total_size)
+                    continue
+
+                if status is not None and status not in (429, 500, 502, 503, 504):
+                    if status in (404, 410):
+                        # セッションが失効した場合は次回最初からやり直す
+                        self._save_session(key, None)
+                    raise RuntimeError(
+                        f"チャンクの送信に失敗 ({status}): {response.text}"
+                    )
+
+                retries += 1
+                if retries > self.max_retries:
+                    raise RuntimeError(
+                        f"再試行回数の上限に達しました: {error if status is None else status}"
+                    )
+                wait = 2**retries
+                print(f"[Info] アップロードを{wait}秒後に再試行します ({retries}/{self.max_retries})")
+                time.sleep(wait)
+
+                queried_offset, result = self._query_offset(session_uri, total_size)
+                if result is not None:
+                    self._save_session(key, None)
+                    return result.get("id")
+                if queried_offset is None:
+                    self._save_session(key, None)
+                    raise RuntimeError("アップロードセッションが失効しました")
+                offset = queried_offset
+
+    def submit(self, file_path, folder_id=None, file_name=None, **kwargs):
+        """アップロードをバックグラウンドで開始し、Futureを返す"""
+        return self.executor.submit(self.upload, file_path, folder_id, file_name, **kwargs)
+
+    def upload_many(self, jobs, on_progress=None):
+        """
+        複数ファイルを同時にアップロードします。
+
+        :param jobs: (file_path, folder_id, file_name) のリスト
+        :param on_progress: 進捗コールバック on_progress(file_path, uploaded_bytes, total_bytes)
+        :return: {file_path: ファイルID or None}
+        """
+        futures = {
+            job[0]: self.submit(*job, on_progress=on_progress) for job in jobs
+        }
+        results = {}
+        for file_path, future in futures.items():
+            try:
+                results[file_path] = future.result()
+            except Exception as e:
+                print(f"[Error] アップロードエラー: {file_path} - {e}")
+                results[file_path] = None
+        return results
+
+    def shutdown(self):
+        """ワーカースレッドを終了"""
+        self.executor.shutdown(wait=True)
+
+
+class _PlainSession:
+    """認証なしでアクセスするためのセッション（ローカルの代替サーバー向け）"""
+
+    def __init__(self):
+        import requests
+
+        self._session = requests.Session()
+
+    def post(self, url, **kwargs):
+        return self._session.post(url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self._session.put(url, **kwargs)
+
+
+def _parse_range_header(range_header):
+    """'bytes=0-12345' 形式のRangeヘッダーから次の送信開始位置を求める"""
+    if not range_header:
+        return 0
+    try:
+        return int(range_header.split("-")[-1]) + 1
+    except ValueError:
+        return 0
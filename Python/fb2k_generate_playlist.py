@@ -1,34 +1,111 @@
 import json
-import subprocess
+import os
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from ytdlp_engine import get_engine
 
-def fetch_video_info(yt_dlp_path, video_url):
-    """個別動画のメタデータを取得"""
-    cmd = [yt_dlp_path, "--no-warnings", "--skip-download", "-j", video_url]
-    proc = subprocess.run(cmd, capture_output=True, text=True)
-    if proc.returncode != 0:
-        print(f"[ERROR] メタデータ取得失敗: {video_url}")
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+TOKENS_DIR = os.path.join(PROJECT_ROOT, "tokens")
+# 動画IDごとのメタデータ（タイトル・長さ）のキャッシュ
+CACHE_FILE = os.path.join(TOKENS_DIR, "fb2k_metadata_cache.json")
+CACHE_TTL_SECONDS = 30 * 24 * 60 * 60  # 30日
+MAX_WORKERS = 8
+
+
+class MetadataCache:
+    """動画IDをキーにしたメタデータの保存先（有効期限付き）"""
+
+    def __init__(self, path=CACHE_FILE, ttl=CACHE_TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.data = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.data = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"[Error] メタデータキャッシュの読み込みに失敗: {e}")
+
+    def get(self, video_id):
+        """有効期限内のメタデータを返す（無ければNone）"""
+        with self.lock:
+            item = self.data.get(video_id)
+        if item and time.time() - item.get("fetched_at", 0) < self.ttl:
+            return item
         return None
-    return json.loads(proc.stdout)
 
-def generate_playlist(yt_dlp_path, url, output_file):
+    def put(self, video_id, title, duration):
+        with self.lock:
+            self.data[video_id] = {
+                "title": title,
+                "duration": duration,
+                "fetched_at": time.time(),
+            }
+
+    def save(self):
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+
+
+def fetch_video_info(yt_dlp_path, video_url):
+    """個別動画のメタデータを取得（yt-dlpはプロセス内で使い回す）"""
+    return get_engine(yt_dlp_path).extract_info(video_url)
+
+def fetch_metadata_many(yt_dlp_path, video_ids, cache, max_workers=MAX_WORKERS):
+    """キャッシュに無い動画のメタデータを同時実行数を制限して取得し、キャッシュに入れる"""
+    if not video_ids:
+        return
+
+    print(f"[Info] メタデータを取得します: {len(video_ids)}件（同時{max_workers}件）")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(
+                fetch_video_info,
+                yt_dlp_path,
+                f"https://www.youtube.com/watch?v={video_id}",
+            ): video_id
+            for video_id in video_ids
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            video_id = futures[future]
+            info = future.result()
+            if info:
+                cache.put(video_id, info.get("title"), info.get("duration"))
+            print(f"[Info] [{done}/{len(video_ids)}] {video_id}")
+
+def generate_playlist(yt_dlp_path, url, output_file, max_workers=MAX_WORKERS):
     # まず flat-playlist で ID リストのみ取得
-    cmd_list = [
-        yt_dlp_path,
-        "--no-warnings",
-        "--flat-playlist",
-        "--dump-single-json",
-        "-J",
-        url
-    ]
-    proc_list = subprocess.run(cmd_list, capture_output=True, text=True)
-    if proc_list.returncode != 0:
-        print("[Error] Error fetching playlist IDs:", proc_list.stderr.strip())
+    data = get_engine(yt_dlp_path).extract_info(url, flat_playlist=True)
+    if data is None:
+        print("[Error] プレイリストのID取得に失敗しました")
         return
 
-    data = json.loads(proc_list.stdout)
     entries = data.get("entries", [])
+    cache = MetadataCache()
+
+    # flat-playlistの結果にタイトルと長さが含まれていれば、それをそのままキャッシュに使う
+    missing_ids = []
+    for e in entries:
+        video_id = e.get("id")
+        if not video_id or cache.get(video_id):
+            continue
+        if e.get("title") and e.get("duration"):
+            cache.put(video_id, e["title"], e["duration"])
+        elif video_id not in missing_ids:
+            missing_ids.append(video_id)
+
+    # キャッシュに無い動画だけ個別に問い合わせる
+    fetch_metadata_many(yt_dlp_path, missing_ids, cache, max_workers)
+    cache.save()
 
     with open(output_file, "w", encoding="utf-8") as f:
         f.write("#EXTM3U\n")
@@ -39,8 +116,14 @@ def generate_playlist(yt_dlp_path, url, output_file):
                 full_url = raw
             else:
                 full_url = f"https://www.youtube.com/watch?v={raw}"
-            print(f"[{idx}/{len(entries)}] URL: {full_url}")
-            # タイトル取得せず、URLのみ出力
+
+            meta = cache.get(e.get("id")) if e.get("id") else None
+            if meta and meta.get("title"):
+                duration = int(meta["duration"]) if meta.get("duration") else -1
+                f.write(f"#EXTINF:{duration},{meta['title']}\n")
+                print(f"[Info] [{idx}/{len(entries)}] {meta['title']}")
+            else:
+                print(f"[Info] [{idx}/{len(entries)}] URL: {full_url}")
             f.write(f"fy+{full_url}\n")
 
 if __name__ == "__main__":
@@ -53,4 +136,4 @@ if __name__ == "__main__":
         sys.exit(1)
 
     generate_playlist(yt_dlp_path, url, output_file)
-    print(f"生成完了: {output_file}")
\ No newline at end of file
+    print(f"生成完了: {output_file}")
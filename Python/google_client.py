@@ -0,0 +1,194 @@
+import os
+import pickle
+import threading
+
+import google_auth_httplib2
+import httplib2
+from google.auth.exceptions import RefreshError
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient.discovery import build_from_document
+
+try:
+    from googleapiclient.discovery_cache import get_static_doc
+except ImportError:
+    get_static_doc = None
+
+# スクリプトのディレクトリとプロジェクトルートを取得
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+TOKENS_DIR = os.path.join(PROJECT_ROOT, "tokens")
+# 同梱のディスカバリードキュメントが無い古いgoogle-api-python-client向けのキャッシュ
+DISCOVERY_CACHE_DIR = os.path.join(TOKENS_DIR, "discovery_cache")
+
+DISCOVERY_URLS = (
+    "https://{api}.googleapis.com/$discovery/rest?version={version}",
+    "https://www.googleapis.com/discovery/v1/apis/{api}/{version}/rest",
+)
+HTTP_TIMEOUT = 60
+
+_lock = threading.Lock()
+_credentials = {}  # (トークンのパス, スコープ) -> Credentials
+_documents = {}  # (API名, バージョン) -> ディスカバリードキュメント
+_local = threading.local()  # スレッドごとのサービス
+
+
+def resolve_path(path):
+    """
+    ファイル名だけなら tokens/ の中、相対パスならプロジェクトルートからのパスとして扱う
+    （実行時のカレントディレクトリに依存しないようにする）
+    """
+    if os.path.isabs(path):
+        return path
+    if not os.path.dirname(path):
+        return os.path.join(TOKENS_DIR, path)
+    return os.path.join(PROJECT_ROOT, path)
+
+
+def _read_token(token_path, scopes):
+    if not os.path.exists(token_path):
+        return None
+    if token_path.endswith(".pickle"):
+        with open(token_path, "rb") as token:
+            return pickle.load(token)
+    return Credentials.from_authorized_user_file(token_path, scopes)
+
+
+def _write_token(token_path, creds):
+    os.makedirs(os.path.dirname(token_path), exist_ok=True)
+    if token_path.endswith(".pickle"):
+        with open(token_path, "wb") as token:
+            pickle.dump(creds, token)
+    else:
+        with open(token_path, "w", encoding="utf-8") as token:
+            token.write(creds.to_json())
+
+
+def load_credentials(token_file, scopes=None, client_secrets_file="credentials.json", port=0):
+    """
+    OAuthの認証情報を読み込み、必要なら更新・再認証して保存する
+    同じトークン・同じスコープの認証情報はプロセス内で1回だけ読み込む
+
+    :param token_file: トークンファイル（.json または .pickle）
+    :param scopes: スコープのリスト
+    :param client_secrets_file: 再認証に使うOAuthクライアント情報
+    :param port: 認証フローで使うローカルサーバーのポート
+    :return: google.oauth2.credentials.Credentials
+    """
+    token_path = resolve_path(token_file)
+    key = (token_path, tuple(scopes or ()))
+
+    with _lock:
+        creds = _credentials.get(key)
+        if creds and creds.valid:
+            return creds
+
+        if creds is None:
+            creds = _read_token(token_path, scopes)
+
+        if not creds or not creds.valid:
+            refreshed = False
+            if creds and creds.expired and creds.refresh_token:
+                try:
+                    creds.refresh(Request())
+                    refreshed = True
+                except RefreshError as e:
+                    print(f"[Warning] 既存トークンの更新に失敗したため再認証します: {e}")
+
+            if not refreshed:
+                secrets_path = _find_client_secrets(client_secrets_file)
+                flow = InstalledAppFlow.from_client_secrets_file(secrets_path, scopes)
+                creds = flow.run_local_server(port=port)
+
+            _write_token(token_path, creds)
+
+        _credentials[key] = creds
+        return creds
+
+
+def _find_client_secrets(client_secrets_file):
+    """OAuthクライアント情報を tokens/ → プロジェクトルートの順に探す"""
+    candidates = [resolve_path(client_secrets_file)]
+    if not os.path.isabs(client_secrets_file):
+        candidates.append(os.path.join(PROJECT_ROOT, client_secrets_file))
+    for path in candidates:
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"OAuthクライアント情報が見つかりません: {candidates[0]}")
+
+
+def _discovery_document(api, version):
+    """
+    ディスカバリードキュメントを取得する
+    ライブラリ同梱のものを優先し、無ければ tokens/discovery_cache に保存したものを使う
+    （ネットワークに問い合わせるのはキャッシュが無い初回だけ）
+    """
+    key = (api, version)
+    with _lock:
+        if key in _documents:
+            return _documents[key]
+
+        document = get_static_doc(api, version) if get_static_doc else None
+
+        cache_path = os.path.join(DISCOVERY_CACHE_DIR, f"{api}.{version}.json")
+        if document is None and os.path.exists(cache_path):
+            with open(cache_path, "r", encoding="utf-8") as f:
+                document = f.read()
+
+        if document is None:
+            document = _download_discovery_document(api, version)
+            os.makedirs(DISCOVERY_CACHE_DIR, exist_ok=True)
+            with open(cache_path, "w", encoding="utf-8") as f:
+                f.write(document)
+
+        _documents[key] = document
+        return document
+
+
+def _download_discovery_document(api, version):
+    http = httplib2.Http(timeout=HTTP_TIMEOUT)
+    for url in DISCOVERY_URLS:
+        response, content = http.request(url.format(api=api, version=version))
+        if response.status == 200:
+            return content.decode("utf-8")
+    raise RuntimeError(f"ディスカバリードキュメントを取得できません: {api} {version}")
+
+
+def build_service(api, version, creds):
+    """
+    ディスカバリードキュメントのキャッシュからサービスを作る（ネットワークには問い合わせない）
+    サービスごとに専用のHTTP接続を持つので、スレッド間で共有しないこと
+    """
+    http = google_auth_httplib2.AuthorizedHttp(
+        creds, http=httplib2.Http(timeout=HTTP_TIMEOUT)
+    )
+    return build_from_document(_discovery_document(api, version), http=http)
+
+
+def get_service(api, version, token_file, scopes=None, client_secrets_file="credentials.json", port=0):
+    """
+    認証済みのサービスを取得する
+
+    httplib2の接続はスレッドセーフではないため、サービスはスレッドごとに1つ作って使い回す。
+    同じスレッドからの呼び出しでは同じ接続（keep-alive）が再利用される。
+
+    :param api: API名（例: "calendar"）
+    :param version: APIのバージョン（例: "v3"）
+    :param token_file: トークンファイル（.json または .pickle）
+    :param scopes: スコープのリスト
+    :param client_secrets_file: 再認証に使うOAuthクライアント情報
+    :param port: 認証フローで使うローカルサーバーのポート
+    """
+    creds = load_credentials(token_file, scopes, client_secrets_file, port)
+
+    services = getattr(_local, "services", None)
+    if services is None:
+        services = {}
+        _local.services = services
+
+    key = (api, version, id(creds))
+    if key not in services:
+        services[key] = build_service(api, version, creds)
+    return services[key]
+
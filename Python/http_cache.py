@@ -0,0 +1,199 @@
+import json
+import os
+import sqlite3
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# スクリプトのディレクトリとプロジェクトルートを取得
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+TOKENS_DIR = os.path.join(PROJECT_ROOT, "tokens")
+DEFAULT_DB_PATH = os.path.join(TOKENS_DIR, "http_cache.sqlite3")
+# "1" にすると通信せず、保存済みのレスポンスだけを返す
+OFFLINE_ENV = "HTTP_CACHE_OFFLINE"
+
+# サイトごとに、再検証せずに保存済みのレスポンスを使う秒数（サブドメインも含む）
+# 0 は毎回 ETag / Last-Modified で再検証する（変わっていなければ本文は転送されない）
+DEFAULT_TTL = 60 * 60
+SITE_TTLS = {
+    "bookwalker.jp": 60 * 60,
+    "books.rakuten.co.jp": 6 * 60 * 60,
+    "bookmeter.com": 60 * 60,
+    "zensho.or.jp": 24 * 60 * 60,
+    # 年齢確認などの Cookie をサーバーから受け取る必要があるため毎回問い合わせる
+    "dmm.com": 0,
+    "dmm.co.jp": 0,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    final_url TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    content BLOB NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL
+);
+"""
+
+
+class CachedSession(requests.Session):
+    """
+    GETのレスポンスをローカルの SQLite に保存する requests.Session
+
+    - URLごとに保存し、サイトごとの TTL の間は通信せずに保存済みのレスポンスを返す
+    - TTL を過ぎたら If-None-Match / If-Modified-Since を付けて問い合わせ、
+      304 なら保存済みの本文を使う（変わったページだけ転送される）
+    - オフラインモードでは通信せず保存済みのレスポンスだけを返す（無ければ ConnectionError）
+    - 通信に失敗したときは、古くても保存済みのレスポンスがあればそれを返す
+    - 保存するのは 200 のレスポンスだけ。POST などはそのまま送信する
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, ttls=None, offline=None):
+        """
+        :param db_path: SQLiteファイルのパス
+        :param ttls: SITE_TTLS に追加・上書きする {ホスト: 秒数}
+        :param offline: Trueなら通信しない（省略時は環境変数 HTTP_CACHE_OFFLINE）
+        """
+        super().__init__()
+        self.ttls = {**SITE_TTLS, **(ttls or {})}
+        self.offline = os.getenv(OFFLINE_ENV) == "1" if offline is None else offline
+        self.stats = {"cached": 0, "not_modified": 0, "downloaded": 0, "stale": 0}
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        # 複数のスレッド・プロセスから同じファイルを使っても待ち合わせるようにする
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        super().close()
+        self.conn.close()
+
+    def ttl_for(self, url):
+        """URLのホストに対応する TTL（秒）"""
+        host = urlparse(url).hostname or ""
+        for site, ttl in self.ttls.items():
+            if host == site or host.endswith("." + site):
+                return ttl
+        return DEFAULT_TTL
+
+    def get(self, url, ttl=None, **kwargs):
+        """
+        保存済みのレスポンスを使ってGETする
+
+        :param ttl: このURLだけ TTL（秒）を変える場合に指定
+        :return: requests.Response（保存済みのものは from_cache=True）
+        """
+        params = kwargs.pop("params", None)
+        if params:
+            url = requests.Request("GET", url, params=params).prepare().url
+        entry = self._load(url)
+
+        if self.offline:
+            if entry is None:
+                raise requests.exceptions.ConnectionError(
+                    f"オフラインモードのため取得できません（キャッシュにありません）: {url}"
+                )
+            self.stats["cached"] += 1
+            return self._response(url, entry)
+
+        if ttl is None:
+            ttl = self.ttl_for(url)
+        if entry is not None and time.time() - entry["fetched_at"] < ttl:
+            self.stats["cached"] += 1
+            return self._response(url, entry)
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        if entry is not None:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            response = super().get(url, headers=headers, **kwargs)
+        except requests.exceptions.RequestException as e:
+            if entry is None:
+                raise
+            print(f"[Warn] 通信に失敗したため保存済みのレスポンスを使います: {url} ({e})")
+            self.stats["stale"] += 1
+            return self._response(url, entry)
+
+        if response.status_code == 304 and entry is not None:
+            self._touch(url, response)
+            self.stats["not_modified"] += 1
+            return self._response(url, entry)
+
+        if response.status_code == 200:
+            self._store(url, response)
+        self.stats["downloaded"] += 1
+        response.from_cache = False
+        return response
+
+    def print_stats(self):
+        print(
+            f"[Info] HTTPキャッシュ: 保存済みを使用 {self.stats['cached']} 件, "
+            f"未変更 {self.stats['not_modified']} 件, 取得 {self.stats['downloaded']} 件"
+            + (f", 通信失敗で保存済みを使用 {self.stats['stale']} 件" if self.stats["stale"] else "")
+        )
+
+    def _load(self, url):
+        row = self.conn.execute(
+            "SELECT final_url, status, headers, content, etag, last_modified, fetched_at"
+            " FROM responses WHERE url = ?",
+            (url,),
+        ).fetchone()
+        if row is None:
+            return None
+        keys = ("final_url", "status", "headers", "content", "etag", "last_modified", "fetched_at")
+        return dict(zip(keys, row))
+
+    def _store(self, url, response):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses"
+                " (url, final_url, status, headers, content, etag, last_modified, fetched_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    url,
+                    response.url,
+                    response.status_code,
+                    json.dumps(dict(response.headers), ensure_ascii=False),
+                    response.content,
+                    response.headers.get("ETag"),
+                    response.headers.get("Last-Modified"),
+                    time.time(),
+                ),
+            )
+
+    def _touch(self, url, response):
+        """304 のときは取得日時と、返ってきた検証用ヘッダーだけを更新する"""
+        with self.conn:
+            self.conn.execute(
+                "UPDATE responses SET fetched_at = ?,"
+                " etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified)"
+                " WHERE url = ?",
+                (
+                    time.time(),
+                    response.headers.get("ETag"),
+                    response.headers.get("Last-Modified"),
+                    url,
+                ),
+            )
+
+    @staticmethod
+    def _response(url, entry):
+        response = requests.Response()
+        response.url = entry["final_url"] or url
+        response.status_code = entry["status"]
+        response.headers = CaseInsensitiveDict(json.loads(entry["headers"]))
+        response._content = entry["content"]
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.from_cache = True
+        return response
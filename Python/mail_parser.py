@@ -0,0 +1,134 @@
+import re
+from dataclasses import dataclass
+
+# 解析前に本文から取り除く記号・置き換える文字
+# （str.translate は対応表を1文字ずつ引くため、短い表なら replace を重ねる方が速い）
+NORMALIZE_REPLACEMENTS = (("◇", ""), ("◆", ""), ("■", ""), ("　", " "), ("\r", ""))
+COLON_PATTERN = re.compile(r"[:：]")
+NEXT_LINE_PATTERN = re.compile(r"\s*([^\n]*)")
+
+
+@dataclass(frozen=True)
+class FieldRule:
+    """
+    1項目の取り出し方
+
+    - labels: この文字列を含む最初の行から値を取る（「ラベル：値」の値、コロンが無ければラベルの後ろ）
+              値が空なら次の行を値とする
+    - value_pattern: ラベルから取った値に適用する正規表現（グループ1を値とする）
+    - line_pattern: ラベルで取れなかったときに、本文に適用する正規表現（最初の一致のグループ1）
+    """
+
+    name: str
+    labels: tuple = ()
+    value_pattern: re.Pattern | None = None
+    line_pattern: re.Pattern | None = None
+
+
+class MailParser:
+    """
+    宣言的なルールから作る、メール本文の解析器
+
+    ルールは {項目名: {"labels": [...], "value_pattern": "...", "line_pattern": "..."}} の形で書く。
+    正規表現は作成時に1回だけコンパイルし、すべてのラベルを1つの正規表現にまとめるので、
+    本文は1回たどるだけで全項目を取り出せる（全項目がそろった時点で打ち切る）。
+    """
+
+    def __init__(self, rules):
+        """
+        :param rules: {項目名: ルール} の辞書
+        """
+        self.fields = []
+        self.label_owners = {}  # ラベル -> そのラベルを持つ項目の番号
+        for name, rule in rules.items():
+            field = FieldRule(
+                name=name,
+                labels=tuple(rule.get("labels", ())),
+                value_pattern=_compile(rule.get("value_pattern")),
+                line_pattern=_compile(rule.get("line_pattern")),
+            )
+            index = len(self.fields)
+            self.fields.append(field)
+            for label in field.labels:
+                self.label_owners.setdefault(label, []).append(index)
+
+        # 長いラベルを先に並べ、「ご利用金額」が「利用金額」より優先して一致するようにする
+        labels = sorted(self.label_owners, key=len, reverse=True)
+        self.label_pattern = (
+            re.compile("|".join(re.escape(label) for label in labels)) if labels else None
+        )
+
+    def parse(self, text):
+        """
+        本文から全項目を取り出す
+
+        :return: {項目名: 値}
+        :raises ValueError: 取り出せない項目があった場合
+        """
+        for old, new in NORMALIZE_REPLACEMENTS:
+            if old in text:
+                text = text.replace(old, new)
+        fields = self.fields
+        values = [None] * len(fields)
+        labeled = [False] * len(fields)  # ラベルの行を見つけた項目
+        remaining = sum(1 for field in fields if field.labels)
+
+        if self.label_pattern is not None and remaining:
+            position = 0
+            while remaining:
+                match = self.label_pattern.search(text, position)
+                if match is None:
+                    break
+                line_start = text.rfind("\n", 0, match.start()) + 1
+                line_end = text.find("\n", match.end())
+                if line_end < 0:
+                    line_end = len(text)
+                # 同じ行に別のラベルがあっても、行の値は1つなので次の行から探す
+                position = line_end
+
+                for index in self.label_owners[match.group()]:
+                    if labeled[index]:
+                        continue
+                    labeled[index] = True
+                    remaining -= 1
+                    value = _labeled_value(text[line_start:line_end], match.end() - line_start)
+                    if not value:
+                        # ラベルの行に値が無ければ次の空でない行を値とする
+                        value = NEXT_LINE_PATTERN.match(text, line_end).group(1).strip()
+                    values[index] = self._extract(fields[index], value)
+
+        result = {}
+        missing = []
+        for index, field in enumerate(fields):
+            value = values[index]
+            if value is None and field.line_pattern is not None:
+                match = field.line_pattern.search(text)
+                value = match.group(1) if match else None
+            if value is None:
+                missing.append(field.name)
+            else:
+                result[field.name] = value
+        if missing:
+            raise ValueError(f"必要な項目を抽出できませんでした: {', '.join(missing)}")
+        return result
+
+    @staticmethod
+    def _extract(field, value):
+        if not value:
+            return None
+        if field.value_pattern is None:
+            return value
+        match = field.value_pattern.search(value)
+        return match.group(1) if match else None
+
+
+def _compile(pattern):
+    return re.compile(pattern, re.MULTILINE) if pattern else None
+
+
+def _labeled_value(line, label_end):
+    """「ラベル：値」の値を取り出す（行にコロンが無ければラベルの後ろ）"""
+    parts = COLON_PATTERN.split(line, maxsplit=1)
+    if len(parts) == 2:
+        return parts[1].strip()
+    return line[label_end:].strip()
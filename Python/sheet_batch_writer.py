@@ -0,0 +1,258 @@
+import random
+import re
+
+# 「A1」「B2:B」「B2:ZZ」のようなA1形式の範囲
+A1_PATTERN = re.compile(r"^([A-Z]*)(\d*)(?::([A-Z]*)(\d*))?$")
+SHEET_FIELDS = (
+    "sheets(properties(sheetId,title,gridProperties(rowCount,columnCount)),charts(chartId))"
+)
+
+
+def column_index(letters):
+    """列名（A, B, ..., ZZ）を0始まりの列番号にする"""
+    index = 0
+    for letter in letters:
+        index = index * 26 + (ord(letter) - ord("A") + 1)
+    return index - 1
+
+
+def quote_title(title):
+    """範囲指定に使うシート名（'シート名'!A1）"""
+    return "'" + title.replace("'", "''") + "'"
+
+
+class SheetBatchWriter:
+    """
+    スプレッドシートへの書き込みをまとめて送るクラス
+
+    - シートの作成・サイズ変更・クリア・書式・グラフの変更は spreadsheets.batchUpdate 1回にまとめる
+    - 値の書き込みは values.batchUpdate 1回にまとめる（RAW。日時などの文字列が変換されない）
+    - 数式はセルの種類を指定して spreadsheets.batchUpdate 側で書き込む
+    - flush() を呼ぶまでAPIには何も送らない（最初のシート情報の取得を除く）
+    """
+
+    def __init__(self, service, spreadsheet_id):
+        """
+        :param service: Sheets APIのサービス
+        :param spreadsheet_id: スプレッドシートのID
+        """
+        self.service = service
+        self.spreadsheet_id = spreadsheet_id
+        self.sheets = {}  # title -> {"id", "rows", "cols", "charts"}
+        self.new_sheets = []  # この実行で作成するシート
+        self.requests = []
+        self.data = []
+        self.appends = []
+        self._load()
+
+    def _load(self):
+        metadata = (
+            self.service.spreadsheets()
+            .get(spreadsheetId=self.spreadsheet_id, fields=SHEET_FIELDS)
+            .execute()
+        )
+        for sheet in metadata.get("sheets", []):
+            properties = sheet["properties"]
+            grid = properties.get("gridProperties", {})
+            self.sheets[properties["title"]] = {
+                "id": properties["sheetId"],
+                "rows": grid.get("rowCount", 0),
+                "cols": grid.get("columnCount", 0),
+                "original": (grid.get("rowCount", 0), grid.get("columnCount", 0)),
+                "charts": [chart["chartId"] for chart in sheet.get("charts", [])],
+            }
+
+    def ensure_sheet(self, title, rows=1000, cols=26):
+        """
+        シートが無ければ作成し、行数・列数が足りなければ広げる
+
+        :return: シートID
+        """
+        sheet = self.sheets.get(title)
+        if sheet is None:
+            used = {sheet["id"] for sheet in self.sheets.values()}
+            sheet_id = random.randint(1, 2**31 - 1)
+            while sheet_id in used:
+                sheet_id = random.randint(1, 2**31 - 1)
+            sheet = {"id": sheet_id, "rows": 0, "cols": 0, "original": None, "charts": []}
+            self.sheets[title] = sheet
+            self.new_sheets.append(title)
+        sheet["rows"] = max(sheet["rows"], rows)
+        sheet["cols"] = max(sheet["cols"], cols)
+        return sheet["id"]
+
+    def sheet_id(self, title):
+        return self.sheets[title]["id"]
+
+    def is_new(self, title):
+        """この実行で作成するシート（まだスプレッドシートに存在しない）か"""
+        return title in self.new_sheets
+
+    def grid_range(self, title, a1_range=None):
+        """A1形式の範囲を GridRange にする（省略時はシート全体）"""
+        grid = {"sheetId": self.sheet_id(title)}
+        if not a1_range:
+            return grid
+        match = A1_PATTERN.match(a1_range)
+        if not match:
+            raise ValueError(f"範囲の形式が不正です: {a1_range}")
+        start_col, start_row, end_col, end_row = match.groups()
+        if start_col:
+            grid["startColumnIndex"] = column_index(start_col)
+        if start_row:
+            grid["startRowIndex"] = int(start_row) - 1
+        if end_col:
+            grid["endColumnIndex"] = column_index(end_col) + 1
+        elif end_col is None and start_col:
+            grid["endColumnIndex"] = column_index(start_col) + 1
+        if end_row:
+            grid["endRowIndex"] = int(end_row)
+        elif end_row is None and start_row:
+            grid["endRowIndex"] = int(start_row)
+        return grid
+
+    def clear(self, title):
+        """シートの値をすべて消す（書式は残す）"""
+        self.requests.append(
+            {
+                "updateCells": {
+                    "range": self.grid_range(title),
+                    "fields": "userEnteredValue",
+                }
+            }
+        )
+
+    def update(self, title, values, start="A1", user_entered=False):
+        """
+        start から始まる範囲に値を書き込む
+
+        :param values: 2次元リスト
+        :param user_entered: Trueなら "=" で始まる文字列を数式として書き込む
+        """
+        grid = self.grid_range(title, start)
+        row = grid.get("startRowIndex", 0)
+        col = grid.get("startColumnIndex", 0)
+        width = max((len(line) for line in values), default=0)
+        self.ensure_sheet(title, row + len(values), col + width)
+
+        if not user_entered:
+            self.data.append({"range": f"{quote_title(title)}!{start}", "values": values})
+            return
+
+        self.requests.append(
+            {
+                "updateCells": {
+                    "start": {"sheetId": grid["sheetId"], "rowIndex": row, "columnIndex": col},
+                    "rows": [
+                        {"values": [_cell_data(value) for value in line]} for line in values
+                    ],
+                    "fields": "userEnteredValue",
+                }
+            }
+        )
+
+    def format(self, title, a1_range, cell_format):
+        """範囲に書式を設定する（gspread の worksheet.format と同じ指定）"""
+        self.requests.append(
+            {
+                "repeatCell": {
+                    "range": self.grid_range(title, a1_range),
+                    "cell": {"userEnteredFormat": cell_format},
+                    "fields": ",".join(
+                        f"userEnteredFormat.{key}" for key in cell_format
+                    ),
+                }
+            }
+        )
+
+    def delete_charts(self, title):
+        """シート上の既存のグラフを削除する"""
+        for chart_id in self.sheets[title]["charts"]:
+            self.requests.append({"deleteEmbeddedObject": {"objectId": chart_id}})
+        self.sheets[title]["charts"] = []
+
+    def add_request(self, request):
+        """addChart などのリクエストをそのまま追加する"""
+        self.requests.append(request)
+
+    def append(self, title, values):
+        """
+        表の最後に行を追加する（values.append。flush() の最後に送る）
+        表の下の空いている行に書き込むので、列に設定済みの書式がそのまま使われる
+        """
+        if values:
+            self.appends.append((title, values))
+
+    def _structure_requests(self):
+        requests = []
+        for title, sheet in self.sheets.items():
+            grid = {"rowCount": sheet["rows"], "columnCount": sheet["cols"]}
+            if title in self.new_sheets:
+                requests.append(
+                    {
+                        "addSheet": {
+                            "properties": {
+                                "sheetId": sheet["id"],
+                                "title": title,
+                                "gridProperties": grid,
+                            }
+                        }
+                    }
+                )
+            elif (sheet["rows"], sheet["cols"]) != sheet["original"]:
+                requests.append(
+                    {
+                        "updateSheetProperties": {
+                            "properties": {"sheetId": sheet["id"], "gridProperties": grid},
+                            "fields": "gridProperties(rowCount,columnCount)",
+                        }
+                    }
+                )
+        return requests
+
+    def flush(self):
+        """ためておいた変更を送信する"""
+        requests = self._structure_requests() + self.requests
+        spreadsheets = self.service.spreadsheets()
+        if requests:
+            spreadsheets.batchUpdate(
+                spreadsheetId=self.spreadsheet_id, body={"requests": requests}
+            ).execute()
+        if self.data:
+            spreadsheets.values().batchUpdate(
+                spreadsheetId=self.spreadsheet_id,
+                body={"valueInputOption": "RAW", "data": self.data},
+            ).execute()
+        for title, values in self.appends:
+            spreadsheets.values().append(
+                spreadsheetId=self.spreadsheet_id,
+                range=f"{quote_title(title)}!A1",
+                valueInputOption="RAW",
+                insertDataOption="OVERWRITE",
+                body={"values": values},
+            ).execute()
+
+        print(
+            f"[Info] スプレッドシートを更新しました"
+            f"（変更 {len(requests)} 件, 値の書き込み {len(self.data)} 範囲, 追記 {len(self.appends)} 件）"
+        )
+        for sheet in self.sheets.values():
+            sheet["original"] = (sheet["rows"], sheet["cols"])
+        self.new_sheets = []
+        self.requests = []
+        self.data = []
+        self.appends = []
+
+
+def _cell_data(value):
+    """USER_ENTERED 相当で書き込むセルの内容"""
+    if value is None or value == "":
+        return {}
+    if isinstance(value, bool):
+        return {"userEnteredValue": {"boolValue": value}}
+    if isinstance(value, (int, float)):
+        return {"userEnteredValue": {"numberValue": value}}
+    text = str(value)
+    if text.startswith("="):
+        return {"userEnteredValue": {"formulaValue": text}}
+    return {"userEnteredValue": {"stringValue": text}}
@@ -0,0 +1,259 @@
+"""
+drive_upload_manager の再開可能アップロードを、ローカルの http.server で動かす代替サーバーに対して確認する。
+
+    cd Python && python -m unittest tests.test_drive_upload_manager
+"""
+
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from drive_upload_manager import CHUNK_ALIGNMENT, DriveUploadManager  # noqa: E402
+
+CONTENT_RANGE_PATTERN = re.compile(r"bytes (?:(\d+)-(\d+)|\*)/(\d+)")
+
+
+class StubDriveServer:
+    """
+    Google Driveの再開可能アップロードを真似る最小限のサーバー
+
+    - accept_limits: {チャンクの番号: 受け取るバイト数} 指定したチャンクは一部だけ受け取って308を返す
+    - fail_statuses: {チャンクの番号: ステータス} 指定したチャンクの送信にそのステータスを返す
+    - expired: 失効させるセッションID（問い合わせ・送信に404を返す）
+    """
+
+    def __init__(self):
+        self.sessions = {}
+        self.requests = []
+        self.accept_limits = {}
+        self.fail_statuses = {}
+        self.expired = set()
+        self.chunk_count = 0
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status, headers=None, body=None):
+                data = json.dumps(body).encode("utf-8") if body is not None else b""
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _body(self):
+                return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+            def do_POST(self):
+                metadata = json.loads(self._body())
+                with server._lock:
+                    session_id = str(len(server.sessions) + 1)
+                    server.sessions[session_id] = {
+                        "metadata": metadata,
+                        "total": int(self.headers["X-Upload-Content-Length"]),
+                        "data": b"",
+                    }
+                    server.requests.append(("POST", session_id, None))
+                host, port = self.server.server_address[:2]
+                self._reply(200, {"Location": f"http://{host}:{port}/session/{session_id}"})
+
+            def do_PUT(self):
+                session_id = self.path.rsplit("/", 1)[-1]
+                body = self._body()
+                match = CONTENT_RANGE_PATTERN.fullmatch(self.headers["Content-Range"])
+                with server._lock:
+                    server.requests.append(("PUT", session_id, self.headers["Content-Range"]))
+                    session = server.sessions.get(session_id)
+                    if session is None or session_id in server.expired:
+                        self._reply(404)
+                        return
+
+                    if match.group(1) is not None:
+                        start = int(match.group(1))
+                        if start != len(session["data"]):
+                            self._reply(400)
+                            return
+                        index = server.chunk_count
+                        server.chunk_count += 1
+                        if index in server.fail_statuses:
+                            self._reply(server.fail_statuses[index])
+                            return
+                        session["data"] += body[: server.accept_limits.get(index, len(body))]
+
+                    received = len(session["data"])
+                    if received >= session["total"]:
+                        self._reply(200, body={"id": f"file-{session_id}"})
+                    elif received:
+                        self._reply(308, {"Range": f"bytes=0-{received - 1}"})
+                    else:
+                        self._reply(308)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/upload"
+
+    def chunk_ranges(self):
+        """チャンク送信の Content-Range（状態の問い合わせは除く）"""
+        return [
+            content_range
+            for method, _, content_range in self.requests
+            if method == "PUT" and "*" not in content_range
+        ]
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class DriveUploadManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.session_file = os.path.join(self.temp_dir.name, "sessions.json")
+        self.file_path = os.path.join(self.temp_dir.name, "clip.mp4")
+        # 2.5チャンク分のデータ
+        self.content = os.urandom(CHUNK_ALIGNMENT * 2 + CHUNK_ALIGNMENT // 2)
+        with open(self.file_path, "wb") as f:
+            f.write(self.content)
+        self.server = StubDriveServer().__enter__()
+        self.manager = DriveUploadManager(
+            None,
+            chunk_size=CHUNK_ALIGNMENT,
+            max_workers=1,
+            session_file=self.session_file,
+            upload_url=self.server.url,
+            max_retries=0,
+        )
+
+    def tearDown(self):
+        self.manager.shutdown()
+        self.server.__exit__(None, None, None)
+        self.temp_dir.cleanup()
+
+    def saved_sessions(self):
+        if not os.path.exists(self.session_file):
+            return {}
+        with open(self.session_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def test_chunked_upload(self):
+        progress = []
+        file_id = self.manager.upload(
+            self.file_path,
+            folder_id="folder",
+            file_name="upload.mp4",
+            on_progress=lambda path, uploaded, total: progress.append(uploaded),
+        )
+
+        total = len(self.content)
+        self.assertEqual(file_id, "file-1")
+        self.assertEqual(self.server.sessions["1"]["data"], self.content)
+        self.assertEqual(
+            self.server.sessions["1"]["metadata"], {"name": "upload.mp4", "parents": ["folder"]}
+        )
+        self.assertEqual(
+            self.server.chunk_ranges(),
+            [
+                f"bytes 0-{CHUNK_ALIGNMENT - 1}/{total}",
+                f"bytes {CHUNK_ALIGNMENT}-{CHUNK_ALIGNMENT * 2 - 1}/{total}",
+                f"bytes {CHUNK_ALIGNMENT * 2}-{total - 1}/{total}",
+            ],
+        )
+        self.assertEqual(progress, [0, CHUNK_ALIGNMENT, CHUNK_ALIGNMENT * 2, total])
+        # 完了したセッションは保存先から消える
+        self.assertEqual(self.saved_sessions(), {})
+
+    def test_resumes_from_range_header_offset(self):
+        # 最初のチャンクは一部だけ受け取り、Range ヘッダーで受信済みの位置を返す
+        self.server.accept_limits[0] = 100000
+
+        file_id = self.manager.upload(self.file_path)
+
+        total = len(self.content)
+        self.assertEqual(file_id, "file-1")
+        self.assertEqual(self.server.sessions["1"]["data"], self.content)
+        self.assertEqual(
+            self.server.chunk_ranges()[:2],
+            [
+                f"bytes 0-{CHUNK_ALIGNMENT - 1}/{total}",
+                f"bytes 100000-{100000 + CHUNK_ALIGNMENT - 1}/{total}",
+            ],
+        )
+
+    def test_resumes_saved_session_from_range_header(self):
+        # 2つ目のチャンクで失敗させ、セッションURIを保存したまま中断する
+        self.server.fail_statuses[1] = 403
+        with self.assertRaises(RuntimeError):
+            self.manager.upload(self.file_path)
+        self.assertEqual(len(self.saved_sessions()), 1)
+
+        file_id = self.manager.upload(self.file_path)
+
+        total = len(self.content)
+        self.assertEqual(file_id, "file-1")
+        self.assertEqual(len(self.server.sessions), 1)
+        self.assertEqual(self.server.sessions["1"]["data"], self.content)
+        # 再開時は状態を問い合わせ、受信済みの位置から送る
+        self.assertIn(("PUT", "1", f"bytes */{total}"), self.server.requests)
+        self.assertEqual(
+            self.server.chunk_ranges()[-2:],
+            [
+                f"bytes {CHUNK_ALIGNMENT}-{CHUNK_ALIGNMENT * 2 - 1}/{total}",
+                f"bytes {CHUNK_ALIGNMENT * 2}-{total - 1}/{total}",
+            ],
+        )
+        self.assertEqual(self.saved_sessions(), {})
+
+    def test_restarts_when_saved_session_expired(self):
+        self.server.fail_statuses[1] = 403
+        with self.assertRaises(RuntimeError):
+            self.manager.upload(self.file_path)
+        self.server.expired.add("1")
+
+        file_id = self.manager.upload(self.file_path)
+
+        self.assertEqual(file_id, "file-2")
+        self.assertEqual(self.server.sessions["2"]["data"], self.content)
+        self.assertEqual(self.server.chunk_ranges()[-3].split("/")[0], f"bytes 0-{CHUNK_ALIGNMENT - 1}")
+        self.assertEqual(self.saved_sessions(), {})
+
+    def test_restarts_after_session_expires_during_upload(self):
+        for status in (404, 410):
+            with self.subTest(status=status):
+                self.server.chunk_count = 0
+                self.server.fail_statuses = {1: status}
+                with self.assertRaises(RuntimeError):
+                    self.manager.upload(self.file_path)
+                # 失効したセッションは保存先から消え、次回は新しいセッションで最初から送る
+                self.assertEqual(self.saved_sessions(), {})
+
+                self.server.fail_statuses = {}
+                sessions_before = len(self.server.sessions)
+                file_id = self.manager.upload(self.file_path)
+
+                session_id = str(sessions_before + 1)
+                self.assertEqual(file_id, f"file-{session_id}")
+                self.assertEqual(self.server.sessions[session_id]["data"], self.content)
+
+
+if __name__ == "__main__":
+    unittest.main()
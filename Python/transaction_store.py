@@ -0,0 +1,183 @@
+import hashlib
+import os
+import sqlite3
+
+# スクリプトのディレクトリとプロジェクトルートを取得
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+TOKENS_DIR = os.path.join(PROJECT_ROOT, "tokens")
+DEFAULT_DB_PATH = os.path.join(TOKENS_DIR, "transactions.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    origin TEXT NOT NULL,
+    record_id TEXT NOT NULL,
+    occurred_at TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    store TEXT NOT NULL,
+    source TEXT NOT NULL,
+    PRIMARY KEY (origin, record_id)
+);
+CREATE INDEX IF NOT EXISTS transactions_occurred_at ON transactions (occurred_at);
+CREATE INDEX IF NOT EXISTS transactions_store ON transactions (store);
+CREATE TABLE IF NOT EXISTS sheet_rows (
+    sheet TEXT NOT NULL,
+    row_index INTEGER NOT NULL,
+    row_key TEXT NOT NULL,
+    occurred_at TEXT NOT NULL,
+    amount INTEGER NOT NULL,
+    store TEXT NOT NULL,
+    source TEXT NOT NULL,
+    PRIMARY KEY (sheet, row_index)
+);
+"""
+
+
+def row_hash(values):
+    """CSVの行など、IDを持たないレコードのキーを値から作る"""
+    text = "\x1f".join("" if value is None else str(value) for value in values)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class TransactionStore:
+    """
+    決済履歴をローカルの SQLite に保存するクラス
+
+    - レコードは (取得元, レコードID) をキーに保存する
+      （例: ("gmail", メールID), ("paypay_csv", CSVの行のハッシュ)）
+    - 同じキーで保存し直すと内容を上書きするので、何度取り込んでも重複しない
+    - シートへの出力は、日時・金額・店舗・決済元が同じものを1件にまとめて日時順で取り出す
+    - シートに書き込んだ行も記録しておき、次回は差分だけを書き込めるようにする
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        """
+        :param path: SQLiteファイルのパス
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def has_origin(self, origin):
+        """指定した取得元のレコードが1件でもあるか"""
+        row = self.conn.execute(
+            "SELECT 1 FROM transactions WHERE origin = ? LIMIT 1", (origin,)
+        ).fetchone()
+        return row is not None
+
+    def upsert(self, origin, records):
+        """
+        レコードを保存する（同じキーがあれば上書き）
+
+        :param origin: 取得元（"gmail", "paypay_csv" など）
+        :param records: [(record_id, occurred_at, amount, store, source)]
+        :return: これまでに無かった取引 [(occurred_at, amount, store, source)]
+                 （キーが違っても内容が同じ取引が既にあれば含めない）
+        """
+        added = []
+        with self.conn:
+            for record_id, *values in records:
+                values = tuple(values)
+                exists = self.conn.execute(
+                    "SELECT 1 FROM transactions"
+                    " WHERE occurred_at = ? AND amount = ? AND store = ? AND source = ?"
+                    " LIMIT 1",
+                    values,
+                ).fetchone()
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO transactions"
+                    " (origin, record_id, occurred_at, amount, store, source)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (origin, record_id, *values),
+                )
+                if exists is None and values not in added:
+                    added.append(values)
+        return added
+
+    def replace_origin(self, origin, records):
+        """
+        指定した取得元のレコードをすべて入れ替える（全件取得し直したとき用）
+
+        :param records: [(record_id, occurred_at, amount, store, source)]
+        """
+        with self.conn:
+            self.conn.execute("DELETE FROM transactions WHERE origin = ?", (origin,))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO transactions"
+                " (origin, record_id, occurred_at, amount, store, source)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                ((origin, *record) for record in records),
+            )
+
+    def transactions(self, sources=None):
+        """
+        取引を日時順に取得する（内容が同じ取引は1件にまとめる）
+
+        :param sources: 決済元で絞り込む場合はそのリスト（例: ["ゆうちょ", "三井住友"]）
+        :return: [(occurred_at, amount, store, source)]
+        """
+        query = "SELECT DISTINCT occurred_at, amount, store, source FROM transactions"
+        params = ()
+        if sources:
+            query += f" WHERE source IN ({','.join('?' for _ in sources)})"
+            params = tuple(sources)
+        query += " ORDER BY occurred_at, source, store, amount"
+        return self.conn.execute(query, params).fetchall()
+
+    def keyed_transactions(self, sources=None):
+        """
+        transactions() と同じ取引に、シートの行と対応づけるためのキーを付けて取得する
+        キーは内容が同じレコードのうち最小の "取得元/レコードID" なので、
+        取り込み直して内容が変わっても同じ取引なら同じキーになる
+
+        :return: [(row_key, occurred_at, amount, store, source)]
+        """
+        query = (
+            "SELECT MIN(origin || '/' || record_id), occurred_at, amount, store, source"
+            " FROM transactions"
+        )
+        params = ()
+        if sources:
+            query += f" WHERE source IN ({','.join('?' for _ in sources)})"
+            params = tuple(sources)
+        query += (
+            " GROUP BY occurred_at, amount, store, source"
+            " ORDER BY occurred_at, source, store, amount"
+        )
+        return self.conn.execute(query, params).fetchall()
+
+    def sheet_rows(self, sheet):
+        """
+        前回シートに書き込んだ行を取得する（ヘッダーを除いた上から順）
+
+        :return: [(row_key, occurred_at, amount, store, source)]
+        """
+        return self.conn.execute(
+            "SELECT row_key, occurred_at, amount, store, source FROM sheet_rows"
+            " WHERE sheet = ? ORDER BY row_index",
+            (sheet,),
+        ).fetchall()
+
+    def save_sheet_rows(self, sheet, rows):
+        """
+        シートに書き込んだ行を記録する（シートへの送信が成功してから呼ぶ）
+
+        :param rows: [(row_key, occurred_at, amount, store, source)]
+        """
+        with self.conn:
+            self.conn.execute("DELETE FROM sheet_rows WHERE sheet = ?", (sheet,))
+            self.conn.executemany(
+                "INSERT INTO sheet_rows"
+                " (sheet, row_index, row_key, occurred_at, amount, store, source)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((sheet, index, *row) for index, row in enumerate(rows)),
+            )
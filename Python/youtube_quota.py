@@ -0,0 +1,249 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from googleapiclient.errors import HttpError
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+except ImportError:
+    ZoneInfo = None
+
+# スクリプトのディレクトリとプロジェクトルートを取得
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+TOKENS_DIR = os.path.join(PROJECT_ROOT, "tokens")
+
+# YouTube Data API のメソッドごとのクォータコスト（ユニット）
+QUOTA_COSTS = {
+    "list": 1,
+    "insert": 50,
+    "update": 50,
+    "delete": 50,
+}
+DEFAULT_DAILY_QUOTA = 10000
+
+# 一時的なエラーとして待機・再試行する理由
+RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")
+
+
+class QuotaExhausted(Exception):
+    """その日のクォータ予算を使い切った（これ以上リクエストを送らない）"""
+
+
+def _quota_today():
+    """クォータがリセットされる太平洋時間での日付"""
+    tz = None
+    if ZoneInfo is not None:
+        try:
+            tz = ZoneInfo("America/Los_Angeles")
+        except ZoneInfoNotFoundError:
+            tz = None
+    if tz is None:
+        # tzdataが無い環境（Windowsなど）では夏時間を考慮しない
+        tz = timezone(timedelta(hours=-8))
+    return datetime.now(tz).strftime("%Y-%m-%d")
+
+
+def request_cost(request):
+    """HttpRequest の methodId（例: youtube.playlistItems.list）からコストを求める"""
+    method_id = getattr(request, "methodId", None) or ""
+    return QUOTA_COSTS.get(method_id.rsplit(".", 1)[-1], 1)
+
+
+class QuotaLedger:
+    """
+    1日ごとのクォータ使用量をファイルに記録するクラス
+    複数のスクリプト・複数回の実行で同じ予算を共有する
+    """
+
+    def __init__(self, path=None, daily_budget=None):
+        """
+        :param path: 記録ファイルのパス（省略時はtokens/youtube_quota_ledger.json）
+        :param daily_budget: 1日の予算（省略時は環境変数YOUTUBE_DAILY_QUOTAまたは10000）
+        """
+        self.path = path or os.path.join(TOKENS_DIR, "youtube_quota_ledger.json")
+        self.daily_budget = daily_budget or int(
+            os.getenv("YOUTUBE_DAILY_QUOTA", DEFAULT_DAILY_QUOTA)
+        )
+        self.lock = threading.Lock()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"[Error] クォータ記録の読み込みに失敗: {e}")
+            return {}
+
+    def _save(self, data):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
+    def used(self):
+        """今日の使用量"""
+        with self.lock:
+            return self._load().get(_quota_today(), 0)
+
+    def remaining(self):
+        """今日の残り"""
+        return max(0, self.daily_budget - self.used())
+
+    def charge(self, cost):
+        """
+        予算からコストを差し引く（送信前に予約する）
+
+        :raises QuotaExhausted: 予算が足りない場合
+        """
+        with self.lock:
+            data = self._load()
+            today = _quota_today()
+            used = data.get(today, 0)
+            if used + cost > self.daily_budget:
+                raise QuotaExhausted(
+                    f"本日のクォータ予算が足りません（使用済み{used}/{self.daily_budget}, 必要{cost}）"
+                )
+            # 古い日付の記録は残さない
+            self._save({today: used + cost})
+
+    def exhaust(self):
+        """APIからquotaExceededが返ったときに、今日の予算を使い切ったことにする"""
+        with self.lock:
+            self._save({_quota_today(): self.daily_budget})
+
+
+class AdaptiveTokenBucket:
+    """
+    トークンバケット方式のレート制限
+    レート制限エラーが返るとレートを半分にし、成功が続くと少しずつ元に戻す
+    """
+
+    def __init__(self, rate=5.0, capacity=10, min_rate=0.2, increase=0.1):
+        """
+        :param rate: 1秒あたりのリクエスト数（上限）
+        :param capacity: まとめて送れるリクエスト数
+        :param min_rate: レートを下げるときの下限
+        :param increase: 成功1回ごとに戻すレート
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate
+        self.increase = increase
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """トークンが1つ貯まるまで待つ"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def on_success(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttled(self, retry_after=None):
+        """レート制限エラー時。Retry-Afterがあればその秒数はリクエストを止める"""
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0
+            if retry_after:
+                self.blocked_until = max(
+                    self.blocked_until, time.monotonic() + retry_after
+                )
+
+
+class YouTubeQuotaClient:
+    """
+    YouTube Data API のリクエストをクォータとレートを管理しながら実行するクラス
+
+    - メソッドごとのコスト（list=1, insert/update/delete=50）を送信前に予算から差し引く
+    - 1日の使用量をファイルに記録し、予算を超える前に QuotaExhausted で止める
+    - トークンバケットでレートを制限し、レート制限エラーに合わせて自動で調整
+    - 429や5xxでは Retry-After（無ければ指数バックオフ）に従って再試行
+    """
+
+    def __init__(self, ledger=None, bucket=None, max_retries=5):
+        self.ledger = ledger or QuotaLedger()
+        self.bucket = bucket or AdaptiveTokenBucket()
+        self.max_retries = max_retries
+
+    def execute(self, request, cost=None):
+        """
+        リクエストを実行してレスポンスを返す
+
+        :param request: HttpRequest または BatchHttpRequest
+        :param cost: クォータコスト（省略時はメソッド名から求める。バッチは必ず指定する）
+        :raises QuotaExhausted: 予算が足りない、またはAPIがquotaExceededを返した場合
+        """
+        self.ledger.charge(request_cost(request) if cost is None else cost)
+
+        retries = 0
+        while True:
+            self.bucket.acquire()
+            try:
+                response = request.execute()
+                self.bucket.on_success()
+                return response
+            except HttpError as e:
+                reason = _error_reason(e)
+                if reason == "quotaExceeded":
+                    # 日次クォータは待っても回復しないのですぐに止める
+                    self.ledger.exhaust()
+                    raise QuotaExhausted(f"APIのクォータが超過しました: {e}") from e
+
+                status = e.resp.status
+                throttled = status == 429 or (status == 403 and reason in RATE_LIMIT_REASONS)
+                if not throttled and status not in (500, 502, 503, 504):
+                    raise
+
+                retries += 1
+                if retries > self.max_retries:
+                    raise
+                retry_after = _retry_after(e)
+                self.bucket.on_throttled(retry_after or 2**retries)
+                print(
+                    f"[Info] リクエストが制限されました（{status} {reason}）。"
+                    f"再試行します ({retries}/{self.max_retries})"
+                )
+
+    def remaining(self):
+        """今日の残りクォータ"""
+        return self.ledger.remaining()
+
+
+def _error_reason(error):
+    """HttpError から errors[0].reason を取り出す"""
+    try:
+        details = json.loads(error.content.decode("utf-8"))
+        return details["error"]["errors"][0]["reason"]
+    except (AttributeError, KeyError, IndexError, TypeError, ValueError):
+        return ""
+
+
+def _retry_after(error):
+    """Retry-After ヘッダー（秒）を取り出す"""
+    value = error.resp.get("retry-after") if error.resp is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
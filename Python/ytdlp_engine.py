@@ -0,0 +1,232 @@
+import glob
+import json
+import os
+import subprocess
+import tempfile
+import threading
+
+# yt-dlpのPythonパッケージがあればプロセス内で実行し、なければ実行ファイルにフォールバックする
+try:
+    import yt_dlp
+    from yt_dlp.utils import download_range_func
+except ImportError:
+    yt_dlp = None
+
+
+class YtDlpEngine:
+    """
+    yt-dlpをプロセス内で使い回すためのアダプター
+
+    呼び出しごとにyt-dlpの実行ファイルを起動すると、毎回インタープリターとエクストラクターの
+    初期化が走る（Windowsのonefile版では1回1秒以上）。このクラスは yt_dlp.YoutubeDL を
+    スレッドごと・オプションごとに1つだけ作り、HTTPセッションごと複数URLで再利用する。
+    yt_dlpパッケージが無い環境では、従来どおり実行ファイルを呼び出す。
+    """
+
+    BASE_PARAMS = {"quiet": True, "no_warnings": True, "noprogress": True}
+
+    def __init__(self, ytdlp_path=None, in_process=True):
+        """
+        :param ytdlp_path: フォールバック用のyt-dlp実行ファイルのパス
+        :param in_process: Falseならyt_dlpパッケージがあっても実行ファイルを使う
+        """
+        self.ytdlp_path = ytdlp_path or os.getenv("YT-DLP_PATH") or "yt-dlp"
+        self.in_process = in_process and yt_dlp is not None
+        self._local = threading.local()
+
+    def _get_ydl(self, **params):
+        """スレッドごと・オプションごとにYoutubeDLインスタンスを使い回す"""
+        instances = getattr(self._local, "instances", None)
+        if instances is None:
+            instances = {}
+            self._local.instances = instances
+
+        key = json.dumps(params, sort_keys=True, default=str)
+        if key not in instances:
+            instances[key] = yt_dlp.YoutubeDL({**self.BASE_PARAMS, **params})
+        return instances[key]
+
+    def _run_cli(self, args):
+        """実行ファイル版のyt-dlpを実行して標準出力を返す"""
+        result = subprocess.run(
+            [self.ytdlp_path, *args],
+            check=True,
+            capture_output=True,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+        )
+        return result.stdout
+
+    def extract_info(self, url, flat_playlist=False):
+        """
+        ダウンロードせずにメタデータを取得します（`yt-dlp -j` / `-J --flat-playlist` 相当）。
+
+        :param url: 動画またはプレイリストのURL
+        :param flat_playlist: Trueならプレイリストの各動画は展開せずIDとURLだけ取得
+        :return: 情報の辞書 or None
+        """
+        try:
+            if self.in_process:
+                params = {"skip_download": True}
+                if flat_playlist:
+                    params["extract_flat"] = "in_playlist"
+                ydl = self._get_ydl(**params)
+                info = ydl.extract_info(url, download=False)
+                return ydl.sanitize_info(info)
+
+            args = ["--no-warnings", "--skip-download"]
+            args += ["--flat-playlist", "-J"] if flat_playlist else ["-j"]
+            return json.loads(self._run_cli([*args, url]))
+        except Exception as e:
+            print(f"[Error] メタデータ取得失敗: {url} - {e}")
+            return None
+
+    def download(self, url, format_str, output_template, sections=None):
+        """
+        動画をダウンロードし、後処理（結合・移動）後の最終的なファイルパスを返します。
+
+        :param url: ダウンロードする動画URL
+        :param format_str: -f に渡すフォーマット指定
+        :param output_template: 出力テンプレート（例: "dir/%(title)s.%(ext)s"）
+        :param sections: (開始秒, 終了秒) を指定するとその範囲だけダウンロード
+        :return: ファイルパス or None
+        :raises Exception: ダウンロードに失敗した場合
+        """
+        if self.in_process:
+            params = {
+                "format": format_str,
+                "outtmpl": {"default": output_template},
+                "noplaylist": True,
+            }
+            if sections:
+                # 範囲指定は呼び出しごとに違うので、このときだけ使い捨てのインスタンスを作る
+                params["download_ranges"] = download_range_func(None, [sections])
+                params["force_keyframes_at_cuts"] = True
+                with yt_dlp.YoutubeDL({**self.BASE_PARAMS, **params}) as ydl:
+                    info = ydl.extract_info(url, download=True)
+            else:
+                info = self._get_ydl(**params).extract_info(url, download=True)
+
+            # requested_downloads の filepath は --print after_move:filepath と同じ最終パス
+            downloads = (info or {}).get("requested_downloads") or []
+            return downloads[-1].get("filepath") if downloads else None
+
+        args = [
+            "-f",
+            format_str,
+            "-o",
+            output_template,
+            "--no-playlist",
+            "--print",
+            "after_move:filepath",
+        ]
+        if sections:
+            args += [
+                "--download-sections",
+                f"*{sections[0]}-{sections[1]}",
+                "--force-keyframes-at-cuts",
+            ]
+
+        # --print は --quiet を含むので、標準出力には最終的なファイルパスだけが出る
+        for line in reversed(self._run_cli([*args, url]).splitlines()):
+            if line.strip():
+                return line.strip()
+        return None
+
+    def download_subtitles(self, url, lang, output_name, sub_format="vtt"):
+        """
+        字幕ファイルだけをダウンロードします。
+
+        :param url: 動画URL
+        :param lang: 字幕の言語コード
+        :param output_name: 出力ファイル名（拡張子なし）
+        :param sub_format: 字幕の形式
+        :return: 字幕ファイルのパス or None
+        """
+        if self.in_process:
+            ydl = self._get_ydl(
+                writesubtitles=True,
+                skip_download=True,
+                subtitleslangs=[lang],
+                subtitlesformat=sub_format,
+                outtmpl={"default": output_name},
+            )
+            info = ydl.extract_info(url, download=True)
+            subtitle = ((info or {}).get("requested_subtitles") or {}).get(lang)
+            if subtitle and subtitle.get("filepath"):
+                return subtitle["filepath"]
+            return None
+
+        self._run_cli(
+            [
+                "--write-subs",
+                "--skip-download",
+                "--sub-lang",
+                lang,
+                "--sub-format",
+                sub_format,
+                "--output",
+                output_name,
+                url,
+            ]
+        )
+        # yt-dlpは output_name.ja.vtt / output_name.ja-orig.vtt のような名前で保存することがある
+        # 古い同名ファイルを拾わないよう、更新日時が最も新しいものを採用する
+        candidates = [
+            path
+            for path in glob.glob(f"{output_name}*.{sub_format}")
+            if os.path.exists(path)
+        ]
+        if candidates:
+            return max(candidates, key=os.path.getmtime)
+        return None
+
+    def fetch_subtitles(self, url, lang, sub_format="vtt"):
+        """
+        字幕をファイルに書き出さずにメモリ上に取得します。
+
+        :param url: 動画URL
+        :param lang: 字幕の言語コード
+        :param sub_format: 字幕の形式
+        :return: 字幕データ（bytes） or None
+        """
+        if self.in_process:
+            ydl = self._get_ydl(
+                writesubtitles=True,
+                skip_download=True,
+                subtitleslangs=[lang],
+                subtitlesformat=sub_format,
+            )
+            info = ydl.extract_info(url, download=False)
+            subtitle = ((info or {}).get("requested_subtitles") or {}).get(lang)
+            if not subtitle:
+                return None
+            if subtitle.get("data") is not None:
+                data = subtitle["data"]
+                return data.encode("utf-8") if isinstance(data, str) else data
+            # YoutubeDLのHTTPセッションを使って字幕本体を取得
+            return ydl.urlopen(subtitle["url"]).read()
+
+        # 実行ファイル版は一時ディレクトリに書き出してから読み込む
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = self.download_subtitles(
+                url, lang, os.path.join(temp_dir, "subtitle"), sub_format
+            )
+            if not path:
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+
+
+# 同じ実行ファイルパスのエンジンはプロセス内で共有する
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(ytdlp_path=None):
+    """共有のYtDlpEngineを取得"""
+    with _engines_lock:
+        if ytdlp_path not in _engines:
+            _engines[ytdlp_path] = YtDlpEngine(ytdlp_path)
+        return _engines[ytdlp_path]